@@ -0,0 +1,271 @@
+"""
+Benchmarks the main API endpoints on a seeded database and compares the
+results against a saved baseline.
+
+Usage (from the repository root):
+
+    python -m benchmarks.api --customers 10000 --json baseline.json
+    # ... change something ...
+    python -m benchmarks.api --customers 10000 --baseline baseline.json
+
+Every endpoint is driven through the Django test client, which also
+counts the queries per request, and optionally (`--drivers wsgi asgi`,
+gunicorn and uvicorn installed) through real servers loaded by
+`benchmarks.loadgen`. The database (`benchmarks.settings`) is seeded once
+and reused as long as it holds the requested number of customers.
+
+With `--baseline`, the exit status is 1 if a scenario got slower or less
+throughput by more than `--tolerance`, or runs more queries per request.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.asgi_vs_wsgi import ASGI_COMMAND, WSGI_COMMAND, serve
+from benchmarks.loadgen import LoadResult, run_load
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+PASSWORD = 'benchmark-password'
+# The first seeded customer, see `demoapp.seeding.get_email()`
+EMAIL = 'customer0@seed.example.com'
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    path: str
+    authenticated: bool = True
+    body: Optional[Dict[str, Any]] = None
+
+
+SCENARIOS = (
+    Scenario('active account', 'GET', '/api/bank/'),
+    Scenario('bank list', 'GET', '/api/banks/', authenticated=False),
+    Scenario('customers', 'GET', '/api/customers/'),
+    Scenario('token auth', 'POST', '/api-token-auth/', authenticated=False,
+             body={ 'email': EMAIL, 'password': PASSWORD }),
+)
+
+
+def setup(database: str, customers: int, banks: int,
+          accounts_per_customer: int) -> str:
+    """
+    Prepares the benchmark database, seeding it unless it already holds
+    `customers` customers, and returns the API token of the first one.
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    os.environ['BENCHMARK_DATABASE'] = database
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+    from demoapp import seeding
+    from demoapp.models import Customer
+
+    call_command('migrate', verbosity=0)
+    if Customer.objects.count() != customers:
+        # Starting over is a lot faster than deleting everything.
+        connection.close()
+        os.remove(database)
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        seeding.seed(customers, banks, accounts_per_customer,
+                     password=PASSWORD)
+        print(f'Seeded { customers } customers in '
+              f'{ time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+    token, _ = Token.objects.get_or_create(
+        user=Customer.objects.get(email=EMAIL)
+    )
+    return token.key
+
+
+def request_kwargs(scenario: Scenario) -> Dict[str, Any]:
+    if scenario.body is None:
+        return {}
+    return {
+        'data': json.dumps(scenario.body),
+        'content_type': 'application/json',
+    }
+
+
+def run_client(scenario: Scenario, token: str,
+               iterations: int) -> Dict[str, Any]:
+    """
+    Runs the scenario sequentially through the Django test client.
+    """
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    headers = { 'HTTP_AUTHORIZATION': f'Token { token }' } \
+        if scenario.authenticated else {}
+    client = Client(**headers)
+    send = getattr(client, scenario.method.lower())
+    kwargs = request_kwargs(scenario)
+
+    send(scenario.path, **kwargs)                       # Warm up caches
+    result = LoadResult()
+    queries: List[int] = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = send(scenario.path, **kwargs)
+            result.latencies.append(time.perf_counter() - start)
+        queries.append(len(context.captured_queries))
+        result.requests += 1
+        result.errors += response.status_code >= 400
+    result.duration = time.perf_counter() - started
+    return { **result.summary(), 'queries': statistics.mean(queries) }
+
+
+def run_server(scenario: Scenario, token: str, port: int,
+               args: argparse.Namespace) -> Dict[str, Any]:
+    headers = { 'Content-Type': 'application/json' }
+    if scenario.authenticated:
+        headers['Authorization'] = f'Token { token }'
+    body = json.dumps(scenario.body).encode() if scenario.body else None
+    result = run_load(
+        f'http://127.0.0.1:{ port }{ scenario.path }',
+        method=scenario.method,
+        headers=headers,
+        body=body,
+        concurrency=args.concurrency,
+        duration=args.duration,
+    )
+    return result.summary()
+
+
+def run(args: argparse.Namespace, token: str) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    scenarios = [scenario for scenario in SCENARIOS
+                 if not args.scenarios or scenario.name in args.scenarios]
+
+    if 'client' in args.drivers:
+        for scenario in scenarios:
+            results.append({
+                'driver': 'client', 'scenario': scenario.name,
+                **run_client(scenario, token, args.iterations),
+            })
+
+    servers = (
+        ('wsgi', args.wsgi, args.wsgi_port),
+        ('asgi', args.asgi, args.asgi_port),
+    )
+    for driver, command, port in servers:
+        if driver not in args.drivers:
+            continue
+        with serve(command, port):
+            for scenario in scenarios:
+                results.append({
+                    'driver': driver, 'scenario': scenario.name,
+                    **run_server(scenario, token, port, args),
+                })
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    """
+    Returns the regressions of `results` relative to `baseline`.
+    """
+    previous = {
+        (result['driver'], result['scenario']): result for result in baseline
+    }
+    regressions: List[str] = []
+    for result in results:
+        name = f"{ result['scenario'] } ({ result['driver'] })"
+        before = previous.get((result['driver'], result['scenario']))
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if result[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f'{ name }: { metric } { before[metric] } '
+                                   f'-> { result[metric] }')
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{ name }: throughput "
+                               f"{ before['throughput'] } -> "
+                               f"{ result['throughput'] }")
+        if result.get('queries', 0) > before.get('queries', 0):
+            regressions.append(f"{ name }: queries { before['queries'] } "
+                               f"-> { result['queries'] }")
+    return regressions
+
+
+def get_metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    commit = subprocess.run(
+        ['git', 'rev-parse', '--short', 'HEAD'],
+        capture_output=True, text=True,
+    ).stdout.strip()
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'customers': args.customers,
+        'banks': args.banks,
+        'accounts_per_customer': args.accounts_per_customer,
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default='benchmark.sqlite3')
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--banks', type=int, default=100)
+    parser.add_argument('--accounts-per-customer', type=int, default=3)
+    parser.add_argument('--scenarios', nargs='*',
+                        choices=[scenario.name for scenario in SCENARIOS])
+    parser.add_argument('--drivers', nargs='+', default=['client'],
+                        choices=['client', 'wsgi', 'asgi'])
+    parser.add_argument('--iterations', type=int, default=500,
+                        help='Requests per scenario through the test client.')
+    parser.add_argument('--wsgi', default=WSGI_COMMAND)
+    parser.add_argument('--wsgi-port', type=int, default=8001)
+    parser.add_argument('--asgi', default=ASGI_COMMAND)
+    parser.add_argument('--asgi-port', type=int, default=8002)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--json', help='Write the results here.')
+    parser.add_argument('--baseline', help='Compare against these results.')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    token = setup(os.path.abspath(args.database), args.customers, args.banks,
+                  args.accounts_per_customer)
+    results = run(args, token)
+
+    print(f"{ 'scenario':<16}{ 'driver':<8}{ 'req/s':>10}{ 'p50 ms':>10}"
+          f"{ 'p90 ms':>10}{ 'p99 ms':>10}{ 'queries':>9}{ 'errors':>8}")
+    for result in results:
+        print(f"{ result['scenario']:<16}{ result['driver']:<8}"
+              f"{ result['throughput']:>10}{ result['p50_ms']:>10}"
+              f"{ result['p90_ms']:>10}{ result['p99_ms']:>10}"
+              f"{ result.get('queries', ''):>9}{ result['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({ 'metadata': get_metadata(args), 'results': results },
+                      output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as input:
+            baseline = json.load(input)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION { regression }')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Compares throughput and tail latency of the sync DRF endpoints served over
+WSGI with their async variants served over ASGI.
+
+Usage (from the repository root, with gunicorn and uvicorn installed):
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 32 --duration 15
+
+The servers are started by the script using the `--wsgi` and `--asgi`
+commands and talk to the database configured in `demo.settings`, into
+which a benchmark customer, bank and active account are inserted.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from benchmarks.loadgen import run_load
+from typing import Any, Dict, Iterator, List
+
+
+WSGI_COMMAND = 'gunicorn demo.wsgi -b 127.0.0.1:8001 -w 4 --threads 4'
+ASGI_COMMAND = 'uvicorn demo.asgi:application --port 8002 --workers 4'
+
+BENCHMARK_EMAIL = 'benchmark@example.com'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+# (name, method, sync path, async path, body)
+SCENARIOS = (
+    ('bank list', 'GET', '/api/banks/', '/async/api/banks/', None),
+    ('active account', 'GET', '/api/bank/', '/async/api/bank/', None),
+    ('token auth', 'POST', '/api-token-auth/', '/async/api-token-auth/',
+     json.dumps({
+         'email': BENCHMARK_EMAIL, 'password': BENCHMARK_PASSWORD,
+     }).encode()),
+)
+
+
+def setup_fixtures() -> str:
+    """
+    Makes sure the benchmark customer exists with an active account and
+    returns their API token.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'demo.settings')
+    import django
+    django.setup()
+
+    from rest_framework.authtoken.models import Token
+    from demoapp.models import Customer, Bank, CustomerBankAccount
+
+    customer = Customer.objects.filter(email=BENCHMARK_EMAIL).first() or \
+        Customer.objects.create_user(
+            email=BENCHMARK_EMAIL,
+            password=BENCHMARK_PASSWORD,
+            first_name='Bench',
+            last_name='Mark',
+            pan_number='BENCH0000B',
+        )
+    bank, _ = Bank.objects.get_or_create(
+        name='Benchmark Bank',
+        defaults={ 'website': 'https://bank.example.com', 'number': '0' },
+    )
+    CustomerBankAccount.objects.get_or_create(
+        ifsc_code='BENC0000001',
+        account_number='0',
+        defaults={
+            'customer': customer,
+            'bank': bank,
+            'branch_name': 'Main',
+            'name_as_per_bank_record': 'Bench Mark',
+            'is_active': True,
+        },
+    )
+    token, _ = Token.objects.get_or_create(user=customer)
+    return token.key
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError):
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f'Server did not start listening on port { port }')
+
+
+@contextlib.contextmanager
+def serve(command: str, port: int) -> Iterator[None]:
+    process = subprocess.Popen(shlex.split(command))
+    try:
+        wait_for_port(port)
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(args: argparse.Namespace, token: str) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    headers = {
+        'Authorization': f'Token { token }',
+        'Content-Type': 'application/json',
+    }
+    servers = (
+        ('wsgi', args.wsgi, args.wsgi_port, 2),     # Sync paths
+        ('asgi', args.asgi, args.asgi_port, 3),     # Async paths
+    )
+    for server, command, port, path_index in servers:
+        with serve(command, port):
+            for scenario in SCENARIOS:
+                name, method, body = scenario[0], scenario[1], scenario[4]
+                result = run_load(
+                    f'http://127.0.0.1:{ port }{ scenario[path_index] }',
+                    method=method,
+                    headers=headers,
+                    body=body,
+                    concurrency=args.concurrency,
+                    duration=args.duration,
+                )
+                results.append({
+                    'server': server, 'scenario': name, **result.summary()
+                })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--wsgi', default=WSGI_COMMAND)
+    parser.add_argument('--wsgi-port', type=int, default=8001)
+    parser.add_argument('--asgi', default=ASGI_COMMAND)
+    parser.add_argument('--asgi-port', type=int, default=8002)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--json', help='Also write the results here.')
+    args = parser.parse_args()
+
+    results = run(args, setup_fixtures())
+
+    print(f"{ 'scenario':<16}{ 'server':<8}{ 'req/s':>10}"
+          f"{ 'p50 ms':>10}{ 'p99 ms':>10}{ 'errors':>8}")
+    for result in sorted(results, key=lambda r: (r['scenario'], r['server'])):
+        print(f"{ result['scenario']:<16}{ result['server']:<8}"
+              f"{ result['throughput']:>10}{ result['p50_ms']:>10}"
+              f"{ result['p99_ms']:>10}{ result['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Measures the per-request cost of each authentication mode: the database
+token without and with the token cache, and the signed (JWT) access token.
+
+Usage (from the repository root):
+
+    python -m benchmarks.auth_modes --customers 10000
+
+Only `authenticate()` is timed, on requests built with `RequestFactory`,
+so the numbers are the authentication overhead alone. The database is
+prepared like for `benchmarks.api`.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+
+def measure(authenticate: Callable[[], Any], iterations: int,
+            reset: Callable[[], None]) -> Dict[str, Any]:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    authenticate()                                      # Warm up caches
+    latencies: List[float] = []
+    queries: List[int] = []
+    for _ in range(iterations):
+        reset()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            authenticate()
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(context.captured_queries))
+    latencies.sort()
+    return {
+        'p50_us': round(latencies[len(latencies) // 2] * 1e6, 1),
+        'p99_us': round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+        'queries': statistics.mean(queries),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default='benchmark.sqlite3')
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--banks', type=int, default=100)
+    parser.add_argument('--accounts-per-customer', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=5000)
+    args = parser.parse_args()
+
+    from benchmarks.api import EMAIL, setup
+    key = setup(os.path.abspath(args.database), args.customers, args.banks,
+                args.accounts_per_customer)
+
+    from django.test import RequestFactory
+    from demoapp import authentication, tokens
+    from demoapp.models import Customer
+
+    access = tokens.get_tokens(Customer.objects.get(email=EMAIL))['access']
+    factory = RequestFactory()
+    token_request = factory.get('/', HTTP_AUTHORIZATION=f'Token { key }')
+    jwt_request = factory.get('/', HTTP_AUTHORIZATION=f'Bearer { access }')
+    token_auth = authentication.CachingTokenAuthentication()
+    jwt_auth = tokens.StatelessJWTAuthentication()
+
+    def no_reset() -> None:
+        pass
+
+    modes = (
+        ('db token', lambda: token_auth.authenticate(token_request),
+         authentication.token_cache.clear),
+        ('db token (cached)', lambda: token_auth.authenticate(token_request),
+         no_reset),
+        ('jwt', lambda: jwt_auth.authenticate(jwt_request), no_reset),
+    )
+
+    print(f"{ 'mode':<20}{ 'p50 us':>10}{ 'p99 us':>10}{ 'queries':>9}")
+    for name, authenticate, reset in modes:
+        result = measure(authenticate, args.iterations, reset)
+        print(f"{ name:<20}{ result['p50_us']:>10}{ result['p99_us']:>10}"
+              f"{ result['queries']:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
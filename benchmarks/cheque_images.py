@@ -0,0 +1,88 @@
+"""
+Measures the throughput of cheque image processing on a batch of
+synthetic phone-sized photos, with an increasing number of worker
+threads.
+
+Usage (from the repository root):
+
+    python -m benchmarks.cheque_images --images 50 --workers 1 2 4
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    """
+    A noisy gradient, which compresses about as badly as a real photo.
+    """
+    from PIL import Image
+
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), rng.uniform(20, 60))
+    image = Image.merge('RGB', (gradient, noise, gradient.rotate(180)))
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=92)
+    return output.getvalue()
+
+
+def run(photos: List[bytes], workers: int) -> Dict[str, Any]:
+    from demoapp.cheques import process_image
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        processed = list(executor.map(
+            lambda photo: process_image(io.BytesIO(photo)), photos
+        ))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'workers': workers,
+        'images': len(photos),
+        'seconds': round(elapsed, 3),
+        'images_per_second': round(len(photos) / elapsed, 2),
+        'input_mb': round(sum(map(len, photos)) / 2**20, 2),
+        'output_mb': round(
+            sum(len(p.image) + len(p.thumbnail) for p in processed) / 2**20, 2
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--json', help='Also write the results here.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'demo.settings')
+    import django
+    django.setup()
+
+    photos = [make_photo(args.width, args.height, seed)
+              for seed in range(args.images)]
+    results = [run(photos, workers) for workers in args.workers]
+
+    print(f"{ 'workers':>8}{ 'images/s':>10}{ 'seconds':>10}"
+          f"{ 'in MB':>9}{ 'out MB':>9}")
+    for result in results:
+        print(f"{ result['workers']:>8}{ result['images_per_second']:>10}"
+              f"{ result['seconds']:>10}{ result['input_mb']:>9}"
+              f"{ result['output_mb']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
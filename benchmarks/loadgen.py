@@ -0,0 +1,104 @@
+"""
+A small closed-loop HTTP load generator.
+
+Each of `concurrency` threads keeps one keep-alive connection open and
+sends the next request as soon as the previous one was answered, for
+`duration` seconds. Only the standard library is used so benchmarks can
+run anywhere the demo runs.
+"""
+import http.client
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+from typing import Dict, List, Optional
+
+
+@dataclass
+class LoadResult:
+    requests: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns the latency percentile in milliseconds.
+        """
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1,
+                    int(round(percent / 100 * (len(latencies) - 1))))
+        return latencies[index] * 1000
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'throughput': round(self.throughput, 1),
+            'p50_ms': round(self.percentile(50), 2),
+            'p90_ms': round(self.percentile(90), 2),
+            'p99_ms': round(self.percentile(99), 2),
+        }
+
+
+def run_load(
+    url: str,
+    method: str = 'GET',
+    headers: Optional[Dict[str, str]] = None,
+    body: Optional[bytes] = None,
+    concurrency: int = 16,
+    duration: float = 10.0,
+    warmup: float = 1.0,
+) -> LoadResult:
+    parts = urlsplit(url)
+    path = parts.path + (f'?{ parts.query }' if parts.query else '')
+    result = LoadResult()
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker() -> None:
+        connection = http.client.HTTPConnection(parts.hostname, parts.port)
+        latencies: List[float] = []
+        requests = errors = 0
+        while True:
+            start = time.monotonic()
+            if start >= deadline:
+                break
+            try:
+                connection.request(method, path, body=body,
+                                   headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname,
+                                                        parts.port)
+                failed = True
+            end = time.monotonic()
+            if start >= measure_from:
+                requests += 1
+                errors += failed
+                latencies.append(end - start)
+        connection.close()
+        with lock:
+            result.requests += requests
+            result.errors += errors
+            result.latencies.extend(latencies)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result.duration = duration
+    return result
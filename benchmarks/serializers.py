@@ -0,0 +1,98 @@
+"""
+Measures the per-object cost of serializing and rendering the hot read
+endpoints' data: DRF's serializers against the compiled ones (see
+`demoapp.compiled_serializers`), rendered by `JSONRenderer` and by
+`FastJSONRenderer`.
+
+Usage (from the repository root):
+
+    python -m benchmarks.serializers --customers 10000
+
+The objects (or `values()` rows) are loaded once, only serializing and
+rendering are timed. The database is prepared like for `benchmarks.api`.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, List
+
+
+def measure(run: Callable[[], Any], objects: int, repeat: int) -> float:
+    """
+    Returns the best time per object, in microseconds, of `repeat` runs.
+    """
+    run()                                               # Warm up caches
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) / objects * 1e6, 2)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default='benchmark.sqlite3')
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--banks', type=int, default=100)
+    parser.add_argument('--accounts-per-customer', type=int, default=3)
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    from benchmarks.api import setup
+    setup(os.path.abspath(args.database), args.customers, args.banks,
+          args.accounts_per_customer)
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.request import Request
+    from demoapp.compiled_serializers import compile_serializer
+    from demoapp.models import Bank, Customer, CustomerBankAccount
+    from demoapp.renderers import FastJSONRenderer
+    from demoapp.serializers import (
+        BankSerializer, CustomerBankAccountSerializer, CustomerSerializer,
+    )
+
+    request = Request(APIRequestFactory().get('/'))
+    json_renderer = JSONRenderer()
+    fast_renderer = FastJSONRenderer()
+    cases = (
+        ('customer', CustomerSerializer, Customer.objects.all()),
+        ('bank', BankSerializer, Bank.objects.all()),
+        ('account', CustomerBankAccountSerializer,
+         CustomerBankAccount.objects.select_related('bank')),
+    )
+
+    print(f"{ 'object':<10}{ 'drf+json':>11}{ 'drf+orjson':>12}"
+          f"{ 'compiled+json':>15}{ 'compiled+orjson':>17}   (us/object)")
+    for name, serializer_class, queryset in cases:
+        compiled = compile_serializer(serializer_class)
+        instances = list(queryset.order_by('pk')[:args.objects])
+        rows = list(
+            queryset.order_by('pk').values(*compiled.get_values())
+            [:args.objects]
+        )
+        context = { 'request': request }
+
+        def drf(render: Callable[[Any], bytes]) -> Callable[[], Any]:
+            return lambda: render(serializer_class(
+                instances, many=True, context=context
+            ).data)
+
+        def fast(render: Callable[[Any], bytes]) -> Callable[[], Any]:
+            return lambda: render(compiled.to_representations(rows, request))
+
+        timings = [
+            measure(run(render), len(instances), args.repeat)
+            for run in (drf, fast)
+            for render in (json_renderer.render, fast_renderer.render)
+        ]
+        print(f"{ name:<10}{ timings[0]:>11}{ timings[1]:>12}"
+              f"{ timings[2]:>15}{ timings[3]:>17}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+Settings for the API benchmarks: `demo.settings` on a dedicated SQLite
+database (`BENCHMARK_DATABASE`), without debug mode and without the login
+throttles, which would otherwise turn most benchmark logins into 429s.
+`BENCHMARK_WARMUP=0` turns the startup warmup off, see `benchmarks.startup`.
+"""
+import os
+from demo.settings import *                             # noqa: F401, F403
+from demo.settings import BASE_DIR, REST_FRAMEWORK, WARMUP
+
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'BENCHMARK_DATABASE', str(BASE_DIR / 'benchmark.sqlite3')
+        ),
+    }
+}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': None,
+        'login_email': None,
+    },
+}
+
+PROFILING = {
+    'SAMPLE_RATE': 0.0,
+}
+
+WARMUP = {
+    **WARMUP,
+    'ON_STARTUP': os.environ.get('BENCHMARK_WARMUP', '1') == '1',
+}
@@ -0,0 +1,133 @@
+"""
+Measures how long a fresh worker takes to start: the time to import the
+WSGI application, and then to answer its first requests, with and without
+the warmup of `demoapp.warmup`.
+
+Usage (from the repository root):
+
+    python -m benchmarks.startup --customers 10000 --runs 10
+
+Every run starts a new interpreter which imports `demo.wsgi` and calls
+the application directly, without a server, for each of `PATHS` twice:
+the first call is what the first request of a worker costs, the second
+one the steady state. The database is prepared like for `benchmarks.api`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+
+# (path, authenticated)
+PATHS = (
+    ('/api/bank/', True),
+    ('/api/banks/', False),
+)
+
+
+def call(application: Any, path: str, token: str) -> float:
+    from wsgiref.util import setup_testing_defaults
+
+    environ: Dict[str, Any] = { 'PATH_INFO': path }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Token { token }'
+    setup_testing_defaults(environ)
+    statuses: List[str] = []
+    start = time.perf_counter()
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    b''.join(response)
+    response.close()
+    elapsed = time.perf_counter() - start
+    if not statuses[0].startswith('200'):
+        raise RuntimeError(f'{ path } answered { statuses[0] }')
+    return elapsed
+
+
+def child(token: str) -> Dict[str, Any]:
+    """
+    Runs in the fresh interpreter, the environment is set by `run()`.
+    """
+    start = time.perf_counter()
+    from demo.wsgi import application
+    result: Dict[str, Any] = {
+        'import_ms': (time.perf_counter() - start) * 1000,
+        'modules': len(sys.modules),
+    }
+    for path, authenticated in PATHS:
+        key = token if authenticated else ''
+        result[f'{ path } first_ms'] = call(application, path, key) * 1000
+        result[f'{ path } next_ms'] = call(application, path, key) * 1000
+    result['admin_loaded'] = 'demoapp.admin' in sys.modules
+    return result
+
+
+def run(database: str, token: str, warmup: bool) -> Dict[str, Any]:
+    environ = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+        'BENCHMARK_DATABASE': database,
+        'BENCHMARK_WARMUP': '1' if warmup else '0',
+    }
+    process = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child', token],
+        env=environ, capture_output=True, text=True, check=True,
+    )
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', default='benchmark.sqlite3')
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--banks', type=int, default=100)
+    parser.add_argument('--accounts-per-customer', type=int, default=3)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--child', metavar='TOKEN', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(child(args.child)))
+        return 0
+
+    from benchmarks.api import setup
+    database = os.path.abspath(args.database)
+    token = setup(database, args.customers, args.banks,
+                  args.accounts_per_customer)
+
+    metrics = ['import_ms'] + [
+        f'{ path } { step }_ms' for path, _ in PATHS
+        for step in ('first', 'next')
+    ]
+    print(f"{ 'median of ' + str(args.runs) + ' runs':<26}"
+          f"{ 'cold':>10}{ 'warmed up':>12}")
+    results = {
+        warmup: [run(database, token, warmup) for _ in range(args.runs)]
+        for warmup in (False, True)
+    }
+    for metric in metrics + ['to first response_ms']:
+        medians = []
+        for warmup in (False, True):
+            if metric == 'to first response_ms':
+                values = [
+                    result['import_ms'] + result[f'{ PATHS[0][0] } first_ms']
+                    for result in results[warmup]
+                ]
+            else:
+                values = [result[metric] for result in results[warmup]]
+            medians.append(statistics.median(values))
+        print(f"{ metric[:-3] + ' (ms)':<26}{ medians[0]:>10.1f}"
+              f"{ medians[1]:>12.1f}")
+    print(f"{ 'admin imported':<26}"
+          f"{ str(results[False][0]['admin_loaded']):>10}"
+          f"{ str(results[True][0]['admin_loaded']):>12}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+"""
+The admin's URLs, imported by the first request to `/admin/` (or the
+first `reverse()`), see `demo.apps.LazyAdminConfig`.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+app_name = 'admin'
+
+urlpatterns = admin.site.get_urls()
@@ -0,0 +1,21 @@
+from django.contrib.admin import autodiscover
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    """
+    The admin, with the apps' `admin` modules imported by the first
+    request to `/admin/` (see `demo.admin_urls`) instead of at startup.
+    The system checks import them too, so that they are still checked.
+    """
+
+    def ready(self) -> None:
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_autodiscovered_admin_app, checks.Tags.admin)
+
+
+def check_autodiscovered_admin_app(app_configs, **kwargs):
+    autodiscover()
+    return check_admin_app(app_configs, **kwargs)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -32,7 +33,8 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Imports the admin modules on the first request to /admin/
+    'demo.apps.LazyAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -44,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'demoapp.middleware.RequestLoggingMiddleware',
+    'demoapp.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,7 +93,7 @@ DATABASES = {
 # https://docs.djangoproject.com/en/4.1/ref/settings/#authentication-backends
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    'demoapp.backends.PooledPasswordBackend',
     'rest_framework.authentication.TokenAuthentication',
 ]
 
@@ -121,11 +125,130 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'demoapp.authentication.CachingTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES':(
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '10/min',
+    },
+    'EXCEPTION_HANDLER': 'demoapp.views.exception_handler',
+}
+
+
+# Resolved API tokens are cached in-process for `TTL` seconds, bounded to
+# `MAXSIZE` entries. A deleted token or deactivated customer is only
+# dropped from the cache of the process handling the change, the others
+# keep accepting the token for up to `TTL` seconds. Set `BACKEND` to a
+# `CACHES` alias to also share them between worker processes, for
+# `SHARED_TTL` seconds (shared entries are invalidated everywhere).
+
+TOKEN_AUTH_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 5,
+    'BACKEND': None,
+    'SHARED_TTL': 300,
+}
+
+
+# API tokens (`/api-token-auth/`) expire `AUTH_TOKEN_TTL` seconds after they
+# were created, logging in again replaces an expired token. `None` keeps
+# them forever.
+
+AUTH_TOKEN_TTL = 30 * 24 * 60 * 60
+
+
+# Short-lived signed access tokens (`/api-token-auth/jwt/`), verified
+# without loading the customer. Refresh tokens are single use: refreshing
+# returns a new one. Revoked tokens are kept by the `JWT_DENYLIST` `STORE`
+# until they expire: `DatabaseDenylist` in the database, purged by
+# `manage.py purge_revoked_tokens`, or `CacheDenylist` in the `BACKEND`
+# cache, which has to be shared by all workers (the default per-process
+# cache is not).
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': False,
+    'UPDATE_LAST_LOGIN': False,
+}
+
+JWT_DENYLIST = {
+    'STORE': 'demoapp.tokens.DatabaseDenylist',
+    'BACKEND': 'default',
+}
+
+
+# Password hashing runs on a pool of `WORKERS` threads. Logins and signups
+# are rejected with a 503 once `MAX_PENDING` more are queued.
+
+PASSWORD_HASHING = {
+    'WORKERS': 4,
+    'MAX_PENDING': 16,
+}
+
+
+# A `SAMPLE_RATE` share of the requests is profiled (query count, database
+# and serializer time, latency). Requests running the same query at least
+# `N_PLUS_ONE_THRESHOLD` times are flagged as N+1 patterns.
+
+PROFILING = {
+    'SAMPLE_RATE': 0.1,
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'N_PLUS_ONE_SAMPLES': 50,
+}
+
+
+# The bank directory's version (its ETag) and rendered JSON responses are
+# kept in the `BACKEND` cache for up to `TIMEOUT` seconds. Point it at a
+# cache shared between worker processes so they all see bank changes.
+
+BANK_DIRECTORY_CACHE = {
+    'BACKEND': 'default',
+    'TIMEOUT': 60,
+}
+
+
+# Each customer's serialized active account is kept in the `BACKEND` cache
+# for up to `TIMEOUT` seconds, and invalidated whenever their accounts
+# change. The backend has to be shared by all worker processes: with a
+# per-process one, like the default `LocMemCache`, nothing is cached.
+
+ACTIVE_ACCOUNT_CACHE = {
+    'BACKEND': 'default',
+    'TIMEOUT': 300,
+}
+
+
+# Account writes sent with an `Idempotency-Key` header are answered once,
+# retries get the response kept by `STORE` for `TTL` seconds, see
+# `demoapp.idempotency`. `DatabaseStore` keeps responses in the database,
+# purged by `manage.py purge_idempotency_keys`; `CacheStore` in the
+# `BACKEND` cache, which has to be shared by all workers (the default
+# per-process cache is not). A request that never finishes holds its key
+# for `LOCK_TIMEOUT` seconds.
+
+IDEMPOTENCY = {
+    'STORE': 'demoapp.idempotency.DatabaseStore',
+    'BACKEND': 'default',
+    'TTL': 24 * 60 * 60,
+    'LOCK_TIMEOUT': 60,
+}
+
+
+# Customers are searched by the words of their name, email and PAN, each
+# query word (of at least `MIN_TERM_LENGTH` characters, `MAX_TERMS` at
+# most) matching the start of one, see `demoapp.customer_search`. Words
+# matching `SELECTIVE_BELOW` words or more are checked customer by
+# customer rather than used to look customers up.
+
+CUSTOMER_SEARCH = {
+    'MIN_TERM_LENGTH': 2,
+    'MAX_TERMS': 4,
+    'SELECTIVE_BELOW': 1000,
 }
 
 
@@ -137,21 +260,55 @@ LANGUAGE_CODE = 'en-us'
 
 #  A logging configuration dictionary.
 # https://docs.djangoproject.com/en/4.1/ref/settings/#logging
+#
+# Records are written as JSON lines by background threads, requests only
+# queue them, see `demoapp.logs`. SQL queries (logged when `DEBUG` is on)
+# and the access log are sampled, warnings and errors are always kept.
+# Account activations and verifications go to a separate audit log.
 
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'context': {
+            '()': 'demoapp.logs.ContextFilter',
+        },
+        'sample_queries': {
+            '()': 'demoapp.logs.SamplingFilter',
+            'rate': 0.01,
+        },
+        'sample_requests': {
+            '()': 'demoapp.logs.SamplingFilter',
+            'rate': 0.1,
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'demoapp.logs.JSONFormatter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
         'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'demoapp.logs.QueueHandler',
+            'target': 'logging.handlers.RotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs/demoapp.log'),
-            'maxBytes': 100*1024,
+            'maxBytes': 10*1024*1024,
             'backupCount': 5,
             'level': 'DEBUG',
-            #'formatter': 'verbose',
+            'formatter': 'json',
+            'filters': ['context'],
+        },
+        'audit': {
+            'class': 'demoapp.logs.QueueHandler',
+            'target': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs/audit.log'),
+            'maxBytes': 10*1024*1024,
+            'backupCount': 20,
+            'formatter': 'json',
+            'filters': ['context'],
         },
     },
     'loggers': {
@@ -160,10 +317,19 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'demoapp.requests': {
+            'filters': ['sample_requests'],
+        },
+        'demoapp.audit': {
+            'handlers': ['audit'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'django.db.backends': {
             'handlers': ['file'],
             'level': 'DEBUG',
-            'propagate': True,
+            'filters': ['sample_queries'],
+            'propagate': False,
         },
     },
 }
@@ -185,6 +351,75 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = "/media/"
 
 
+# Uploads are always streamed to a temporary file instead of being held in
+# memory.
+# https://docs.djangoproject.com/en/4.1/ref/settings/#file-upload-handlers
+
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+CHEQUE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+
+# Uploaded cheque images are recompressed, thumbnailed and hashed by
+# `WORKERS` background threads, see `demoapp.cheques`.
+
+CHEQUE_PROCESSING = {
+    'WORKERS': 2,
+    'QUEUE_SIZE': 1000,
+    'MAX_DIMENSION': 2000,
+    'THUMBNAIL_SIZE': 320,
+    'JPEG_QUALITY': 85,
+}
+
+
+# Admin changelists of tables estimated to hold more than
+# `ESTIMATE_COUNT_ABOVE` rows show the estimate instead of counting them,
+# see `demoapp.pagination.LargeTablePaginator`.
+
+ADMIN_PAGINATION = {
+    'ESTIMATE_COUNT_ABOVE': 100000,
+}
+
+
+# The list and detail reads of customers, banks and the active account
+# serialize `values()` rows through compiled serializers, see
+# `demoapp.compiled_serializers`. Disabling goes back to the serializers.
+
+COMPILED_SERIALIZERS = {
+    'ENABLED': True,
+}
+
+
+# The WSGI and ASGI entry points resolve `PATHS`, build their serializers
+# and connect to the databases before the first request, see
+# `demoapp.warmup`. `manage.py warmup` reports how long that takes.
+
+WARMUP = {
+    'ON_STARTUP': True,
+    'PATHS': (
+        '/api/bank/', '/api/banks/', '/api/banks/1/', '/api/customers/',
+        '/api/customers/1/', '/api-token-auth/', '/api-token-auth/jwt/',
+    ),
+}
+
+
+# Pending e-verification accounts are claimed `BATCH_SIZE` at a time by
+# `manage.py verify_accounts` and checked by `VERIFIER` on `WORKERS`
+# threads, giving up on a batch's stragglers after `TIMEOUT` seconds. The
+# claims of a worker that died expire after `CLAIM_TIMEOUT` seconds, keep
+# it above `TIMEOUT`.
+
+VERIFICATION = {
+    'VERIFIER': 'demoapp.verification.StubVerifier',
+    'BATCH_SIZE': 100,
+    'WORKERS': 8,
+    'TIMEOUT': 30,
+    'CLAIM_TIMEOUT': 120,
+}
+
+
 TIME_ZONE = 'UTC'
 
 USE_I18N = True
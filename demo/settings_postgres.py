@@ -0,0 +1,93 @@
+"""
+Production profile: PostgreSQL with persistent connections and, optionally,
+a read replica.
+
+    DJANGO_SETTINGS_MODULE=demo.settings_postgres
+
+Needs `psycopg` (`pip install "psycopg[binary]"`). The databases are
+configured through the environment:
+
+* `DATABASE_NAME`, `DATABASE_USER`, `DATABASE_PASSWORD`, `DATABASE_HOST`
+  and `DATABASE_PORT` for the primary,
+* `DATABASE_REPLICA_HOST` (and `DATABASE_REPLICA_PORT`) to add a read
+  replica, see `demoapp.db_routers`,
+* `DATABASE_CONN_MAX_AGE`, the seconds a worker keeps its connection open
+  (60 by default). Connections are health checked before being reused.
+* `DATABASE_POOL=pgbouncer` when connecting through PgBouncer in
+  transaction pooling mode. Server-side cursors do not survive from one
+  transaction to the next there, so they are disabled and `.iterator()`
+  (used by the exports) fetches in chunks client-side instead.
+
+The cache is shared by all workers, as the replica pins and the cached
+bank directory and active accounts need: Redis when `CACHE_REDIS_URL` is
+set (needs `redis`), else a table of the primary database, created by
+`manage.py createcachetable`.
+"""
+import os
+from demo.settings import *                             # noqa: F401, F403
+from demo.settings import MIDDLEWARE
+
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+
+DATABASE_POOL = os.environ.get('DATABASE_POOL', 'persistent')
+
+
+def database(host: str, port: str) -> dict:
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DATABASE_NAME', 'demo'),
+        'USER': os.environ.get('DATABASE_USER', 'demo'),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_POOL == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': 5,
+        },
+    }
+
+
+DATABASES = {
+    'default': database(
+        os.environ.get('DATABASE_HOST', 'localhost'),
+        os.environ.get('DATABASE_PORT', '5432'),
+    ),
+}
+
+if os.environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **database(
+            os.environ['DATABASE_REPLICA_HOST'],
+            os.environ.get('DATABASE_REPLICA_PORT', '5432'),
+        ),
+        # Tests run against the primary alone.
+        'TEST': { 'MIRROR': 'default' },
+    }
+
+DATABASE_ROUTERS = ['demoapp.db_routers.ReplicaRouter']
+
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'demo_cache',
+        },
+    }
+
+# After the logging and profiling middleware, so routing is part of what
+# they measure
+MIDDLEWARE = [
+    *MIDDLEWARE[:2],
+    'demoapp.middleware.ReplicaRoutingMiddleware',
+    *MIDDLEWARE[2:],
+]
@@ -0,0 +1,33 @@
+"""
+Local stand-in for `demo.settings_postgres` with a read replica, using two
+SQLite files. Nothing replicates between them on its own:
+
+    DJANGO_SETTINGS_MODULE=demo.settings_replica python manage.py migrate
+    DJANGO_SETTINGS_MODULE=demo.settings_replica python manage.py sync_replica
+
+copies the primary over the replica, so running `sync_replica` now and then
+simulates replication lag.
+"""
+from demo.settings import *                             # noqa: F401, F403
+from demo.settings import BASE_DIR, MIDDLEWARE
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'TEST': { 'MIRROR': 'default' },
+    },
+}
+
+DATABASE_ROUTERS = ['demoapp.db_routers.ReplicaRouter']
+
+MIDDLEWARE = [
+    *MIDDLEWARE[:2],
+    'demoapp.middleware.ReplicaRoutingMiddleware',
+    *MIDDLEWARE[2:],
+]
@@ -13,12 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import URLResolver, path, include
+from django.urls.resolvers import RoutePattern
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # `include()` would import the admin right away, the resolver imports
+    # it once a path under `admin/` is resolved.
+    URLResolver(RoutePattern('admin/'), 'demo.admin_urls',
+                app_name='admin', namespace='admin'),
     path('', include('demoapp.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
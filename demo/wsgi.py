@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'demo.settings')
 
 application = get_wsgi_application()
+
+# Warms up before the first request, and before the workers are forked
+# when the server loads the application first (`gunicorn --preload`), see
+# `demoapp.warmup`.
+from demoapp import warmup                              # noqa: E402
+
+warmup.preload()
@@ -0,0 +1,129 @@
+"""
+Caching of each customer's serialized active account, the most frequent
+read of the API.
+
+Entries live in the `ACTIVE_ACCOUNT_CACHE['BACKEND']` cache under a key
+made of two generations: one per customer, replaced whenever one of their
+accounts changes, and a global one, replaced whenever a bank changes (the
+representation carries the bank's logo). Invalidating means writing a new
+generation after the commit. `get()` reads the generations before the
+account is read from the database and `store()` caches under the key it
+returned, so a request that read the old account before a concurrent
+write can only cache it under a generation nobody reads any more. Writes
+do not cache their responses for the same reason: their key could only
+be read after the commit, once another write may have come in between.
+This works the same across worker processes, as long as they share the
+cache backend: with a per-process backend (`LocMemCache`, Django's default)
+other workers would go on serving an account after it changed, so nothing
+is cached then.
+
+Account saves and deletes invalidate through `demoapp.signals`, which
+covers `activate()`, serializer updates and the admin. Queryset updates
+bypass the signals and have to call `invalidate()` themselves, as
+`CustomerBankAccount.deactivate_active_account()` does.
+"""
+import hashlib
+import secrets
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+from demoapp.cache import is_per_process
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+ACTIVE_ACCOUNT_CACHE: Dict[str, Any] = {
+    'BACKEND': 'default',
+    'TIMEOUT': 300,
+    **getattr(settings, 'ACTIVE_ACCOUNT_CACHE', {}),
+}
+
+GLOBAL_GENERATION_KEY = 'demoapp:active-account:generation'
+
+
+def get_cache() -> Optional[BaseCache]:
+    cache = caches[ACTIVE_ACCOUNT_CACHE['BACKEND']]
+    return None if is_per_process(cache) else cache
+
+
+def get_generation_key(customer_id: Any) -> str:
+    return f'demoapp:active-account:{ customer_id }:generation'
+
+
+def new_generation() -> str:
+    return secrets.token_hex(8)
+
+
+def get_generations(cache: BaseCache, customer_id: Any) -> str:
+    keys = (GLOBAL_GENERATION_KEY, get_generation_key(customer_id))
+    generations = cache.get_many(keys)
+    if len(generations) < len(keys):
+        # `add()`, so concurrent first readers agree on the generation.
+        for key in keys:
+            if key not in generations:
+                cache.add(key, new_generation(), None)
+        generations = cache.get_many(keys)
+    return ':'.join(generations.get(key, '') for key in keys)
+
+
+def get_data_key(cache: BaseCache, customer_id: Any, variant: str) -> str:
+    """
+    `variant` tells apart representations of the same account, such as
+    the absolute URLs built for different hosts.
+    """
+    digest = hashlib.sha1(variant.encode()).hexdigest()
+    return f'demoapp:active-account:{ customer_id }:' \
+           f'{ get_generations(cache, customer_id) }:{ digest }'
+
+
+def get(customer_id: Any,
+        variant: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Returns the key of the customer's active account, to be passed to
+    `store()` when it is not cached, along with the cached representation.
+    Has to be called before the account is read from the database. The key
+    is `None` when the cache is not in use.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None, None
+    key = get_data_key(cache, customer_id, variant)
+    return key, cache.get(key)
+
+
+def store(key: Optional[str], data: Dict[str, Any]) -> None:
+    """
+    Caches the representation under the key given by `get()`, once the
+    current transaction commits.
+    """
+    cache = get_cache()
+    if key is None or cache is None:
+        return
+    data = dict(data)
+    transaction.on_commit(lambda: cache.set(
+        key, data, ACTIVE_ACCOUNT_CACHE['TIMEOUT']
+    ))
+
+
+def invalidate(customer_id: Any) -> None:
+    invalidate_many((customer_id,))
+
+
+def invalidate_many(customer_ids: Iterable[Any]) -> None:
+    """
+    Drops the cached active accounts of the customers once the current
+    transaction commits.
+    """
+    cache = get_cache()
+    keys = [get_generation_key(customer_id) for customer_id in customer_ids]
+    if keys and cache is not None:
+        transaction.on_commit(lambda: cache.set_many(
+            { key: new_generation() for key in keys }, None
+        ))
+
+
+def invalidate_all() -> None:
+    cache = get_cache()
+    if cache is not None:
+        transaction.on_commit(lambda: cache.set(
+            GLOBAL_GENERATION_KEY, new_generation(), None
+        ))
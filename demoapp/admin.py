@@ -1,9 +1,50 @@
+import re
 from django.contrib import admin
+from django.db.models import QuerySet
 from django.http.request import HttpRequest
+from demoapp import customer_search
+from demoapp.exports import export_accounts, export_customers
 from demoapp.models import Customer, Bank, CustomerBankAccount
+from demoapp.pagination import LargeTablePaginator
+from typing import Callable, NamedTuple, Optional, Tuple
+
+
+class ExactSearch(NamedTuple):
+    """
+    Search terms fully matching `pattern` are looked up on `field`, as
+    typed and normalized, which an index can serve.
+    """
+    pattern: str
+    field: str
+    normalize: Callable[[str], str] = str
 
 
 class ReadOnlyModelAdmin(admin.ModelAdmin):
+    paginator = LargeTablePaginator
+    # Filtered listings are counted once, without also counting the whole
+    # table for the "N total" link.
+    show_full_result_count = False
+    # Tried before `search_fields`, which the admin matches with LIKE.
+    exact_search: Tuple[ExactSearch, ...] = ()
+    # The customer searched through `demoapp.customer_search`, after
+    # `exact_search` and before `search_fields`.
+    customer_search_field: Optional[str] = None
+
+    def get_search_results(
+        self, request: HttpRequest, queryset: QuerySet, search_term: str
+    ) -> Tuple[QuerySet, bool]:
+        term = search_term.strip()
+        for search in self.exact_search:
+            if re.fullmatch(search.pattern, term):
+                return queryset.filter(**{
+                    f'{ search.field }__in': { term, search.normalize(term) }
+                }), False
+        if self.customer_search_field is not None:
+            found = customer_search.search(queryset, term,
+                                           self.customer_search_field)
+            if found is not None:
+                return found, False
+        return super().get_search_results(request, queryset, search_term)
 
     def has_add_permission(self, request: HttpRequest) -> bool:
         return False
@@ -15,19 +56,48 @@ class ReadOnlyModelAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.action(description='Export selected customers as NDJSON')
+def export_customers_ndjson(modeladmin, request, queryset):
+    return export_customers(queryset, 'ndjson')
+
+
+@admin.action(description='Export selected customers as CSV')
+def export_customers_csv(modeladmin, request, queryset):
+    return export_customers(queryset, 'csv')
+
+
+@admin.action(description='Export selected accounts as NDJSON')
+def export_accounts_ndjson(modeladmin, request, queryset):
+    return export_accounts(queryset, 'ndjson')
+
+
+@admin.action(description='Export selected accounts as CSV')
+def export_accounts_csv(modeladmin, request, queryset):
+    return export_accounts(queryset, 'csv')
+
+
 class CustomerAdmin(ReadOnlyModelAdmin):
     ordering = ('email',)
     list_display = (
         'id', 'email', 'first_name', 'last_name', 'middle_name', 'pan_number',
         'is_staff', 'is_active',
     )
-    search_fields = (
-        'email', 'first_name', 'last_name', 'middle_name', 'pan_number',
+    exact_search = (
+        ExactSearch(r'[A-Za-z]{5}[0-9]{4}[A-Za-z]', 'pan_number', str.upper),
+        ExactSearch(r'[^@\s]+@[^@\s]+', 'email',
+                    Customer.objects.normalize_email),
     )
+    customer_search_field = 'pk'
+    # Only for terms too short for the search index. Prefix matches, a
+    # LIKE 'x%' scan stops early unlike LIKE '%x%'.
+    search_fields = ('^email', '^first_name', '^last_name',)
+    actions = (export_customers_ndjson, export_customers_csv,)
 
 
 class BankAdmin(ReadOnlyModelAdmin):
-    ordering = ('name',)
+    # With the primary key the ordering is deterministic, otherwise the
+    # admin appends `-pk` and `bank_name_idx` cannot be used for it.
+    ordering = ('name', 'id',)
     list_display = ('id', 'name', 'website', 'number', 'logo',)
 
 
@@ -36,8 +106,19 @@ class CustomerBankAccountAdmin(ReadOnlyModelAdmin):
         'id', 'customer', 'bank', 'account_number', 'ifsc_code',
         'is_cheque_verified', 'account_type', 'is_active',
     )
+    # The customer and bank of each row, in the page's query.
+    list_select_related = ('customer', 'bank',)
     list_filter = ('bank', 'is_cheque_verified', 'account_type',)
-    search_fields = ('customer__email', 'bank__name', 'account_number',)
+    exact_search = (
+        ExactSearch(r'[0-9]{6,18}', 'account_number'),
+        ExactSearch(r'[A-Za-z]{5}[0-9]{4}[A-Za-z]', 'customer__pan_number',
+                    str.upper),
+        ExactSearch(r'[^@\s]+@[^@\s]+', 'customer__email',
+                    Customer.objects.normalize_email),
+    )
+    # Banks are picked with the filter instead.
+    search_fields = ('^customer__email', '^account_number',)
+    actions = (export_accounts_ndjson, export_accounts_csv,)
 
 
 admin.site.register(Customer, CustomerAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DemoappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'demoapp'
+
+    def ready(self) -> None:
+        from demoapp import signals     # noqa: F401
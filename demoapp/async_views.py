@@ -0,0 +1,258 @@
+"""
+ASGI-native variants of the busiest endpoints.
+
+DRF views are synchronous, so under an ASGI server each request to them
+costs a hop to the sync thread. The views below are plain Django async
+views using the async ORM instead. They mirror their counterparts in
+`demoapp.views` and are routed next to them under `async/`.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.db import OperationalError
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, renderers, status
+from rest_framework.authentication import get_authorization_header
+from rest_framework_simplejwt.models import TokenUser
+from demoapp import hashing
+from demoapp.authentication import (
+    CachingTokenAuthentication, aget_or_rotate_token
+)
+from demoapp.models import Customer, Bank, CustomerBankAccount
+from demoapp.pagination import KeysetPagination
+from demoapp.views import ObtainAuthTokenWithEmail
+from demoapp.serializers import (
+    AuthEmailTokenSerializer,
+    BankSerializer,
+    CustomerBankAccountSerializer,
+)
+from demoapp.tokens import StatelessJWTAuthentication
+from typing import Any, Dict, Union
+
+
+json_renderer = renderers.JSONRenderer()
+
+
+def json_response(data: Any, status: int = status.HTTP_200_OK) -> HttpResponse:
+    return HttpResponse(
+        json_renderer.render(data),
+        content_type=json_renderer.media_type,
+        status=status,
+    )
+
+
+def parse_body(request: HttpRequest) -> Dict[str, Any]:
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise exceptions.ParseError(f'JSON parse error - { str(e) }')
+    return request.POST.dict()
+
+
+def check_login_throttles(request: HttpRequest, data: Dict[str, Any]) -> None:
+    # The throttles read the email address from `request.data`
+    request.data = data                                     # type: ignore
+    for throttle_class in ObtainAuthTokenWithEmail.throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            raise exceptions.Throttled(throttle.wait())
+
+
+async def authenticate_request(
+    request: HttpRequest
+) -> Union[Customer, TokenUser]:
+    """
+    Resolves the customer from a `Token` Authorization header, sharing the
+    token cache of the sync views, or a `Bearer` access token, which gives
+    a `TokenUser` as in the sync views.
+    """
+    auth = get_authorization_header(request).split()
+    if auth and auth[0].lower() == b'bearer':
+        # Checking the denylist may query the database
+        result = await sync_to_async(
+            StatelessJWTAuthentication().authenticate
+        )(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        return result[0]
+    if not auth or auth[0].lower() != b'token':
+        raise exceptions.NotAuthenticated()
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed(
+            'Invalid token header. No credentials provided.'
+        )
+
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(
+            'Invalid token header. Token string should not contain invalid '
+            'characters.'
+        )
+
+    customer, token = await CachingTokenAuthentication() \
+        .aauthenticate_credentials(key)
+    return customer
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    """
+    Turns DRF's API exceptions, and `PasswordHashingBusy`, into responses
+    shaped like the ones DRF's default exception handler returns.
+    """
+
+    async def dispatch(self, request: HttpRequest, *args: Any,
+                       **kwargs: Any) -> HttpResponse:
+        try:
+            try:
+                return await super().dispatch(request, *args, **kwargs)
+            except hashing.PasswordHashingBusy:
+                raise hashing.PasswordHashingUnavailable()
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) \
+                else { 'detail': exc.detail }
+            response = json_response(data, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated,
+                                exceptions.AuthenticationFailed)):
+                response.status_code = status.HTTP_401_UNAUTHORIZED
+                response['WWW-Authenticate'] = 'Token'
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait   # type: ignore
+            return response
+
+
+class AsyncObtainAuthTokenWithEmail(AsyncAPIView):
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        data = parse_body(request)
+        await sync_to_async(check_login_throttles)(request, data)
+        serializer = AuthEmailTokenSerializer(data=data)
+        # `authenticate()` is sync only
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        user = serializer.validated_data['user']
+        try:
+            token = await aget_or_rotate_token(user)
+        except OperationalError as oe:
+            return json_response(data={
+                "message": (f"An error occurred while trying to fetch token "
+                            f"for customer: { str(oe) }")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return json_response({ 'token': token.key })
+
+
+class AsyncActiveAccountView(AsyncAPIView):
+    """
+    Retrieves and updates the active account of the customer.
+
+    Cheque images cannot be uploaded here, use the sync endpoint for that.
+    """
+
+    async def get_active_account(
+        self, customer: Union[Customer, TokenUser]
+    ) -> CustomerBankAccount:
+        try:
+            return await CustomerBankAccount.objects.select_related('bank') \
+                .aget(customer_id=customer.pk, is_active=True)
+        except CustomerBankAccount.DoesNotExist:
+            raise exceptions.NotFound()
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        customer = await authenticate_request(request)
+        try:
+            active_account = await self.get_active_account(customer)
+        except OperationalError as oe:
+            return json_response(data={
+                "message": (f"An error occurred while trying to retrieve "
+                            f"account details: { str(oe) }")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return json_response(CustomerBankAccountSerializer(
+            active_account, context={ 'request': request }
+        ).data)
+
+    async def put(self, request: HttpRequest) -> HttpResponse:
+        return await self.update(request)
+
+    async def patch(self, request: HttpRequest) -> HttpResponse:
+        return await self.update(request)
+
+    async def update(self, request: HttpRequest) -> HttpResponse:
+        customer = await authenticate_request(request)
+        try:
+            active_account = await self.get_active_account(customer)
+        except OperationalError as oe:
+            return json_response(data={
+                "message": (f"An error occurred while trying to fetch active "
+                            f"account: { str(oe) }")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = CustomerBankAccountSerializer(
+            active_account,
+            data=parse_body(request),
+            partial=True,
+            context={ 'request': request },
+        )
+        # Validating the bank looks it up in the database
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        # Saved through the serializer, as the sync view does, for its
+        # checks and for the signals invalidating the cached active account.
+        try:
+            await sync_to_async(serializer.save)()
+        except OperationalError as oe:
+            return json_response(data={
+                "message": (f"An error occurred while trying to update details "
+                            f"of active account: { str(oe) }")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return json_response(serializer.data)
+
+
+class AsyncBankListView(AsyncAPIView):
+    """
+    Lists banks by id, a page at a time. The next page is the one `after`
+    the last id of the current page.
+    """
+    page_size = KeysetPagination.page_size
+    max_page_size = KeysetPagination.max_page_size
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        try:
+            after = int(request.GET.get('after', 0))
+            page_size = max(1, min(
+                int(request.GET.get('page_size', self.page_size)),
+                self.max_page_size
+            ))
+        except ValueError:
+            raise exceptions.ValidationError(
+                '`after` and `page_size` must be integers.'
+            )
+
+        queryset = Bank.objects.filter(id__gt=after).order_by('id')
+        try:
+            banks = [bank async for bank in queryset[:page_size + 1]]
+        except OperationalError as oe:
+            return json_response(data={
+                "message": (f"An error occurred while trying to list banks: "
+                            f"{ str(oe) }")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if len(banks) > page_size:
+            banks = banks[:page_size]
+            query = request.GET.copy()
+            query['after'] = str(banks[-1].pk)
+            next_url = request.build_absolute_uri(
+                f'{ request.path }?{ query.urlencode() }'
+            )
+
+        return json_response({
+            'next': next_url,
+            'results': BankSerializer(
+                banks, many=True, context={ 'request': request }
+            ).data,
+        })
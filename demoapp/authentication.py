@@ -0,0 +1,211 @@
+import copy
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import router
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+from rest_framework.authtoken.models import Token
+from demoapp.cache import LRUCache
+from demoapp.models import Customer
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+TOKEN_AUTH_CACHE: Dict[str, Any] = {
+    'MAXSIZE': 10000,
+    'TTL': 5,
+    'BACKEND': None,
+    'SHARED_TTL': 300,
+    **getattr(settings, 'TOKEN_AUTH_CACHE', {}),
+}
+
+# Per-process cache of resolved `token key -> (customer, token)` pairs.
+token_cache = LRUCache(
+    maxsize=TOKEN_AUTH_CACHE['MAXSIZE'],
+    ttl=TOKEN_AUTH_CACHE['TTL'],
+)
+
+
+def get_shared_cache() -> Optional[BaseCache]:
+    alias: Optional[str] = TOKEN_AUTH_CACHE['BACKEND']
+    return caches[alias] if alias else None
+
+
+def get_shared_cache_key(key: str) -> str:
+    # Never use the raw token as a cache key, the shared backend may be
+    # readable by more than just this application.
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'demoapp:auth-token:{ digest }'
+
+
+def invalidate_tokens(keys: Iterable[str]) -> None:
+    """
+    Drops the given token keys from both the in-process and the shared
+    cache.
+    """
+    keys = list(keys)
+    for key in keys:
+        token_cache.delete(key)
+
+    shared_cache = get_shared_cache()
+    if shared_cache is not None and keys:
+        shared_cache.delete_many([get_shared_cache_key(key) for key in keys])
+
+
+def invalidate_customer_tokens(customer_id: int) -> None:
+    invalidate_tokens(
+        Token.objects.filter(user_id=customer_id)
+                     .values_list('key', flat=True)
+    )
+
+
+def get_token(key: str) -> Token:
+    """
+    Looks the token up on the primary, even in views reading from the
+    replica: a lagging replica would still accept a deleted token.
+    """
+    return Token.objects.select_related('user') \
+        .using(router.db_for_write(Token)).get(key=key)
+
+
+async def aget_token(key: str) -> Token:
+    return await Token.objects.select_related('user') \
+        .using(router.db_for_write(Token)).aget(key=key)
+
+
+def is_expired(token: Token) -> bool:
+    ttl: Optional[int] = getattr(settings, 'AUTH_TOKEN_TTL', None)
+    return ttl is not None and \
+        token.created < timezone.now() - timedelta(seconds=ttl)
+
+
+def get_or_rotate_token(customer: Customer) -> Token:
+    """
+    Returns the customer's token, replacing it first if it has expired.
+    """
+    token, created = Token.objects.get_or_create(user=customer)
+    if not created and is_expired(token):
+        token.delete()
+        token = Token.objects.create(user=customer)
+    return token
+
+
+async def aget_or_rotate_token(customer: Customer) -> Token:
+    token, created = await Token.objects.aget_or_create(user=customer)
+    if not created and is_expired(token):
+        await token.adelete()
+        token = await Token.objects.acreate(user=customer)
+    return token
+
+
+def get_stats() -> Dict[str, int]:
+    return token_cache.stats()
+
+
+def copy_entry(entry: Tuple[Customer, Token]) -> Tuple[Customer, Token]:
+    """
+    Cached instances are shared by concurrent requests, each request gets
+    copies of its own to change.
+    """
+    customer, token = copy.copy(entry[0]), copy.copy(entry[1])
+    token.user = customer
+    return customer, token
+
+
+class CachingTokenAuthentication(authentication.TokenAuthentication):
+    """
+    Token authentication which caches resolved tokens.
+
+    A token is looked up in a bounded per-process LRU first, then in the
+    shared Django cache backend named by `TOKEN_AUTH_CACHE['BACKEND']`
+    (if any) and only then in the database. Entries are invalidated when
+    the token is deleted or the customer is saved, see `demoapp.signals`,
+    but only in the process handling the change and the shared backend:
+    other processes keep authenticating a revoked token from their LRU
+    for up to `TOKEN_AUTH_CACHE['TTL']` seconds, which is kept short for
+    that reason. Shared entries live for `TOKEN_AUTH_CACHE['SHARED_TTL']`
+    seconds.
+
+    Tokens older than `AUTH_TOKEN_TTL` seconds are rejected, logging in
+    again replaces them.
+    """
+
+    def authenticate_credentials(self, key: str) -> Tuple[Customer, Token]:
+        entry = self.resolve_credentials(key)
+        if is_expired(entry[1]):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        return copy_entry(entry)
+
+    async def aauthenticate_credentials(
+        self, key: str
+    ) -> Tuple[Customer, Token]:
+        """
+        Async counterpart of `authenticate_credentials()` for views running
+        on the event loop.
+        """
+        entry = await self.aresolve_credentials(key)
+        if is_expired(entry[1]):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        return copy_entry(entry)
+
+    def resolve_credentials(self, key: str) -> Tuple[Customer, Token]:
+        entry: Optional[Tuple[Customer, Token]] = token_cache.get(key)
+        if entry is not None:
+            return entry
+
+        shared_cache = get_shared_cache()
+        if shared_cache is not None:
+            entry = shared_cache.get(get_shared_cache_key(key))
+            if entry is not None:
+                token_cache.set(key, entry)
+                return entry
+
+        try:
+            token = get_token(key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        entry = (token.user, token)
+        token_cache.set(key, entry)
+        if shared_cache is not None:
+            shared_cache.set(
+                get_shared_cache_key(key), entry,
+                timeout=TOKEN_AUTH_CACHE['SHARED_TTL']
+            )
+        return entry
+
+    async def aresolve_credentials(
+        self, key: str
+    ) -> Tuple[Customer, Token]:
+        entry: Optional[Tuple[Customer, Token]] = token_cache.get(key)
+        if entry is not None:
+            return entry
+
+        shared_cache = get_shared_cache()
+        if shared_cache is not None:
+            entry = await shared_cache.aget(get_shared_cache_key(key))
+            if entry is not None:
+                token_cache.set(key, entry)
+                return entry
+
+        try:
+            token = await aget_token(key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        entry = (token.user, token)
+        token_cache.set(key, entry)
+        if shared_cache is not None:
+            await shared_cache.aset(
+                get_shared_cache_key(key), entry,
+                timeout=TOKEN_AUTH_CACHE['SHARED_TTL']
+            )
+        return entry
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import (
+    check_password, identify_hasher, make_password
+)
+from demoapp import hashing
+
+
+UserModel = get_user_model()
+
+
+class PooledPasswordBackend(ModelBackend):
+    """
+    `ModelBackend` which verifies passwords on the password hashing pool
+    (see `demoapp.hashing`), keeping the database access on the calling
+    thread.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so that response times do not tell which emails
+            # belong to customers.
+            hashing.pool.run('make', make_password, password)
+            return None
+
+        if not hashing.pool.run('check', check_password, password,
+                                user.password):
+            return None
+
+        if identify_hasher(user.password).must_update(user.password):
+            user.password = hashing.pool.run('make', make_password, password)
+            user.save(update_fields=('password',))
+
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,93 @@
+"""
+Conditional requests and response caching for the bank directory.
+
+The directory as a whole has a version, derived from the number of banks
+and their latest `updated_at`, which serves as the ETag of every bank
+listing and detail. It is kept in the cache backend named by
+`BANK_DIRECTORY_CACHE['BACKEND']` and dropped whenever a bank is saved or
+deleted, so requests carrying a current `If-None-Match` are answered
+with a 304 without touching the database. Rendered JSON responses are
+cached under the version too, so they go stale together.
+
+Use a cache backend shared by all worker processes in production, with
+the default per-process one other processes only notice changes once
+`BANK_DIRECTORY_CACHE['TIMEOUT']` has passed.
+"""
+import hashlib
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import router
+from django.db.models import Count, Max
+from demoapp.models import Bank
+from typing import Any, Dict, Optional, Tuple
+
+
+BANK_DIRECTORY_CACHE: Dict[str, Any] = {
+    'BACKEND': 'default',
+    'TIMEOUT': 60,
+    **getattr(settings, 'BANK_DIRECTORY_CACHE', {}),
+}
+
+VERSION_KEY = 'demoapp:bank-directory:version'
+
+
+@dataclass
+class DirectoryVersion:
+    etag: str
+    last_modified: Optional[float]
+
+
+def get_cache() -> BaseCache:
+    return caches[BANK_DIRECTORY_CACHE['BACKEND']]
+
+
+def get_version() -> DirectoryVersion:
+    """
+    Returns the current version of the directory, computing it with a
+    single aggregate query if it is not cached.
+    """
+    cache = get_cache()
+    version: Optional[DirectoryVersion] = cache.get(VERSION_KEY)
+    if version is None:
+        # Read from the primary, a lagging replica would have the old
+        # version cached again right after a change.
+        state = Bank.objects.using(router.db_for_write(Bank)).aggregate(
+            count=Count('id'), updated_at=Max('updated_at')
+        )
+        updated_at = state['updated_at']
+        version = DirectoryVersion(
+            etag=hashlib.sha1(
+                f"{ state['count'] }:{ updated_at }".encode()
+            ).hexdigest(),
+            last_modified=updated_at.timestamp() if updated_at else None,
+        )
+        cache.set(VERSION_KEY, version, BANK_DIRECTORY_CACHE['TIMEOUT'])
+    return version
+
+
+def invalidate() -> None:
+    get_cache().delete(VERSION_KEY)
+
+
+def get_response_key(version: DirectoryVersion, url: str) -> str:
+    digest = hashlib.sha1(url.encode()).hexdigest()
+    return f'demoapp:bank-directory:{ version.etag }:{ digest }'
+
+
+def get_cached_response(
+    version: DirectoryVersion, url: str
+) -> Optional[Tuple[str, bytes]]:
+    """
+    Returns the content type and content of the response to the absolute
+    `url` cached for this version of the directory, if any.
+    """
+    return get_cache().get(get_response_key(version, url))
+
+
+def cache_response(version: DirectoryVersion, url: str,
+                   response: Tuple[str, bytes]) -> None:
+    get_cache().set(
+        get_response_key(version, url), response,
+        BANK_DIRECTORY_CACHE['TIMEOUT']
+    )
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def is_per_process(cache: BaseCache) -> bool:
+    """
+    Whether the Django cache backend keeps its entries in the memory of the
+    current process, out of sight of the other workers.
+    """
+    return isinstance(cache, LocMemCache)
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded LRU mapping whose entries expire after
+    ``ttl`` seconds.
+
+    Meant for small per-process caches sitting in front of the database
+    on hot paths. Hit and miss counters are kept so the effectiveness of
+    the cache can be observed.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
@@ -0,0 +1,202 @@
+"""
+Background processing of uploaded cheque images.
+
+Uploads are streamed to a temporary file by Django (see
+`FILE_UPLOAD_HANDLERS`) and stored as is inside the request. Everything
+expensive happens afterwards on a local pool of worker threads:
+
+* the upload is hashed (SHA-256) while being read,
+* it is decoded, downscaled to at most `MAX_DIMENSION` pixels and
+  recompressed as JPEG, and a `THUMBNAIL_SIZE` thumbnail is made,
+* both are stored under names derived from the hash, so identical
+  uploads share the same files, and the original upload is removed.
+
+The queue lives in memory. Accounts whose image is still `pending` when
+a process exits are picked up again by `manage.py process_cheque_images`.
+"""
+import hashlib
+import io
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+from demoapp import active_accounts
+from demoapp.models import CustomerBankAccount
+from typing import Any, BinaryIO, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CHEQUE_PROCESSING: Dict[str, Any] = {
+    'WORKERS': 2,
+    'QUEUE_SIZE': 1000,
+    'MAX_DIMENSION': 2000,
+    'THUMBNAIL_SIZE': 320,
+    'JPEG_QUALITY': 85,
+    **getattr(settings, 'CHEQUE_PROCESSING', {}),
+}
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def get_image_name(digest: str) -> str:
+    return f'cheque_images/{ digest[:2] }/{ digest }.jpg'
+
+
+def get_thumbnail_name(digest: str) -> str:
+    return f'cheque_thumbnails/{ digest[:2] }/{ digest }.jpg'
+
+
+@dataclass
+class ProcessedImage:
+    digest: str
+    image: bytes
+    thumbnail: bytes
+
+
+def hash_stream(stream: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def process_image(
+    stream: BinaryIO, digest: Optional[str] = None
+) -> ProcessedImage:
+    """
+    Recompresses the image read from `stream` and makes its thumbnail.
+    Does not touch the database or the storage.
+    """
+    if digest is None:
+        digest = hash_stream(stream)
+
+    max_dimension: int = CHEQUE_PROCESSING['MAX_DIMENSION']
+    quality: int = CHEQUE_PROCESSING['JPEG_QUALITY']
+    with Image.open(stream) as original:
+        # Let the JPEG decoder downscale while decoding, it is a lot
+        # cheaper than decoding a full size phone photo.
+        original.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    image.thumbnail((max_dimension, max_dimension))
+    recompressed = encode_jpeg(image, quality)
+
+    thumbnail_size: int = CHEQUE_PROCESSING['THUMBNAIL_SIZE']
+    image.thumbnail((thumbnail_size, thumbnail_size))
+    return ProcessedImage(digest, recompressed, encode_jpeg(image, quality))
+
+
+def process_account(account_id: int) -> None:
+    """
+    Processes the cheque image of the account and records the results on
+    it, unless the image was replaced in the meantime.
+    """
+    account = CustomerBankAccount.objects.only('customer', 'cheque_image') \
+                                         .filter(pk=account_id).first()
+    if account is None or not account.cheque_image:
+        return
+
+    original_name: str = account.cheque_image.name
+    try:
+        with default_storage.open(original_name, 'rb') as stream:
+            digest = hash_stream(stream)
+            # Somebody may have uploaded the same image before, in which
+            # case their files are shared.
+            processed: Optional[ProcessedImage] = None
+            if not default_storage.exists(get_image_name(digest)):
+                processed = process_image(stream, digest)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('Unable to process cheque image %s of account %s: %s',
+                       original_name, account_id, e)
+        CustomerBankAccount.objects.filter(
+            pk=account_id, cheque_image=original_name
+        ).update(cheque_processing_status='failed')
+        active_accounts.invalidate(account.customer_id)
+        return
+
+    image_name = get_image_name(digest)
+    thumbnail_name = get_thumbnail_name(digest)
+    if processed is not None:
+        for name, content in ((image_name, processed.image),
+                              (thumbnail_name, processed.thumbnail)):
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(content))
+
+    updated = CustomerBankAccount.objects.filter(
+        pk=account_id, cheque_image=original_name
+    ).update(
+        cheque_image=image_name,
+        cheque_thumbnail=thumbnail_name,
+        cheque_image_hash=digest,
+        cheque_processing_status='processed',
+    )
+    active_accounts.invalidate(account.customer_id)
+    if updated and original_name != image_name:
+        default_storage.delete(original_name)
+
+
+class ChequeImageWorker:
+    """
+    Processes accounts handed to `enqueue()` on a few daemon threads,
+    started on first use.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.queue: "queue.Queue[int]" = queue.Queue(maxsize=queue_size)
+        self.threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, account_id: int) -> bool:
+        """
+        Queues the account for processing. Returns `False` if the queue is
+        full, the account then stays pending until reprocessed.
+        """
+        self.start()
+        try:
+            self.queue.put_nowait(account_id)
+        except queue.Full:
+            logger.warning('Cheque image queue is full, account %s stays '
+                           'pending', account_id)
+            return False
+        return True
+
+    def start(self) -> None:
+        with self._lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(
+                    target=self.run, name='cheque-images', daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def run(self) -> None:
+        while True:
+            account_id = self.queue.get()
+            try:
+                process_account(account_id)
+            except Exception:
+                logger.exception('Processing the cheque image of account %s '
+                                 'failed', account_id)
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+
+worker = ChequeImageWorker(
+    workers=CHEQUE_PROCESSING['WORKERS'],
+    queue_size=CHEQUE_PROCESSING['QUEUE_SIZE'],
+)
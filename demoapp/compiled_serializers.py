@@ -0,0 +1,169 @@
+"""
+Read-only fast path for the serializers of the hot read endpoints.
+
+A `ModelSerializer` rebuilds its fields for every instance it is created
+for, and then goes through each field's `get_attribute()` and
+`to_representation()` for every object. For the simple fields of our
+models, most of that work only ever produces the value as loaded.
+`compile_serializer()` introspects a serializer class once and returns a
+`CompiledSerializer`, which builds the very same representation straight
+from `QuerySet.values()` rows, converting only the values which need it.
+
+Serializers with fields it does not know how to reproduce are not
+compiled, their views keep using the serializer. Serializers adding to
+the representation of each object define `values_representation()`, see
+`CustomerBankAccountSerializer`.
+"""
+import functools
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import Storage
+from django.db import models
+from rest_framework import fields as drf_fields, relations, serializers
+from rest_framework.request import Request
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+)
+
+
+COMPILED_SERIALIZERS: Dict[str, Any] = {
+    'ENABLED': True,
+    **getattr(settings, 'COMPILED_SERIALIZERS', {}),
+}
+
+# Serializer fields whose representation is the value as loaded from
+# these model fields
+PLAIN_FIELDS = (
+    (drf_fields.CharField, (models.CharField, models.TextField)),
+    (drf_fields.IntegerField, (models.IntegerField, models.AutoField)),
+    (drf_fields.BooleanField, (models.BooleanField,)),
+)
+# Serializer fields whose `to_representation()` takes the value as loaded
+CONVERTED_FIELDS = (
+    drf_fields.ChoiceField, drf_fields.DateTimeField, drf_fields.DateField,
+    drf_fields.TimeField, drf_fields.DecimalField, drf_fields.UUIDField,
+)
+
+Convert = Callable[[Any, Optional[Request]], Any]
+
+
+def is_enabled() -> bool:
+    return COMPILED_SERIALIZERS['ENABLED']
+
+
+def file_url(storage: Storage, name: str,
+             request: Optional[Request]) -> Optional[str]:
+    # As `FileField.to_representation()` does for a `FieldFile`
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+@dataclass
+class Column:
+    name: str
+    source: str
+    convert: Optional[Convert] = None
+
+
+class CompiledSerializer:
+    def __init__(self, serializer_class: Type[serializers.ModelSerializer],
+                 columns: List[Column]) -> None:
+        self.serializer_class = serializer_class
+        self.columns = tuple(
+            (column.name, column.source, column.convert) for column in columns
+        )
+        self.finish: Optional[Callable[[Dict[str, Any], Dict[str, Any]],
+                                       None]] = \
+            getattr(serializer_class, 'values_representation', None)
+        extra: Tuple[str, ...] = getattr(serializer_class, 'extra_values', ())
+        self.values: Tuple[str, ...] = tuple(dict.fromkeys(
+            [source for _, source, _ in self.columns] + list(extra)
+        ))
+
+    def get_values(self, *extra: str) -> Tuple[str, ...]:
+        """
+        The `values()` needed, along with `extra` ones the caller reads.
+        """
+        return tuple(dict.fromkeys(self.values + extra))
+
+    def to_representation(
+        self, row: Dict[str, Any], request: Optional[Request] = None
+    ) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for name, source, convert in self.columns:
+            value = row[source]
+            if value is None or convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value, request)
+        if self.finish is not None:
+            self.finish(row, data)
+        return data
+
+    def to_representations(
+        self, rows: Iterable[Dict[str, Any]],
+        request: Optional[Request] = None,
+    ) -> List[Dict[str, Any]]:
+        return [self.to_representation(row, request) for row in rows]
+
+
+def get_column(field: drf_fields.Field,
+               model: Type[models.Model]) -> Optional[Column]:
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.many_to_many:
+        return None
+
+    name: str = field.field_name                            # type: ignore
+    source: str = field.source
+    if isinstance(field, drf_fields.FileField):
+        if not getattr(field, 'use_url', True):
+            return Column(name, source, lambda value, request: value or None)
+        return Column(name, source, functools.partial(
+            file_url, model_field.storage                   # type: ignore
+        ))
+    if isinstance(field, CONVERTED_FIELDS):
+        to_representation = field.to_representation
+        return Column(name, source,
+                      lambda value, request: to_representation(value))
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        # `values()` gives the primary key of the related object
+        return Column(name, source) if field.pk_field is None else None
+    if getattr(field, 'coerce_to_string', False):
+        return None
+    for field_class, model_field_classes in PLAIN_FIELDS:
+        if isinstance(field, field_class) and \
+           isinstance(model_field, model_field_classes):
+            return Column(name, source)
+    return None
+
+
+# Bounds the compiled serializers kept for the `?fields=` subsets asked for
+@functools.lru_cache(maxsize=256)
+def compile_serializer(
+    serializer_class: Type[serializers.ModelSerializer],
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Optional[CompiledSerializer]:
+    """
+    Returns the compiled version of the serializer class, limited to
+    `fields` if given, or `None` if it cannot be compiled. `fields` are
+    best given in the serializer's order, without duplicates, for the
+    subsets to share their compiled serializer.
+    """
+    kwargs = { 'fields': fields } if fields is not None else {}
+    serializer = serializer_class(**kwargs)
+    model: Type[models.Model] = serializer.Meta.model       # type: ignore
+    columns: List[Column] = []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        column = get_column(field, model)
+        if column is None:
+            return None
+        columns.append(column)
+    return CompiledSerializer(serializer_class, columns)
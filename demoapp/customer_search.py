@@ -0,0 +1,175 @@
+"""
+Search of customers by name, email and PAN.
+
+Every word of a customer's first, middle and last name, email and PAN is
+kept, normalized (accents stripped, case folded), as a row of
+`CustomerSearchToken`. A search matches the customers having, for each
+word of the query, a word starting with it, e.g. `jan do` finds Jane Doe.
+Each word is an index range scan of the token table, instead of a
+`LIKE '%x%'` scan of the customers' columns, see `search()`.
+
+The tokens are updated whenever a customer is saved, see
+`demoapp.signals`. Customers inserted without signals (`bulk_create()`,
+see `demoapp.seeding`) are indexed with `index_customers()`, and
+`manage.py rebuild_customer_search` rebuilds the whole index.
+"""
+import re
+import unicodedata
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from demoapp.models import Customer, CustomerSearchToken
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+CUSTOMER_SEARCH: Dict[str, Any] = {
+    'MIN_TERM_LENGTH': 2,
+    'MAX_TERMS': 4,
+    'SELECTIVE_BELOW': 1000,
+    **getattr(settings, 'CUSTOMER_SEARCH', {}),
+}
+
+SEARCH_FIELDS = (
+    'first_name', 'middle_name', 'last_name', 'email', 'pan_number',
+)
+
+WORD = re.compile(r'[^\W_]+')
+MAX_TOKEN_LENGTH: int = \
+    CustomerSearchToken._meta.get_field('token').max_length  # type: ignore
+# Sorts after any character, see `get_prefix_filter()`
+LAST_CHARACTER = '\U0010ffff'
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Splits the text into words, without accents and case folded, so that
+    `Émile` and `EMILE` give the same word.
+    """
+    if not text:
+        return []
+    text = ''.join(
+        character for character in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(character)
+    ).casefold()
+    return [word[:MAX_TOKEN_LENGTH] for word in WORD.findall(text)]
+
+
+def get_tokens(customer: Customer) -> Set[str]:
+    return {
+        token for field in SEARCH_FIELDS
+        for token in tokenize(getattr(customer, field))
+    }
+
+
+def get_terms(query: str) -> List[str]:
+    terms = [
+        term for term in dict.fromkeys(tokenize(query))
+        if len(term) >= CUSTOMER_SEARCH['MIN_TERM_LENGTH']
+    ]
+    return terms[:CUSTOMER_SEARCH['MAX_TERMS']]
+
+
+def get_prefix_filter(term: str) -> Dict[str, str]:
+    alias = router.db_for_read(CustomerSearchToken)
+    if connections[alias].vendor == 'sqlite':
+        # SQLite's LIKE ignores case and cannot use the index, but with its
+        # binary ordering a prefix is a range.
+        return { 'token__gte': term, 'token__lt': term + LAST_CHARACTER }
+    return { 'token__startswith': term }
+
+
+def count_matches(term: str) -> int:
+    """
+    Counts the tokens starting with `term`, stopping at
+    `CUSTOMER_SEARCH['SELECTIVE_BELOW']`.
+    """
+    return CustomerSearchToken.objects.filter(
+        **get_prefix_filter(term)
+    )[:CUSTOMER_SEARCH['SELECTIVE_BELOW']].count()
+
+
+def search(queryset: QuerySet, query: str,
+           field: str = 'pk') -> Optional[QuerySet]:
+    """
+    Narrows the queryset to the rows whose customer, found through
+    `field`, matches the query. Returns `None` if the query has no words
+    of at least `CUSTOMER_SEARCH['MIN_TERM_LENGTH']` characters.
+
+    The query word with the fewest matches picks the customers, unless
+    even it matches as many as `CUSTOMER_SEARCH['SELECTIVE_BELOW']` tokens
+    (`customer`, `com`), and the other words are checked for each of them
+    on `unique_customer_search_token`. Words matching most customers thus
+    stop an ordered listing as soon as a page is full.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return None
+    counts = { term: count_matches(term) for term in terms }
+    terms.sort(key=counts.__getitem__)
+    if counts[terms[0]] < CUSTOMER_SEARCH['SELECTIVE_BELOW']:
+        queryset = queryset.filter(**{
+            f'{ field }__in': CustomerSearchToken.objects.filter(
+                **get_prefix_filter(terms[0])
+            ).values('customer')
+        })
+        terms = terms[1:]
+    for term in terms:
+        queryset = queryset.filter(Exists(CustomerSearchToken.objects.filter(
+            customer=OuterRef(field), **get_prefix_filter(term)
+        )))
+    return queryset
+
+
+def index_customer(customer: Customer) -> None:
+    """
+    Brings the customer's tokens up to date, writing only those which
+    changed.
+    """
+    tokens = get_tokens(customer)
+    existing = set(CustomerSearchToken.objects.filter(
+        customer_id=customer.pk
+    ).values_list('token', flat=True))
+    if existing - tokens:
+        CustomerSearchToken.objects.filter(
+            customer_id=customer.pk, token__in=existing - tokens
+        ).delete()
+    if tokens - existing:
+        CustomerSearchToken.objects.bulk_create(
+            CustomerSearchToken(customer_id=customer.pk, token=token)
+            for token in tokens - existing
+        )
+
+
+def index_customers(customers: Iterable[Customer]) -> None:
+    """
+    Replaces the tokens of the customers.
+    """
+    customers = list(customers)
+    with transaction.atomic():
+        CustomerSearchToken.objects.filter(
+            customer_id__in=[customer.pk for customer in customers]
+        ).delete()
+        CustomerSearchToken.objects.bulk_create(
+            CustomerSearchToken(customer_id=customer.pk, token=token)
+            for customer in customers
+            for token in get_tokens(customer)
+        )
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """
+    Reindexes every customer, a batch per transaction, and returns how
+    many there were.
+    """
+    indexed = 0
+    last_id = 0
+    while True:
+        customers = list(
+            Customer.objects.filter(pk__gt=last_id).order_by('pk')
+            .only(*SEARCH_FIELDS)[:batch_size]
+        )
+        if not customers:
+            return indexed
+        index_customers(customers)
+        indexed += len(customers)
+        last_id = customers[-1].pk
@@ -0,0 +1,108 @@
+"""
+Routing of reads to a replica database.
+
+Writes always go to the primary (`default`). Reads go to the replica
+(the `DATABASE_REPLICA['ALIAS']` database, when configured) only while
+`ReplicaRoutingMiddleware` handles a safe request to one of the read-only
+views in `DATABASE_REPLICA['READ_VIEWS']`. Token lookups stay on the
+primary, see `demoapp.authentication.get_token()`.
+
+Replicas lag behind. A client which just changed something, e.g. switched
+its active account, must see the change on its next request, so after a
+successful unsafe request the client is pinned to the primary for
+`DATABASE_REPLICA['STICKY_SECONDS']`. Clients are told apart by their
+`Authorization` header or session cookie, and pins are kept in the
+`DATABASE_REPLICA['CACHE']` cache, which has to be shared so all worker
+processes honour them (`demo.settings_postgres` configures one).
+
+The bank listing and detail stay on the primary: their responses are
+cached under the directory version, read from the primary, see
+`demoapp.bank_directory`, and a lagging replica's body would be cached
+and revalidated under the new version. So does the active account view,
+for the same reason: `demoapp.active_accounts` caches what it reads under
+the customer's latest generation.
+"""
+import contextvars
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest
+from typing import Any, Dict, Optional
+
+
+DATABASE_REPLICA: Dict[str, Any] = {
+    'ALIAS': 'replica',
+    'READ_VIEWS': (
+        'async_bank_list',
+        'async_active_bank',
+    ),
+    'STICKY_SECONDS': 10,
+    'CACHE': 'default',
+    **getattr(settings, 'DATABASE_REPLICA', {}),
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+use_replica: contextvars.ContextVar[bool] = \
+    contextvars.ContextVar('use_replica', default=False)
+
+
+def get_replica_alias() -> Optional[str]:
+    alias: str = DATABASE_REPLICA['ALIAS']
+    return alias if alias in settings.DATABASES else None
+
+
+def get_client_key(request: HttpRequest) -> Optional[str]:
+    credentials = request.META.get('HTTP_AUTHORIZATION') \
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode()).hexdigest()
+    return f'demoapp:primary-pin:{ digest }'
+
+
+def pin_to_primary(request: HttpRequest) -> None:
+    key = get_client_key(request)
+    if key is not None:
+        caches[DATABASE_REPLICA['CACHE']].set(
+            key, True, DATABASE_REPLICA['STICKY_SECONDS']
+        )
+
+
+def is_pinned_to_primary(request: HttpRequest) -> bool:
+    key = get_client_key(request)
+    return key is not None and \
+        caches[DATABASE_REPLICA['CACHE']].get(key, False)
+
+
+def can_use_replica(request: HttpRequest) -> bool:
+    match = getattr(request, 'resolver_match', None)
+    return get_replica_alias() is not None \
+        and request.method in SAFE_METHODS \
+        and match is not None \
+        and match.view_name in DATABASE_REPLICA['READ_VIEWS'] \
+        and not is_pinned_to_primary(request)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model: Any, **hints: Any) -> Optional[str]:
+        # The database cache backend, holding the pins among others
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        # Falling through to Django's default keeps related objects of an
+        # instance read from the replica on the replica.
+        return get_replica_alias() if use_replica.get() else None
+
+    def db_for_write(self, model: Any, **hints: Any) -> str:
+        # Explicit, so instances read from the replica are saved to the
+        # primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> bool:
+        # Both databases hold the same data.
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints: Any) -> bool:
+        # The replica is migrated through replication.
+        return db != DATABASE_REPLICA['ALIAS']
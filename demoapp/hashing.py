@@ -0,0 +1,106 @@
+"""
+A bounded worker pool for password hashing.
+
+Hashing a password (PBKDF2 by default) is deliberately expensive. Done on
+request threads, a burst of logins or signups occupies every worker and
+stalls the cheap endpoints queued behind them. Running it here instead
+caps the CPU spent on hashing at `PASSWORD_HASHING['WORKERS']` threads,
+and once `PASSWORD_HASHING['MAX_PENDING']` more are waiting further
+requests are turned away straight away: `PasswordHashingBusy` is raised,
+which the API answers with a 503, see
+`demoapp.views.exception_handler()`.
+
+Threads are enough: `hashlib.pbkdf2_hmac()` releases the GIL while it
+runs.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from django.conf import settings
+from rest_framework import exceptions, status
+from demoapp.metrics import registry
+from typing import Any, Callable, Dict, TypeVar
+
+
+PASSWORD_HASHING: Dict[str, Any] = {
+    'WORKERS': 4,
+    'MAX_PENDING': 16,
+    **getattr(settings, 'PASSWORD_HASHING', {}),
+}
+
+T = TypeVar('T')
+
+hash_seconds = registry.histogram(
+    'demoapp_password_hash_seconds',
+    'Time spent hashing passwords, by operation.',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+hash_wait_seconds = registry.histogram(
+    'demoapp_password_hash_wait_seconds',
+    'Time password hashing jobs spent queued before running.',
+)
+hash_rejections = registry.counter(
+    'demoapp_password_hash_rejections_total',
+    'Password hashing jobs rejected because the pool was full.',
+)
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when the pool is full. Hashing also runs outside the API (the
+    admin login, management commands), so this is not an `APIException`.
+    """
+
+
+class PasswordHashingUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = (
+        'Too many logins are being processed right now, please retry shortly.'
+    )
+    default_code = 'password_hashing_busy'
+    # Sent as the `Retry-After` header by DRF's exception handler
+    wait = 1
+
+
+class HashingPool:
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='password-hashing'
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def run(self, operation: str, func: Callable[..., T],
+            *args: Any, **kwargs: Any) -> T:
+        """
+        Runs `func` on the pool and waits for its result. Raises
+        `PasswordHashingBusy` without waiting if the pool is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            hash_rejections.inc(operation=operation)
+            raise PasswordHashingBusy()
+
+        submitted = time.perf_counter()
+
+        def job() -> T:
+            started = time.perf_counter()
+            hash_wait_seconds.observe(started - submitted, operation=operation)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hash_seconds.observe(time.perf_counter() - started,
+                                     operation=operation)
+
+        try:
+            future: Future = self._executor.submit(job)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+pool = HashingPool(
+    workers=PASSWORD_HASHING['WORKERS'],
+    max_pending=PASSWORD_HASHING['MAX_PENDING'],
+)
+
@@ -0,0 +1,257 @@
+"""
+`Idempotency-Key` support for the account writes, so that clients can
+retry them safely.
+
+A request sent with an `Idempotency-Key` header is answered once; its
+response is kept for `IDEMPOTENCY['TTL']` seconds, keyed by the customer
+and the key, and every retry with the same key gets that response back
+(with `Idempotent-Replayed: true`) without running the view again. A
+retry arriving while the first request is still being processed gets a
+409, a request reusing a key for a different body a 422. A key is held
+for at most `IDEMPOTENCY['LOCK_TIMEOUT']` seconds by a request which never
+finishes (its worker died).
+
+Responses are kept by the store named by `IDEMPOTENCY['STORE']`:
+`DatabaseStore` (the default, in the `IdempotencyKey` table, purged by
+`manage.py purge_idempotency_keys`) or `CacheStore` (in the
+`IDEMPOTENCY['BACKEND']` cache, which has to be shared by the worker
+processes, the default per-process cache is not).
+Server errors are not kept, the key can be retried.
+"""
+import abc
+import datetime
+import functools
+import hashlib
+import json
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from demoapp.models import IdempotencyKey
+from typing import Any, Callable, Dict, Optional
+
+
+IDEMPOTENCY: Dict[str, Any] = {
+    'STORE': 'demoapp.idempotency.DatabaseStore',
+    'BACKEND': 'default',
+    'TTL': 24 * 60 * 60,
+    'LOCK_TIMEOUT': 60,
+    **getattr(settings, 'IDEMPOTENCY', {}),
+}
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Answers which are not kept: the request may well succeed when retried.
+RETRYABLE_STATUSES = frozenset((
+    status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS,
+))
+
+
+@dataclass
+class Record:
+    fingerprint: str
+    # Both `None` while the request is being processed
+    status_code: Optional[int] = None
+    data: Any = None
+
+    @property
+    def processing(self) -> bool:
+        return self.status_code is None
+
+
+class Store(abc.ABC):
+    @abc.abstractmethod
+    def claim(self, customer_id: Any, key: str,
+              fingerprint: str) -> Optional[Record]:
+        """
+        Records that the request is being processed, unless the key was
+        used already: returns `None` if it was claimed, else the existing
+        record.
+        """
+
+    @abc.abstractmethod
+    def save(self, customer_id: Any, key: str, record: Record) -> None:
+        """
+        Keeps the answer to the request, for its retries.
+        """
+
+    @abc.abstractmethod
+    def release(self, customer_id: Any, key: str) -> None:
+        """
+        Forgets the key, so that the request can be made again.
+        """
+
+
+class CacheStore(Store):
+    def get_cache(self) -> BaseCache:
+        return caches[IDEMPOTENCY['BACKEND']]
+
+    def get_key(self, customer_id: Any, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f'demoapp:idempotency:{ customer_id }:{ digest }'
+
+    def claim(self, customer_id: Any, key: str,
+              fingerprint: str) -> Optional[Record]:
+        cache = self.get_cache()
+        cache_key = self.get_key(customer_id, key)
+        timeout = IDEMPOTENCY['LOCK_TIMEOUT']
+        while not cache.add(cache_key, Record(fingerprint), timeout):
+            record: Optional[Record] = cache.get(cache_key)
+            # Unless it expired in between
+            if record is not None:
+                return record
+        return None
+
+    def save(self, customer_id: Any, key: str, record: Record) -> None:
+        self.get_cache().set(self.get_key(customer_id, key), record,
+                             IDEMPOTENCY['TTL'])
+
+    def release(self, customer_id: Any, key: str) -> None:
+        self.get_cache().delete(self.get_key(customer_id, key))
+
+
+class DatabaseStore(Store):
+    def claim(self, customer_id: Any, key: str,
+              fingerprint: str) -> Optional[Record]:
+        now = timezone.now()
+        try:
+            existing: Optional[Dict[str, Any]] = \
+                IdempotencyKey.objects.values(
+                    'fingerprint', 'status_code', 'response', 'expires_at'
+                ).get(customer_id=customer_id, key=key)
+        except IdempotencyKey.DoesNotExist:
+            existing = None
+        if existing is not None and existing['expires_at'] > now:
+            return Record(existing['fingerprint'], existing['status_code'],
+                          existing['response'])
+
+        expires_at = now + datetime.timedelta(
+            seconds=IDEMPOTENCY['LOCK_TIMEOUT']
+        )
+        if existing is not None:
+            # Taking over the expired key, in a single update so that only
+            # one of concurrent requests does.
+            if IdempotencyKey.objects.filter(
+                customer_id=customer_id, key=key, expires_at__lte=now
+            ).update(fingerprint=fingerprint, status_code=None,
+                     response=None, expires_at=expires_at):
+                return None
+        else:
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(
+                        customer_id=customer_id, key=key,
+                        fingerprint=fingerprint, expires_at=expires_at,
+                    )
+                return None
+            except IntegrityError:
+                pass
+        # A concurrent request got there first
+        return self.claim(customer_id, key, fingerprint)
+
+    def save(self, customer_id: Any, key: str, record: Record) -> None:
+        IdempotencyKey.objects.filter(customer_id=customer_id, key=key).update(
+            status_code=record.status_code, response=record.data,
+            expires_at=timezone.now() + datetime.timedelta(
+                seconds=IDEMPOTENCY['TTL']
+            ),
+        )
+
+    def release(self, customer_id: Any, key: str) -> None:
+        IdempotencyKey.objects.filter(customer_id=customer_id,
+                                      key=key).delete()
+
+
+@functools.lru_cache(maxsize=None)
+def get_store() -> Store:
+    return import_string(IDEMPOTENCY['STORE'])()
+
+
+def get_fingerprint(request: Request) -> str:
+    """
+    Hashes what makes the request: its method, path and parsed data, so
+    that the same request sent again, even with a new multipart boundary,
+    has the same fingerprint. Uploaded files count by their content.
+    """
+    def default(value: Any) -> Any:
+        if isinstance(value, UploadedFile):
+            digest = hashlib.sha256()
+            for chunk in value.chunks():
+                digest.update(chunk)
+            value.seek(0)
+            return { 'file': value.name, 'sha256': digest.hexdigest() }
+        return str(value)
+
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = { name: values for name, values in data.lists() }
+    payload = json.dumps(
+        [request.method, request.path, data], sort_keys=True, default=default
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def error(detail: str, status_code: int) -> Response:
+    return Response({ 'detail': detail }, status=status_code)
+
+
+def idempotent(handler: Callable[..., Response]) -> Callable[..., Response]:
+    """
+    Decorates a view method, for requests sent with an `Idempotency-Key`
+    header to be answered once. Requests without one are left alone.
+    """
+    @functools.wraps(handler)
+    def wrapper(view: Any, request: Request, *args: Any,
+                **kwargs: Any) -> Response:
+        key: Optional[str] = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH or not key.isprintable():
+            return error(f'{ HEADER } must be 1 to { MAX_KEY_LENGTH } '
+                         f'printable characters.',
+                         status.HTTP_400_BAD_REQUEST)
+
+        store = get_store()
+        customer_id = request.user.pk
+        fingerprint = get_fingerprint(request)
+        record = store.claim(customer_id, key, fingerprint)
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                return error(f'This { HEADER } was used for a different '
+                             f'request.',
+                             status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.processing:
+                return error(f'A request with this { HEADER } is still '
+                             f'being processed, retry later.',
+                             status.HTTP_409_CONFLICT)
+            response = Response(record.data, status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except Exception as exc:
+                # As `APIView.dispatch()` would, so that client errors
+                # raised by the view are kept as well.
+                response = view.handle_exception(exc)
+        except BaseException:
+            store.release(customer_id, key)
+            raise
+        if response.status_code >= 500 or \
+           response.status_code in RETRYABLE_STATUSES:
+            store.release(customer_id, key)
+        else:
+            store.save(customer_id, key, Record(
+                fingerprint, response.status_code, response.data
+            ))
+        return response
+
+    return wrapper
@@ -0,0 +1,187 @@
+"""
+Structured logging that stays off the request's critical path.
+
+* `QueueHandler` only puts records on an in-memory queue; a background
+  thread (`logging.handlers.QueueListener`) formats and writes them with
+  the handler it wraps. A full queue drops records rather than blocking.
+* `JSONFormatter` writes one JSON object per line, with the request id
+  and customer id set by `demoapp.middleware.RequestLoggingMiddleware`
+  and anything passed as `extra`.
+* `SamplingFilter` keeps a share of the records of high-volume loggers.
+* `audit()` records account events to the `demoapp.audit` logger once
+  the transaction making them commits.
+"""
+import atexit
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+from django.db import transaction
+from django.http import HttpRequest
+from django.utils.functional import LazyObject, empty
+from django.utils.module_loading import import_string
+from demoapp.metrics import registry
+from typing import Any, Dict, Optional
+
+
+audit_logger = logging.getLogger('demoapp.audit')
+
+current_request: contextvars.ContextVar[Optional[HttpRequest]] = \
+    contextvars.ContextVar('current_request', default=None)
+
+dropped_records = registry.counter(
+    'demoapp_log_records_dropped_total',
+    'Log records dropped because the logging queue was full.',
+)
+
+# Attributes every `LogRecord` has, everything else came with `extra`.
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord(
+    '', logging.INFO, '', 0, '', (), None
+))) | { 'message', 'asctime', 'request_id', 'customer_id' }
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_customer_id(request: HttpRequest) -> Optional[Any]:
+    """
+    Returns the id of the request's customer once authentication has run,
+    without triggering it.
+    """
+    user = request.__dict__.get('user')
+    if user is None or \
+       isinstance(user, LazyObject) and user._wrapped is empty:
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Adds the current request's id and customer id to records. Has to run
+    where the record is made, put it on the `QueueHandler`.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request = current_request.get()
+        if request is not None:
+            record.request_id = getattr(request, 'request_id', None)
+            if getattr(record, 'customer_id', None) is None:
+                record.customer_id = get_customer_id(request)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a `rate` share of the records below `always_above`, and every
+    record at or above it.
+    """
+
+    def __init__(self, rate: float = 1.0,
+                 always_above: int = logging.WARNING) -> None:
+        super().__init__()
+        self.rate = rate
+        self.always_above = always_above
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.always_above or \
+            random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'time': datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for attribute in ('request_id', 'customer_id'):
+            value = getattr(record, attribute, None)
+            if value is not None:
+                entry[attribute] = value
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a `target` handler (dotted path, built with the
+    remaining keyword arguments) running on a background thread. The
+    formatter configured for this handler is used by the target.
+    """
+
+    def __init__(self, target: str, queue_size: int = 10000,
+                 **kwargs: Any) -> None:
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target: logging.Handler = import_string(target)(**kwargs)
+        self.start()
+        atexit.register(self.stop)
+        # Threads do not survive a fork, e.g. into preforked workers, and
+        # the queue's lock may have been held by one of them.
+        os.register_at_fork(after_in_child=self.restart)
+
+    def restart(self) -> None:
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.start()
+
+    def start(self) -> None:
+        self.listener = logging.handlers.QueueListener(
+            self.queue, self.target, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread, only what could
+        # change meanwhile is resolved here.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+    def close(self) -> None:
+        self.stop()
+        self.target.close()
+        super().close()
+
+
+def audit(event: str, **fields: Any) -> None:
+    """
+    Logs an account event to `demoapp.audit` once the current transaction
+    commits, nothing is logged if it rolls back.
+    """
+    transaction.on_commit(lambda: audit_logger.info(
+        event, extra={ 'event': event, **fields }
+    ))
@@ -0,0 +1,84 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from demoapp import customer_search, verification
+from demoapp.models import Bank, Customer, CustomerBankAccount
+from typing import Callable, List, NamedTuple
+
+
+class HotPath(NamedTuple):
+    name: str
+    queryset: Callable[[], QuerySet]
+    # Ordered listings walk a whole index by design, only their sort is
+    # checked.
+    lookup: bool = True
+
+
+customer = Customer(pk=1)
+
+# The queries behind the model helpers, written out since the helpers run
+# them. Updates are explained through the equivalent select.
+HOT_PATHS = (
+    HotPath('CustomerBankAccount.get_account', lambda:
+        CustomerBankAccount.objects.select_related('bank').filter(
+            ifsc_code='DEMO0000001', account_number='000111'
+        ).order_by('pk')[:1]),
+    HotPath('CustomerBankAccount.get_existing_account', lambda:
+        CustomerBankAccount.objects.select_related('bank').filter(
+            customer=customer, ifsc_code='DEMO0000001',
+            account_number='000111', is_active=False
+        ).order_by('pk')[:1]),
+    HotPath('CustomerBankAccount.get_active_account', lambda:
+        CustomerBankAccount.objects.select_related('bank').filter(
+            customer=customer, is_active=True
+        )),
+    HotPath('CustomerBankAccount.get_accounts_count', lambda:
+        CustomerBankAccount.objects.filter(customer=customer).values('pk')),
+    HotPath('CustomerBankAccount.deactivate_active_account', lambda:
+        CustomerBankAccount.objects.filter(
+            customer=customer, is_active=True
+        ).values('pk')),
+    HotPath('verification.get_pending_accounts', lambda:
+        verification.get_pending_accounts()[:100]),
+    HotPath('customer_search.search', lambda:
+        customer_search.search(Customer.objects.order_by('pk'),
+                               'jane doe')[:100]),
+    HotPath('BankAdmin ordering', lambda:
+        Bank.objects.order_by('name', 'id'), lookup=False),
+)
+
+# Plan lines of a full table scan and of an explicit sort, for SQLite and
+# PostgreSQL.
+FULL_SCAN = re.compile(r'(^|[\s>-])(SCAN\b|Seq Scan\b)')
+SORT = re.compile(r'(USE TEMP B-TREE FOR ORDER BY|(^|[\s>-])Sort\b)')
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the hot path queries and fails if any of them scans "
+        "a whole table, or sorts a listing which an index could order."
+    )
+
+    def handle(self, *args, **options) -> None:
+        failures: List[str] = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # On small tables a sequential scan is the cheaper plan, but
+                # the point is whether an index could be used at all.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for path in HOT_PATHS:
+                plan: str = path.queryset().explain()
+                self.stdout.write(f'{ path.name }:\n{ plan }\n')
+                if path.lookup and FULL_SCAN.search(plan):
+                    failures.append(f'{ path.name } scans a whole table')
+                if SORT.search(plan):
+                    failures.append(f'{ path.name } sorts its results')
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(
+            f'All { len(HOT_PATHS) } hot path queries use an index.'
+        ))
@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from demoapp.onboarding import DEFAULT_BATCH_SIZE, onboard_accounts, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Onboards customer bank accounts in bulk from a JSON or CSV partner "
+        "file. Prints one JSON result per row."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('path', help='JSON or CSV file with accounts.')
+        parser.add_argument(
+            '--format', choices=('json', 'csv'),
+            help='Input format, guessed from the file extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows validated and inserted together.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        path: str = options['path']
+        format: str = options['format'] or (
+            'json' if path.endswith('.json') else 'csv'
+        )
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                results = onboard_accounts(
+                    read_rows(stream, format),
+                    batch_size=options['batch_size']
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Unable to onboard accounts: { e }')
+
+        for result in results:
+            self.stdout.write(json.dumps(result))
+
+        created = sum(result['status'] == 'created' for result in results)
+        self.stderr.write(
+            f'{ created } accounts created, '
+            f'{ len(results) - created } rows failed.'
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from demoapp import cheques
+from demoapp.models import CustomerBankAccount
+
+
+class Command(BaseCommand):
+    help = (
+        "Processes cheque images left pending, e.g. because the process "
+        "that received them exited before its background queue drained."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Also process images whose processing failed before.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        statuses = ['pending'] + (['failed'] if options['retry_failed'] else [])
+        account_ids = CustomerBankAccount.objects.filter(
+            cheque_processing_status__in=statuses
+        ).values_list('pk', flat=True)
+
+        for account_id in account_ids.iterator():
+            cheques.process_account(account_id)
+            self.stdout.write(f'Processed cheque image of account { account_id }')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from demoapp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the expired idempotency keys kept by "
+        "demoapp.idempotency.DatabaseStore."
+    )
+
+    def handle(self, *args, **options) -> None:
+        deleted = IdempotencyKey.purge_expired()
+        self.stdout.write(f'Deleted { deleted } expired idempotency keys.')
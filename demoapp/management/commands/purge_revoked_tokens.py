@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from demoapp.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the expired entries of the JWT denylist kept by "
+        "demoapp.tokens.DatabaseDenylist."
+    )
+
+    def handle(self, *args, **options) -> None:
+        deleted = RevokedToken.purge_expired()
+        self.stdout.write(f'Deleted { deleted } expired revoked tokens.')
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from demoapp import customer_search
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the customer search index, e.g. after customers were "
+        "inserted or updated without signals."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Customers reindexed per transaction.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        started = time.perf_counter()
+        indexed = customer_search.rebuild(options['batch_size'])
+        self.stdout.write(
+            f'Indexed { indexed } customers in '
+            f'{ time.perf_counter() - started:.1f}s.'
+        )
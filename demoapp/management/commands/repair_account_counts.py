@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from demoapp.models import Customer, CustomerBankAccount
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the bank accounts of every customer and fixes the "
+        "customers whose account_count drifted, e.g. because accounts were "
+        "created or deleted with raw SQL."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the customers whose count is wrong.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        counts = CustomerBankAccount.objects.filter(
+            customer=OuterRef('pk')
+        ).order_by().values('customer').annotate(
+            count=Count('id')
+        ).values('count')
+        actual_count = Coalesce(Subquery(counts), 0)
+
+        with transaction.atomic():
+            # Locked, so accounts created meanwhile wait for the repair
+            # instead of being counted twice.
+            stale = list(
+                Customer.objects.select_for_update()
+                                .annotate(actual_count=actual_count)
+                                .exclude(account_count=F('actual_count'))
+                                .values_list('pk', 'account_count',
+                                             'actual_count')
+            )
+            for customer_id, account_count, actual in stale:
+                self.stdout.write(f'Customer { customer_id }: counted '
+                                  f'{ account_count }, has { actual }')
+            if stale and not options['dry_run']:
+                Customer.objects.filter(
+                    pk__in=[customer_id for customer_id, _, _ in stale]
+                ).update(account_count=actual_count)
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(f'{ verb } { len(stale) } stale account counts.')
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from demoapp import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Inserts synthetic customers, banks and bank accounts in batches, "
+        "for benchmarks and staging environments."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('customers', type=int,
+                            help='Number of customers to create.')
+        parser.add_argument('--banks', type=int, default=100,
+                            help='Number of banks to create.')
+        parser.add_argument('--accounts-per-customer', type=int, default=2)
+        parser.add_argument('--password', default='demo-password',
+                            help='Password of every customer.')
+        parser.add_argument(
+            '--hash-each', action='store_true',
+            help='Hash the password separately for every customer instead '
+                 'of sharing one hash. Much slower.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--start', type=int,
+            help='Number of the first customer, defaults to the one after '
+                 'the customers seeded before.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        started = time.perf_counter()
+
+        def progress(stats: seeding.SeedStats) -> None:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{ stats.customers } customers, { stats.accounts } accounts '
+                f'({ stats.customers / elapsed:.0f} customers/s)'
+            )
+
+        try:
+            stats = seeding.seed(
+                customers=options['customers'],
+                banks=options['banks'],
+                accounts_per_customer=options['accounts_per_customer'],
+                password=options['password'],
+                shared_hash=not options['hash_each'],
+                batch_size=options['batch_size'],
+                start=options['start'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created { stats.banks } banks, { stats.customers } customers and '
+            f'{ stats.accounts } accounts in '
+            f'{ time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,37 @@
+import sqlite3
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from demoapp import db_routers
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary database over the replica, for the two SQLite "
+        "file stand-in of a replicated setup (demo.settings_replica)."
+    )
+
+    def handle(self, *args, **options) -> None:
+        alias = db_routers.get_replica_alias()
+        if alias is None:
+            raise CommandError('No replica database is configured.')
+
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replica = connections[alias].settings_dict
+        engines = { primary['ENGINE'], replica['ENGINE'] }
+        if engines != { 'django.db.backends.sqlite3' }:
+            raise CommandError('Only SQLite replicas can be synced, real '
+                               'ones are kept up to date by replication.')
+
+        if not Path(primary['NAME']).exists():
+            raise CommandError('The primary database does not exist yet, '
+                               'run migrate first.')
+
+        source = sqlite3.connect(primary['NAME'])
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        self.stdout.write(f"Copied { primary['NAME'] } to { replica['NAME'] }")
@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand
+from demoapp import verification
+
+
+class Command(BaseCommand):
+    help = (
+        "E-verifies the pending accounts in batches. Several of these can "
+        "run at once, each claims different accounts."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Accounts claimed per transaction (VERIFICATION BATCH_SIZE).'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help='Accounts verified in parallel (VERIFICATION WORKERS).'
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Stop after processing this many accounts.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for newly pending accounts.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds between polls with --loop.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        while True:
+            started = time.perf_counter()
+            stats = verification.verify_pending(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                limit=options['limit'],
+            )
+            elapsed = time.perf_counter() - started
+            if stats.processed or not options['loop']:
+                self.stdout.write(
+                    f'Verified { stats.processed } accounts in '
+                    f'{ elapsed:.1f}s: { stats.approved } approved, '
+                    f'{ stats.rejected } rejected, { stats.failed } failed.'
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from demoapp import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the steps the WSGI and ASGI entry points take before the "
+        "first request and reports how long each took."
+    )
+
+    def handle(self, *args, **options) -> None:
+        timings = warmup.warmup()
+        for name, seconds in timings:
+            self.stdout.write(f'{ name:<14}{ seconds * 1000:>8.1f} ms')
+        total = sum(seconds for _, seconds in timings)
+        self.stdout.write(f"{ 'total':<14}{ total * 1000:>8.1f} ms")
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import BaseUserManager
+from demoapp import hashing
 
 
 class CustomerManager(BaseUserManager):
@@ -7,7 +8,7 @@ class CustomerManager(BaseUserManager):
             raise ValueError('The customer must have an email address')
         email = self.normalize_email(email)
         customer = self.model(email=email, **extra_fields)
-        customer.set_password(password)
+        hashing.pool.run('make', customer.set_password, password)
         customer.save()
         return customer
 
@@ -0,0 +1,171 @@
+"""
+In-process metrics with a Prometheus text exposition.
+
+Only what the demo needs is implemented: counters and histograms with
+labels, kept in a process-wide registry. Every worker process exposes its
+own numbers, aggregating them is left to the scraper.
+"""
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+
+# Seconds, suited for request and query latencies
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: LabelValues, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+                         .replace('\n', r'\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{ name }="{ value }"' for name, value in escaped) \
+        + '}'
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [
+            f'# HELP { self.name } { self.documentation }',
+            f'# TYPE { self.name } { self.type }',
+        ]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self.values)
+
+    def render(self) -> List[str]:
+        return super().render() + [
+            f'{ self.name }{ format_labels(labels) } { value }'
+            for labels, value in sorted(self.snapshot().items())
+        ]
+
+
+class HistogramValue:
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)   # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelValues, HistogramValue] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self.values.get(key)
+            if histogram is None:
+                histogram = self.values[key] = \
+                    HistogramValue(len(self.buckets))
+            histogram.counts[index] += 1
+            histogram.count += 1
+            histogram.sum += value
+
+    def percentile(self, percent: float, **labels: str) -> float:
+        """
+        Estimates a percentile as the upper bound of the bucket it falls
+        into.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self.values.get(key)
+            if histogram is None or not histogram.count:
+                return 0.0
+            rank = percent / 100 * histogram.count
+            seen = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return float('inf')
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for labels, histogram in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{ self.name }_bucket'
+                        f'{ format_labels(labels, le=repr(bound)) } '
+                        f'{ cumulative }'
+                    )
+                lines.append(
+                    f'{ self.name }_bucket{ format_labels(labels, le="+Inf") } '
+                    f'{ histogram.count }'
+                )
+                lines.append(f'{ self.name }_sum{ format_labels(labels) } '
+                             f'{ histogram.sum }')
+                lines.append(f'{ self.name }_count{ format_labels(labels) } '
+                             f'{ histogram.count }')
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))  # type: ignore
+
+    def histogram(self, name: str, documentation: str,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(                               # type: ignore
+            Histogram(name, documentation, buckets)
+        )
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(
+            line for metric in metrics for line in metric.render()
+        ) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,168 @@
+import contextlib
+import logging
+import random
+import re
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpRequest, HttpResponse
+from demoapp import db_routers, logs, profiling
+from typing import Any, Callable
+
+
+request_logger = logging.getLogger('demoapp.requests')
+
+# Accepted from clients or proxies as the request id
+REQUEST_ID = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+
+class RequestLoggingMiddleware:
+    """
+    Gives every request an id, taken from a well-formed `X-Request-ID`
+    header or generated, which is returned in the response and carried by
+    every record logged while handling it (see `demoapp.logs`). Ends each
+    request with an access log record on `demoapp.requests`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(request, response, started)
+        finally:
+            logs.current_request.reset(token)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+            self.finish(request, response, started)
+        finally:
+            logs.current_request.reset(token)
+        return response
+
+    def start(self, request: HttpRequest) -> Any:
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID.fullmatch(request_id):
+            request_id = logs.new_request_id()
+        request.request_id = request_id                 # type: ignore
+        return logs.current_request.set(request), time.perf_counter()
+
+    def finish(self, request: HttpRequest, response: HttpResponse,
+               started: float) -> None:
+        response['X-Request-ID'] = request.request_id   # type: ignore
+        match = getattr(request, 'resolver_match', None)
+        request_logger.log(
+            logging.WARNING if response.status_code >= 500 else logging.INFO,
+            '%s %s %s', request.method, request.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(
+                    (time.perf_counter() - started) * 1000, 2
+                ),
+            },
+        )
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a random sample (`PROFILING['SAMPLE_RATE']`) of the requests,
+    see `demoapp.profiling`. Requests which are not sampled only pay for
+    drawing a random number.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self.sample_rate: float = profiling.PROFILING['SAMPLE_RATE']
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with self.profile(request):
+            return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        with self.profile(request):
+            return await self.get_response(request)
+
+    @contextlib.contextmanager
+    def profile(self, request: HttpRequest):
+        profile = profiling.RequestProfile()
+        token = profiling.current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - started
+            profiling.current_profile.reset(token)
+            match = getattr(request, 'resolver_match', None)
+            profiling.record(
+                match.view_name if match else 'unresolved', profile, total
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets the reads of safe requests to read-only views go to the replica,
+    and pins clients to the primary after they change something, see
+    `demoapp.db_routers`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_routers.use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_routers.use_replica.reset(token)
+        self.pin_after_write(request, response)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        token = db_routers.use_replica.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_routers.use_replica.reset(token)
+        self.pin_after_write(request, response)
+        return response
+
+    def process_view(self, request: HttpRequest, view_func: Callable,
+                     view_args: Any, view_kwargs: Any) -> None:
+        # The view is only known once the URL has been resolved.
+        db_routers.use_replica.set(db_routers.can_use_replica(request))
+
+    def pin_after_write(self, request: HttpRequest,
+                        response: HttpResponse) -> None:
+        if request.method not in db_routers.SAFE_METHODS \
+                and response.status_code < 400 \
+                and db_routers.get_replica_alias() is not None:
+            db_routers.pin_to_primary(request)
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('first_name', models.CharField(max_length=30)),
+                ('last_name', models.CharField(max_length=30)),
+                ('middle_name', models.CharField(blank=True, max_length=30, null=True)),
+                ('pan_number', models.CharField(max_length=10, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Bank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('website', models.URLField()),
+                ('number', models.CharField(max_length=20)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='bank_logos/')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerBankAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_number', models.CharField(max_length=100)),
+                ('ifsc_code', models.CharField(max_length=11)),
+                ('cheque_image', models.ImageField(blank=True, null=True, upload_to='cheque_images/')),
+                ('cheque_thumbnail', models.ImageField(blank=True, null=True, upload_to='cheque_thumbnails/')),
+                ('cheque_image_hash', models.CharField(blank=True, max_length=64)),
+                ('cheque_processing_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('processed', 'Processed'), ('failed', 'Failed')], max_length=20)),
+                ('branch_name', models.CharField(max_length=100)),
+                ('is_cheque_verified', models.BooleanField(default=False)),
+                ('name_as_per_bank_record', models.CharField(max_length=100)),
+                ('verification_mode', models.CharField(choices=[('manual', 'Manual'), ('e-verification', 'E-Verification')], default='manual', max_length=20)),
+                ('verification_status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=20)),
+                ('account_type', models.CharField(choices=[('savings', 'Savings'), ('current', 'Current'), ('credit', 'Credit')], default='savings', max_length=20)),
+                ('is_active', models.BooleanField(default=False)),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='demoapp.bank')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'CustomerBankAccounts',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='customerbankaccount',
+            constraint=models.UniqueConstraint(fields=('account_number', 'ifsc_code'), name='unique_bank_account'),
+        ),
+        migrations.AddConstraint(
+            model_name='customerbankaccount',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('customer',), name='unique_active_account'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demoapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customerbankaccount',
+            options={'verbose_name_plural': 'CustomerBankAccounts'},
+        ),
+        migrations.AddIndex(
+            model_name='bank',
+            index=models.Index(fields=['name', 'id'], name='bank_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerbankaccount',
+            index=models.Index(fields=['customer', 'is_active'], name='customer_accounts_idx'),
+        ),
+        # Only once the composite index, which covers it, is in place
+        migrations.AlterField(
+            model_name='customerbankaccount',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
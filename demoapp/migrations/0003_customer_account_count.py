@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:17
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_accounts(apps, schema_editor):
+    Customer = apps.get_model('demoapp', 'Customer')
+    CustomerBankAccount = apps.get_model('demoapp', 'CustomerBankAccount')
+    counts = CustomerBankAccount.objects.filter(
+        customer=models.OuterRef('pk')
+    ).order_by().values('customer').annotate(
+        count=models.Count('id')
+    ).values('count')
+    Customer.objects.update(
+        account_count=Coalesce(models.Subquery(counts), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demoapp', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='account_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_accounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demoapp', '0003_customer_account_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerbankaccount',
+            index=models.Index(condition=models.Q(('verification_mode', 'e-verification'), ('verification_status', 'pending')), fields=['id'], name='pending_verification_idx'),
+        ),
+    ]
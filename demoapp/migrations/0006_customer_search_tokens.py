@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demoapp', '0005_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64)),
+                ('customer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='customersearchtoken',
+            constraint=models.UniqueConstraint(fields=('customer', 'token'), name='unique_customer_search_token'),
+        ),
+    ]
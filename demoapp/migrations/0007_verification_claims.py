@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demoapp', '0006_customer_search_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerbankaccount',
+            name='verification_claimed_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,166 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from demoapp import profiling
+from demoapp.compiled_serializers import (
+    CompiledSerializer, compile_serializer, is_enabled
+)
+from typing import Any, List, Optional, Tuple
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients of a view ask for a subset of the serializer's fields
+    with a comma separated `fields` query parameter, e.g. `?fields=id,name`.
+
+    The requested fields narrow both the serializer output and the
+    columns selected from the database (through `QuerySet.only()`). The
+    serializer has to accept a `fields` keyword argument, see
+    `demoapp.serializers.SparseFieldsetSerializerMixin`.
+    """
+    fields_query_param = 'fields'
+
+    request: Request
+
+    def get_requested_fields(self) -> Optional[List[str]]:
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.parse_requested_fields()
+        return self._requested_fields
+
+    def parse_requested_fields(self) -> Optional[List[str]]:
+        if self.request.method != 'GET':
+            return None
+
+        value: Optional[str] = \
+            self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+
+        requested = [field.strip() for field in value.split(',')
+                     if field.strip()]
+        self._serializer_fields = \
+            self.get_serializer_class()().fields                # type: ignore
+        readable = {
+            name for name, field in self._serializer_fields.items()
+            if not field.write_only
+        }
+        unknown = [field for field in requested if field not in readable]
+        if unknown:
+            raise exceptions.ValidationError({
+                self.fields_query_param: [
+                    f"Unknown fields: { ', '.join(unknown) }"
+                ]
+            })
+        return requested
+
+    def filter_queryset(self, queryset: Any) -> Any:
+        queryset = super().filter_queryset(queryset)            # type: ignore
+        fields = self.get_requested_fields()
+        if not fields:
+            return queryset
+
+        # The pagination cursor is read from the ordering columns, these
+        # have to be loaded as well.
+        paginator = getattr(self, 'paginator', None)
+        if paginator is not None and hasattr(paginator, 'get_ordering'):
+            fields = fields + [
+                field.lstrip('-') for field in
+                paginator.get_ordering(self.request, queryset, self)
+            ]
+
+        model_fields = {field.name for field in queryset.model._meta.fields}
+        sources = {
+            self._serializer_fields[field].source
+            if field in self._serializer_fields else field
+            for field in fields
+        }
+        if not sources <= model_fields:
+            return queryset
+        return queryset.only(*sources)
+
+    def get_serializer(self, *args: Any, **kwargs: Any) -> Any:
+        fields = self.get_requested_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)          # type: ignore
+
+
+class CompiledSerializerMixin:
+    """
+    Serves `list` and `retrieve` from `QuerySet.values()` rows through the
+    compiled version of the view's serializer, see
+    `demoapp.compiled_serializers`. The responses are the same as the
+    serializer's. Views whose serializer cannot be compiled, or with
+    `COMPILED_SERIALIZERS['ENABLED']` off, use the serializer.
+
+    Put it before `SparseFieldsetMixin`, whose requested fields it
+    compiles.
+    """
+    request: Request
+
+    def get_compiled_serializer(self) -> Optional[CompiledSerializer]:
+        if not is_enabled():
+            return None
+        get_requested_fields = getattr(self, 'get_requested_fields', None)
+        fields = get_requested_fields() if get_requested_fields else None
+        if fields:
+            # In the serializer's order and deduplicated, so that the ways
+            # of asking for the same fields share a compiled serializer.
+            fields = [
+                name for name in self._serializer_fields        # type: ignore
+                if name in fields
+            ]
+        return compile_serializer(
+            self.get_serializer_class(),                        # type: ignore
+            tuple(fields) if fields else None,
+        )
+
+    def get_ordering_values(self, queryset: Any) -> Tuple[str, ...]:
+        # The pagination cursor is read from the ordering columns.
+        paginator = getattr(self, 'paginator', None)
+        if paginator is None or not hasattr(paginator, 'get_ordering'):
+            return ()
+        return tuple(
+            field.lstrip('-') for field in
+            paginator.get_ordering(self.request, queryset, self)
+        )
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)       # type: ignore
+
+        queryset = self.filter_queryset(self.get_queryset())    # type: ignore
+        rows = queryset.values(
+            *compiled.get_values(*self.get_ordering_values(queryset))
+        )
+        page = self.paginate_queryset(rows)                     # type: ignore
+        with profiling.serializer_timer():
+            data = compiled.to_representations(
+                page if page is not None else rows, request
+            )
+        if page is not None:
+            return self.get_paginated_response(data)            # type: ignore
+        return Response(data)
+
+    def retrieve(self, request: Request, *args: Any,
+                 **kwargs: Any) -> Response:
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().retrieve(                            # type: ignore
+                request, *args, **kwargs
+            )
+
+        # As `GenericAPIView.get_object()` does
+        queryset = self.filter_queryset(self.get_queryset())    # type: ignore
+        lookup_field: str = self.lookup_field                   # type: ignore
+        lookup_url_kwarg = self.lookup_url_kwarg or lookup_field  # type: ignore
+        row = get_object_or_404(
+            queryset.values(*compiled.get_values()),
+            **{ lookup_field: self.kwargs[lookup_url_kwarg] }   # type: ignore
+        )
+        self.check_object_permissions(request, row)             # type: ignore
+        with profiling.serializer_timer():
+            data = compiled.to_representation(row, request)
+        return Response(data)
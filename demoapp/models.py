@@ -1,8 +1,12 @@
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+from demoapp import active_accounts
 from demoapp.managers import CustomerManager
-from typing import Optional, Type
+from typing import Any, Dict, Iterable, Optional, Type
 
 
 class Customer(AbstractBaseUser, PermissionsMixin):
@@ -15,6 +19,13 @@ class Customer(AbstractBaseUser, PermissionsMixin):
     pan_number: models.CharField = models.CharField(max_length=10, unique=True)
     is_active: models.BooleanField = models.BooleanField(default=True)
     is_staff: models.BooleanField = models.BooleanField(default=False)
+    # Number of bank accounts of the customer. Only ever changed with F()
+    # expressions: by `demoapp.signals` when an account is created or
+    # deleted, by the bulk inserts of `demoapp.onboarding` and
+    # `demoapp.seeding` themselves. Fixed up by `manage.py
+    # repair_account_counts` if it drifts.
+    account_count: models.PositiveIntegerField = \
+        models.PositiveIntegerField(default=0, editable=False)
 
     objects = CustomerManager()
 
@@ -30,6 +41,37 @@ class Customer(AbstractBaseUser, PermissionsMixin):
             return f'{self.first_name} {self.middle_name} {self.last_name}'
         return f'{self.first_name} {self.last_name}'
 
+    def _do_update(self, base_qs: Any, using: str, pk_val: Any,
+                   values: list, update_fields: Optional[Iterable[str]],
+                   forced_update: bool) -> bool:
+        # Saving an instance loaded before the latest account was created
+        # would overwrite the counter with a stale value. Inserts still set
+        # it.
+        values = [value for value in values
+                  if value[0].attname != 'account_count']
+        return super()._do_update(base_qs, using, pk_val, values,
+                                  update_fields, forced_update)
+
+    @classmethod
+    def add_account_slots(
+        cls: Type["Customer"],
+        customer_id: int,
+        count: int = 1
+    ) -> None:
+        cls.objects.filter(pk=customer_id).update(
+            account_count=models.F('account_count') + count
+        )
+
+    @classmethod
+    def release_account_slots(
+        cls: Type["Customer"],
+        customer_id: int,
+        count: int = 1
+    ) -> None:
+        cls.objects.filter(
+            pk=customer_id, account_count__gte=count
+        ).update(account_count=models.F('account_count') - count)
+
     @classmethod
     def get_queryset_by_id(
         cls: Type["Customer"],
@@ -48,6 +90,14 @@ class Bank(models.Model):
     # a directory called 'bank_logos/' in the 'MEDIA_ROOT' directory
     # specified in Django settings.py
     logo = models.ImageField(upload_to='bank_logos/', null=True, blank=True)
+    # Versions the bank directory, see `demoapp.bank_directory`
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            # The admin lists banks by name.
+            models.Index(fields=('name', 'id'), name='bank_name_idx'),
+        )
 
     def __str__(self):
         return self.name
@@ -71,15 +121,34 @@ class CustomerBankAccount(models.Model):
         ('rejected', 'Rejected'),
     ]
 
+    CHEQUE_PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
     account_number: models.CharField = models.CharField(max_length=100)
     ifsc_code: models.CharField = models.CharField(max_length=11)
+    # Indexed by `customer_accounts_idx` below.
     customer: models.ForeignKey = models.ForeignKey(
-        Customer, on_delete=models.CASCADE
+        Customer, on_delete=models.CASCADE, db_index=False
     )
     bank: models.ForeignKey = models.ForeignKey(Bank, on_delete=models.CASCADE)
     cheque_image = models.ImageField(
         upload_to='cheque_images/', null=True, blank=True
     )
+
+    # Filled in by the background processing of the cheque image, see
+    # `demoapp.cheques`.
+    cheque_thumbnail = models.ImageField(
+        upload_to='cheque_thumbnails/', null=True, blank=True
+    )
+    cheque_image_hash: models.CharField = models.CharField(
+        max_length=64, blank=True
+    )
+    cheque_processing_status: models.CharField = models.CharField(
+        max_length=20, choices=CHEQUE_PROCESSING_STATUSES, blank=True
+    )
     branch_name: models.CharField = models.CharField(max_length=100)
     is_cheque_verified: models.BooleanField = models.BooleanField(default=False)
     name_as_per_bank_record: models.CharField = models.CharField(max_length=100)
@@ -89,6 +158,10 @@ class CustomerBankAccount(models.Model):
     verification_status: models.CharField = models.CharField(
         max_length=20, choices=VERIFICATION_STATUSES, default='pending'
     )
+    # Set while an e-verification worker holds the pending account, see
+    # `demoapp.verification.claim_accounts()`.
+    verification_claimed_until: models.DateTimeField = \
+        models.DateTimeField(null=True, blank=True, editable=False)
     account_type: models.CharField = models.CharField(
         max_length=20, choices=ACCOUNT_TYPES, default='savings'
     )
@@ -96,12 +169,42 @@ class CustomerBankAccount(models.Model):
 
     class Meta:
         verbose_name_plural = 'CustomerBankAccounts'
-        ordering = ('id',)
+        # Hot path lookups and the index serving them, check them with
+        # `manage.py explain_hot_paths`:
+        #
+        # * `get_account()`: `unique_bank_account`
+        # * `get_existing_account()`: `unique_bank_account`, the account
+        #   number and IFSC code pin down a single account
+        # * `get_active_account()`, `deactivate_active_account()`:
+        #   `unique_active_account`, partial on `is_active`
+        # * `get_accounts_count()` and the customer's other accounts:
+        #   `customer_accounts_idx`, which replaces the foreign key's index
+        # * `demoapp.verification.get_pending_accounts()`:
+        #   `pending_verification_idx`, partial on the pending accounts
         constraints = (
             models.UniqueConstraint(
                 fields=('account_number', 'ifsc_code'),
                 name='unique_bank_account'
             ),
+            # A customer can have at most one active account.
+            models.UniqueConstraint(
+                fields=('customer',),
+                condition=models.Q(is_active=True),
+                name='unique_active_account'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('customer', 'is_active'), name='customer_accounts_idx'
+            ),
+            models.Index(
+                fields=('id',),
+                condition=models.Q(
+                    verification_mode='e-verification',
+                    verification_status='pending',
+                ),
+                name='pending_verification_idx'
+            ),
         )
 
     @classmethod
@@ -110,27 +213,36 @@ class CustomerBankAccount(models.Model):
         ifsc_code: str,
         account_number: str
     ) -> Optional["CustomerBankAccount"]:
-        accounts: models.QuerySet[CustomerBankAccount] = cls.objects.filter(
+        return cls.objects.select_related('bank').filter(
             ifsc_code=ifsc_code,
             account_number=account_number
-        )
-        if accounts:
-            return accounts.get()
-        return None
+        ).first()
 
     @classmethod
     def get_accounts_count(
         cls: Type["CustomerBankAccount"],
         customer: Customer
     ) -> int:
-        return cls.objects.filter(customer=customer).count()
+        return cls.objects.filter(customer_id=customer.pk).count()
 
     @classmethod
     def get_active_account(
         cls: Type["CustomerBankAccount"],
         customer: Customer
     ) -> "CustomerBankAccount":
-        return cls.objects.get(customer=customer, is_active=True)
+        return cls.objects.select_related('bank').get(
+            customer_id=customer.pk, is_active=True
+        )
+
+    @classmethod
+    def get_active_account_values(
+        cls: Type["CustomerBankAccount"],
+        customer: Customer,
+        fields: Iterable[str]
+    ) -> Dict[str, Any]:
+        return cls.objects.values(*fields).get(
+            customer_id=customer.pk, is_active=True
+        )
 
     @classmethod
     def get_existing_account(
@@ -139,14 +251,12 @@ class CustomerBankAccount(models.Model):
         ifsc_code: str,
         account_number: str
     ) -> Optional["CustomerBankAccount"]:
-        existing_accounts: models.QuerySet[CustomerBankAccount] = \
-            cls.objects.filter(
-                customer=customer,
-                ifsc_code=ifsc_code,
-                account_number=account_number,
-                is_active=False
-            )
-        return existing_accounts.get() if existing_accounts else None
+        return cls.objects.select_related('bank').filter(
+            customer_id=customer.pk,
+            ifsc_code=ifsc_code,
+            account_number=account_number,
+            is_active=False
+        ).first()
 
     @classmethod
     def deactivate_active_account(
@@ -154,10 +264,92 @@ class CustomerBankAccount(models.Model):
         customer: Customer
     ) -> None:
         cls.objects.filter(
-            customer=customer,
+            customer_id=customer.pk,
             is_active=True
         ).update(is_active=False)
+        # Queryset updates send no signals, see `demoapp.active_accounts`.
+        active_accounts.invalidate(customer.pk)
 
     def activate(self: "CustomerBankAccount") -> None:
         self.is_active = True
         self.save(update_fields=("is_active",))
+
+
+class IdempotencyKey(models.Model):
+    """
+    A request made with an `Idempotency-Key` header and, once it has been
+    answered, its response. Used by `demoapp.idempotency.DatabaseStore`.
+    """
+    # Indexed by `unique_idempotency_key`
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name='+', db_index=False
+    )
+    key: models.CharField = models.CharField(max_length=255)
+    fingerprint: models.CharField = models.CharField(max_length=64)
+    # Both unset while the request is being processed
+    status_code: models.PositiveSmallIntegerField = \
+        models.PositiveSmallIntegerField(null=True)
+    response: models.JSONField = models.JSONField(
+        null=True, encoder=DjangoJSONEncoder
+    )
+    expires_at: models.DateTimeField = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('customer', 'key'), name='unique_idempotency_key'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('expires_at',),
+                         name='idempotency_key_expiry_idx'),
+        )
+
+    @classmethod
+    def purge_expired(cls: Type["IdempotencyKey"]) -> int:
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, or every JWT issued to a customer up to `revoked_at`,
+    until they would have expired anyway. Used by
+    `demoapp.tokens.DatabaseDenylist`.
+    """
+    # The token's `jti`, or the customer's id
+    key: models.CharField = models.CharField(max_length=255, unique=True)
+    revoked_at: models.DateTimeField = models.DateTimeField()
+    expires_at: models.DateTimeField = models.DateTimeField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('expires_at',),
+                         name='revoked_token_expiry_idx'),
+        )
+
+    @classmethod
+    def purge_expired(cls: Type["RevokedToken"]) -> int:
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+class CustomerSearchToken(models.Model):
+    """
+    A normalized word of a customer's name, email or PAN, kept in sync on
+    every save of the customer, see `demoapp.customer_search`.
+    """
+    # Indexed by `unique_customer_search_token`
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name='+', db_index=False
+    )
+    # Also indexed for `LIKE 'x%'` on PostgreSQL
+    token: models.CharField = models.CharField(max_length=64, db_index=True)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('customer', 'token'),
+                name='unique_customer_search_token'
+            ),
+        )
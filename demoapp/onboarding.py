@@ -0,0 +1,173 @@
+"""
+Bulk onboarding of customer bank accounts from partner files.
+
+Rows are validated field by field in memory. Everything that needs the
+database (customer and bank existence, uniqueness of the IFSC code and
+account number pair, the per-customer account limit) is resolved with a
+constant number of set-based queries per batch, and the accepted rows of
+a batch are written with a single `bulk_create` and counted on their
+customers with a single update.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, When
+from demoapp import logs
+from demoapp.models import Customer, Bank, CustomerBankAccount
+from demoapp.serializers import BulkCustomerBankAccountSerializer
+from typing import Any, Dict, IO, Iterable, Iterator, List, Set, Tuple
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Result of onboarding a single row
+RowResult = Dict[str, Any]
+
+
+def read_rows(stream: IO, format: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads account rows from a JSON array or a CSV file with a header row.
+    Empty CSV cells are dropped so that model defaults apply to them.
+    """
+    if format == 'json':
+        rows = json.load(stream)
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON array of accounts.')
+        yield from rows
+    elif format == 'csv':
+        if isinstance(stream.read(0), bytes):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig')
+        for row in csv.DictReader(stream):
+            yield {
+                field: value for field, value in row.items()
+                if field and value not in (None, '')
+            }
+    else:
+        raise ValueError(f'Unsupported format: { format }')
+
+
+def onboard_accounts(
+    rows: Iterable[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> List[RowResult]:
+    """
+    Creates inactive bank accounts for the given rows and returns one
+    result per row, in input order. Rows are numbered from 1.
+    """
+    results: List[RowResult] = []
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return results
+        results.extend(onboard_batch(batch, first_row=len(results) + 1))
+
+
+def onboard_batch(
+    rows: List[Dict[str, Any]], first_row: int = 1
+) -> List[RowResult]:
+    results: List[RowResult] = [
+        { 'row': number, 'status': 'created' }
+        for number in range(first_row, first_row + len(rows))
+    ]
+
+    def reject(index: int, errors: Any) -> None:
+        results[index]['status'] = 'error'
+        results[index]['errors'] = errors
+
+    candidates: List[Tuple[int, Dict[str, Any]]] = []
+    for index, row in enumerate(rows):
+        serializer = BulkCustomerBankAccountSerializer(data=row)
+        if serializer.is_valid():
+            candidates.append((index, serializer.validated_data))
+        else:
+            reject(index, serializer.errors)
+
+    if not candidates:
+        return results
+
+    customer_ids: Set[int] = { data['customer'] for _, data in candidates }
+    bank_ids: Set[int] = { data['bank'] for _, data in candidates }
+    pairs: Set[Tuple[str, str]] = {
+        (data['ifsc_code'], data['account_number']) for _, data in candidates
+    }
+
+    try:
+        with transaction.atomic():
+            # Locking the customers serializes us with concurrent account
+            # creation for the same customers, and keeps their account
+            # counts current until the batch is counted.
+            account_counts: Dict[int, int] = dict(
+                Customer.objects.select_for_update()
+                                .filter(pk__in=customer_ids)
+                                .values_list('pk', 'account_count')
+            )
+            known_customers: Set[int] = set(account_counts)
+            known_banks: Set[int] = set(
+                Bank.objects.filter(pk__in=bank_ids)
+                            .values_list('pk', flat=True)
+            )
+            existing_pairs: Set[Tuple[str, str]] = {
+                pair for pair in CustomerBankAccount.objects.filter(
+                    account_number__in={ number for _, number in pairs }
+                ).values_list('ifsc_code', 'account_number')
+                if pair in pairs
+            }
+            created_counts: Dict[int, int] = {}
+            accounts: List[Tuple[int, CustomerBankAccount]] = []
+            for index, data in candidates:
+                customer_id: int = data['customer']
+                pair = (data['ifsc_code'], data['account_number'])
+                if customer_id not in known_customers:
+                    reject(index, { 'customer': ['Customer does not exist.'] })
+                elif data['bank'] not in known_banks:
+                    reject(index, { 'bank': ['Bank does not exist.'] })
+                elif pair in existing_pairs:
+                    reject(index, ['Account already exists!'])
+                elif account_counts[customer_id] + \
+                        created_counts.get(customer_id, 0) >= \
+                        settings.MAX_ACCOUNTS_PER_CUSTOMER:
+                    reject(index, ['Maximum number of accounts limit reached!'])
+                else:
+                    existing_pairs.add(pair)
+                    created_counts[customer_id] = \
+                        created_counts.get(customer_id, 0) + 1
+                    accounts.append((index, CustomerBankAccount(
+                        **{
+                            field: value for field, value in data.items()
+                            if field not in ('customer', 'bank')
+                        },
+                        customer_id=customer_id,
+                        bank_id=data['bank'],
+                    )))
+
+            CustomerBankAccount.objects.bulk_create(
+                [account for _, account in accounts]
+            )
+            for _, account in accounts:
+                logs.audit('account_created', account_id=account.pk,
+                           customer_id=account.customer_id)
+            if created_counts:
+                Customer.objects.filter(pk__in=created_counts).update(
+                    account_count=Case(*(
+                        When(pk=customer_id, then=F('account_count') + count)
+                        for customer_id, count in created_counts.items()
+                    ))
+                )
+    except IntegrityError as ie:
+        # Lost a race against a concurrent insert of one of the pairs.
+        # Nothing from this batch was written.
+        for result in results:
+            if result['status'] == 'created':
+                result['status'] = 'error'
+                result['errors'] = [
+                    f'Batch was rolled back, please retry: { str(ie) }'
+                ]
+        return results
+
+    for index, account in accounts:
+        results[index]['id'] = account.pk
+    return results
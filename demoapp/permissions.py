@@ -17,4 +17,15 @@ class IsCustomerAuthenticated(permissions.BasePermission):
     def has_object_permission(self, request, view, obj) -> bool:
         # Allow only authenticated customers to retrieve and update
         # their information.
-        return request.user and request.user.is_authenticated
\ No newline at end of file
+        return request.user and request.user.is_authenticated
+
+class IsSuperUser(permissions.BasePermission):
+    """
+    Allows access only to authenticated superusers.
+    """
+
+    def has_permission(self, request, view) -> bool:
+        return bool(
+            request.user and request.user.is_authenticated and
+            request.user.is_superuser
+        )
@@ -0,0 +1,183 @@
+"""
+Per-request profiling: query counts, database and serializer time and
+total latency, aggregated per view into the metrics registry.
+
+`demoapp.middleware.ProfilingMiddleware` starts a `RequestProfile` for a
+sample of the requests. Queries are recorded by `record_query()`, an
+execute wrapper installed on every database connection, and serializer
+time through `ProfiledSerializerMixin`. Both do nothing outside of a
+profiled request.
+"""
+import collections
+import contextlib
+import contextvars
+import time
+from django.conf import settings
+from rest_framework import serializers
+from demoapp.metrics import registry
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+
+PROFILING: Dict[str, Any] = {
+    'SAMPLE_RATE': 0.1,
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'N_PLUS_ONE_SAMPLES': 50,
+    **getattr(settings, 'PROFILING', {}),
+}
+
+request_seconds = registry.histogram(
+    'demoapp_request_seconds', 'Total time spent handling requests, by view.'
+)
+db_seconds = registry.histogram(
+    'demoapp_request_db_seconds',
+    'Time spent running database queries per request, by view.'
+)
+serializer_seconds = registry.histogram(
+    'demoapp_request_serializer_seconds',
+    'Time spent serializing responses per request, by view.'
+)
+request_queries = registry.histogram(
+    'demoapp_request_queries',
+    'Number of database queries per request, by view.',
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+n_plus_one_requests = registry.counter(
+    'demoapp_n_plus_one_requests_total',
+    'Profiled requests which ran the same query repeatedly, by view.'
+)
+
+# The most recent requests flagged as N+1, for the profiling endpoint
+n_plus_one_samples: Deque[Dict[str, Any]] = \
+    collections.deque(maxlen=PROFILING['N_PLUS_ONE_SAMPLES'])
+
+
+class RequestProfile:
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.statements: Dict[str, int] = collections.Counter()
+        self._serializer_depth = 0
+
+    def repeated_statements(self, threshold: int) -> List[Dict[str, Any]]:
+        return [
+            { 'sql': sql, 'count': count }
+            for sql, count in self.statements.items() if count >= threshold
+        ]
+
+
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = \
+    contextvars.ContextVar('current_profile', default=None)
+
+
+def record_query(execute: Callable, sql: str, params: Any, many: bool,
+                 context: Dict[str, Any]) -> Any:
+    """
+    Times every query of a profiled request. Queries are told apart by
+    their SQL with placeholders, so running the same query with different
+    parameters over and over shows up as a repeat.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - started
+        profile.queries += 1
+        profile.statements[sql] += 1
+
+
+def install_query_recorder(sender: Any, connection: Any, **kwargs: Any) -> None:
+    """
+    `connection_created` receiver adding `record_query()` to every new
+    connection. Connections are per thread, so wrapping them from the
+    middleware would miss the queries the async ORM runs on its threads.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextlib.contextmanager
+def serializer_timer() -> Iterator[None]:
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    # Only the outermost serializer is timed, nested ones are part of it.
+    profile._serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._serializer_depth -= 1
+        if not profile._serializer_depth:
+            profile.serializer_time += time.perf_counter() - started
+
+
+def record(view: str, profile: RequestProfile, total: float) -> None:
+    # `get_report()` goes by `request_seconds`, so it is observed last.
+    db_seconds.observe(profile.db_time, view=view)
+    serializer_seconds.observe(profile.serializer_time, view=view)
+    request_queries.observe(profile.queries, view=view)
+    request_seconds.observe(total, view=view)
+
+    repeated = profile.repeated_statements(PROFILING['N_PLUS_ONE_THRESHOLD'])
+    if repeated:
+        n_plus_one_requests.inc(view=view)
+        n_plus_one_samples.append({ 'view': view, 'statements': repeated })
+
+
+def get_report() -> Dict[str, Any]:
+    """
+    Summarizes the profiled requests per view.
+    """
+    views: Dict[str, Dict[str, Any]] = {}
+    n_plus_one = {
+        dict(labels)['view']: count
+        for labels, count in n_plus_one_requests.snapshot().items()
+    }
+    for labels, histogram in list(request_seconds.values.items()):
+        view = dict(labels)['view']
+        queries = request_queries.values[labels]
+        db = db_seconds.values[labels]
+        serializer = serializer_seconds.values[labels]
+        views[view] = {
+            'requests': histogram.count,
+            'mean_ms': round(histogram.sum / histogram.count * 1000, 2),
+            'p50_ms': request_seconds.percentile(50, view=view) * 1000,
+            'p99_ms': request_seconds.percentile(99, view=view) * 1000,
+            'mean_queries': round(queries.sum / queries.count, 2),
+            'mean_db_ms': round(db.sum / db.count * 1000, 2),
+            'mean_serializer_ms':
+                round(serializer.sum / serializer.count * 1000, 2),
+            'n_plus_one_requests': n_plus_one.get(view, 0),
+        }
+    return {
+        'sample_rate': PROFILING['SAMPLE_RATE'],
+        'views': views,
+        'recent_n_plus_one': list(n_plus_one_samples),
+    }
+
+
+class ProfiledListSerializer(serializers.ListSerializer):
+    @property
+    def data(self) -> Any:
+        with serializer_timer():
+            return super().data
+
+
+class ProfiledSerializerMixin:
+    """
+    Adds the time spent producing `.data` to the current request profile.
+    Serializers using it should also set `list_serializer_class =
+    ProfiledListSerializer` in their `Meta`.
+    """
+
+    @property
+    def data(self) -> Any:
+        with serializer_timer():
+            return super().data                             # type: ignore
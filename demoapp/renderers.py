@@ -0,0 +1,35 @@
+from rest_framework import renderers
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    `JSONRenderer` producing the same bytes through orjson, when it is
+    installed, for the compact, unindented, non-ASCII output DRF renders
+    by default. Anything orjson cannot encode (lazy translations, for
+    instance) goes through `json`.
+
+    Floats are formatted differently by the two (`1e-07` and `1e-7`), only
+    use it for responses without any.
+    """
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Any = None) -> bytes:
+        if orjson is None or data is None or not self.compact or \
+           self.ensure_ascii or not self.strict or \
+           self.get_indent(accepted_media_type or '',
+                           renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content: bytes = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like `JSONRenderer` does, so the output is valid
+        # JavaScript.
+        return content.replace('\u2028'.encode(), b'\\u2028') \
+                      .replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,210 @@
+"""
+Generation of synthetic customers, banks and accounts, for benchmarks and
+staging environments.
+
+Rows are generated lazily from their sequence number, so any number of
+them can be inserted in fixed size batches with bounded memory. Numbers
+map to distinct emails, PAN numbers and (IFSC code, account number) pairs,
+all in the `SEED_DOMAIN` namespace, so seeding again from the next number
+never collides with earlier seeded rows.
+"""
+import string
+from dataclasses import dataclass
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from demoapp import customer_search
+from demoapp.models import Customer, Bank, CustomerBankAccount
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+SEED_DOMAIN = 'seed.example.com'
+
+LETTERS = string.ascii_uppercase
+
+# Columns of the rows given to `insert_accounts()`
+ACCOUNT_COLUMNS = (
+    'customer_id', 'bank_id', 'ifsc_code', 'account_number', 'branch_name',
+    'name_as_per_bank_record', 'is_active',
+)
+
+
+def encode_letters(number: int, length: int) -> str:
+    letters = []
+    for _ in range(length):
+        number, remainder = divmod(number, len(LETTERS))
+        letters.append(LETTERS[remainder])
+    if number:
+        raise ValueError('Number too large to encode')
+    return ''.join(reversed(letters))
+
+
+def get_email(number: int) -> str:
+    return f'customer{ number }@{ SEED_DOMAIN }'
+
+
+def get_pan_number(number: int) -> str:
+    """
+    A well-formed individual PAN: three letters, `P` (the holder is a
+    person), a letter, four digits and a check letter.
+    """
+    letters, digits = divmod(number, 10000)
+    prefix = encode_letters(letters, 4)
+    return f'{ prefix[:3] }P{ prefix[3] }{ digits:04d}' \
+           f'{ LETTERS[number % len(LETTERS)] }'
+
+
+def get_ifsc_code(bank_number: int, branch: int) -> str:
+    """
+    Four letter bank code, a zero and a six digit branch code.
+    """
+    return f'{ encode_letters(bank_number, 4) }0{ branch % 1000000:06d}'
+
+
+def get_account_number(number: int, account: int) -> str:
+    return f'{ number:012d}{ account:02d}'
+
+
+@dataclass
+class SeedStats:
+    banks: int = 0
+    customers: int = 0
+    accounts: int = 0
+
+
+def get_next_number() -> int:
+    """
+    Returns the number following the seeded customers already present.
+    """
+    return Customer.objects.filter(email__endswith=f'@{ SEED_DOMAIN }').count()
+
+
+def seed(
+    customers: int,
+    banks: int = 100,
+    accounts_per_customer: int = 2,
+    password: str = 'demo-password',
+    shared_hash: bool = True,
+    batch_size: int = 5000,
+    start: Optional[int] = None,
+    progress: Optional[Callable[[SeedStats], None]] = None,
+) -> SeedStats:
+    """
+    Inserts `customers` customers with `accounts_per_customer` accounts each,
+    the first of which is active, spread over `banks` new banks. Each batch
+    is committed on its own.
+
+    Hashing a password takes longer than inserting a row, so by default one
+    hash is computed and shared by every customer.
+    """
+    if accounts_per_customer > settings.MAX_ACCOUNTS_PER_CUSTOMER:
+        raise ValueError(
+            f'Customers can have at most '
+            f'{ settings.MAX_ACCOUNTS_PER_CUSTOMER } accounts.'
+        )
+    if start is None:
+        start = get_next_number()
+
+    stats = SeedStats()
+    first_bank = Bank.objects.count()
+    bank_ids: List[int] = [bank.pk for bank in Bank.objects.bulk_create(
+        Bank(name=f'Bank { number }', website='https://bank.example.com',
+             number=str(number))
+        for number in range(first_bank, first_bank + banks)
+    )] or list(Bank.objects.values_list('pk', flat=True)[:100])
+    if not bank_ids:
+        raise ValueError('There are no banks to open the accounts at.')
+    stats.banks = banks
+
+    shared_password = make_password(password) if shared_hash else None
+    for batch_start in range(start, start + customers, batch_size):
+        numbers = range(batch_start, min(batch_start + batch_size,
+                                         start + customers))
+        with transaction.atomic():
+            created = Customer.objects.bulk_create(
+                generate_customers(numbers, password, shared_password,
+                                   accounts_per_customer)
+            )
+            # `bulk_create()` sends no signals
+            customer_search.index_customers(created)
+            insert_accounts(generate_accounts(
+                numbers, created, bank_ids, accounts_per_customer
+            ))
+        stats.customers += len(created)
+        stats.accounts += len(created) * accounts_per_customer
+        if progress is not None:
+            progress(stats)
+    return stats
+
+
+def generate_customers(
+    numbers: range, password: str, shared_password: Optional[str],
+    account_count: int,
+) -> Iterator[Customer]:
+    for number in numbers:
+        customer = Customer(
+            email=get_email(number),
+            first_name='Demo',
+            last_name=f'Customer { number }',
+            pan_number=get_pan_number(number),
+            account_count=account_count,
+        )
+        if shared_password is None:
+            customer.set_password(password)
+        else:
+            customer.password = shared_password
+        yield customer
+
+
+def generate_accounts(
+    numbers: range, customers: List[Customer], bank_ids: List[int],
+    accounts_per_customer: int,
+) -> Iterator[Tuple[Any, ...]]:
+    for number, customer in zip(numbers, customers):
+        name = customer.get_fullname()
+        branch = number // 1000
+        for account in range(accounts_per_customer):
+            bank_index = (number + account) % len(bank_ids)
+            yield (
+                customer.pk,
+                bank_ids[bank_index],
+                get_ifsc_code(bank_index, branch),
+                get_account_number(number, account),
+                f'Branch { branch }',
+                name,
+                account == 0,
+            )
+
+
+def insert_accounts(rows: Iterable[Tuple[Any, ...]]) -> None:
+    """
+    Inserts accounts given as tuples of `ACCOUNT_COLUMNS`, the other columns
+    get their model defaults. Seeding inserts twice as many accounts as
+    customers, and for them building model instances and compiling the
+    INSERT of every `bulk_create()` chunk costs more than the inserts, so
+    the INSERT is compiled once and the rows are sent with `executemany()`.
+    """
+    fields = [field for field in CustomerBankAccount._meta.concrete_fields
+              if not field.primary_key]
+    defaults = CustomerBankAccount()
+    template = [
+        field.get_db_prep_save(getattr(defaults, field.attname), connection)
+        for field in fields
+    ]
+    attnames = [field.attname for field in fields]
+    positions = [attnames.index(column) for column in ACCOUNT_COLUMNS]
+
+    def complete(row: Tuple[Any, ...]) -> List[Any]:
+        values = template.copy()
+        for position, value in zip(positions, row):
+            values[position] = value
+        return values
+
+    quote_name = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO { quote_name(CustomerBankAccount._meta.db_table) } '
+        f'({ ", ".join(quote_name(field.column) for field in fields) }) '
+        f'VALUES ({ ", ".join(["%s"] * len(fields)) })'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [complete(row) for row in rows])
@@ -1,9 +1,32 @@
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.db import transaction
 from rest_framework import exceptions, serializers
+from demoapp import cheques, logs
+from demoapp.cache import LRUCache
 from demoapp.models import Customer, Bank, CustomerBankAccount
-from typing import Any, Dict
+from demoapp.profiling import ProfiledListSerializer, ProfiledSerializerMixin
+from typing import Any, Dict, Optional
+
+
+# Logo URLs by bank id. Entries are dropped whenever the bank is saved or
+# deleted (see `demoapp.signals`) and expire so that other processes pick
+# up changes too.
+bank_logo_urls = LRUCache(maxsize=4096, ttl=300)
+
+
+def get_bank_logo_url(account: CustomerBankAccount) -> Optional[str]:
+    """
+    Returns the URL of the logo of the account's bank, fetching the bank
+    only if it is neither cached nor already loaded on the account.
+    """
+    url: Optional[str] = bank_logo_urls.get(account.bank_id, '')
+    if url == '':
+        bank: Bank = account.bank
+        url = bank.logo.url if bank.logo else None
+        bank_logo_urls.set(account.bank_id, url)
+    return url
 
 
 class AuthEmailTokenSerializer(serializers.Serializer):
@@ -32,9 +55,26 @@ class AuthEmailTokenSerializer(serializers.Serializer):
         return attrs
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class SparseFieldsetSerializerMixin:
+    """
+    Takes an optional `fields` argument listing the only fields the
+    serializer should output.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)                       # type: ignore
+        if fields is not None:
+            for name in set(self.fields) - set(fields):         # type: ignore
+                self.fields.pop(name)                           # type: ignore
+
+
+class CustomerSerializer(ProfiledSerializerMixin,
+                         SparseFieldsetSerializerMixin,
+                         serializers.ModelSerializer):
     class Meta:
         model = Customer
+        list_serializer_class = ProfiledListSerializer
         read_only_fields = ('id',)
         fields = (
             'id', 'email', 'password', 'first_name', 'last_name', 'middle_name',
@@ -59,18 +99,34 @@ class CustomerSerializer(serializers.ModelSerializer):
         return customer
 
 
-class BankSerializer(serializers.ModelSerializer):
+class BankSerializer(ProfiledSerializerMixin,
+                     SparseFieldsetSerializerMixin,
+                     serializers.ModelSerializer):
     class Meta:
         model = Bank
+        list_serializer_class = ProfiledListSerializer
         read_only_fields = ('id',)
         fields = '__all__'
 
 
-class CustomerBankAccountSerializer(serializers.ModelSerializer):
+class CustomerBankAccountSerializer(ProfiledSerializerMixin,
+                                    serializers.ModelSerializer):
     class Meta:
         model = CustomerBankAccount
-        read_only_fields = ('id', 'customer',)
+        list_serializer_class = ProfiledListSerializer
+        read_only_fields = (
+            'id', 'customer', 'cheque_thumbnail', 'cheque_image_hash',
+            'cheque_processing_status',
+        )
         fields = '__all__'
+        # Uniqueness is checked by `validate_unique_account()` instead of
+        # the validators generated from the model constraints, saving a
+        # query per validation.
+        validators = []
+
+    # Read by `values_representation()`, see
+    # `demoapp.compiled_serializers`.
+    extra_values = ('bank__logo',)
 
     def validate_unique_account(
         self, ifsc_code: str, account_number: str
@@ -92,50 +148,102 @@ class CustomerBankAccountSerializer(serializers.ModelSerializer):
                 )
             return
 
-        if CustomerBankAccount.get_account(ifsc_code, account_number):
+        # The caller may have looked the pair up already, see
+        # `demoapp.services.activate_or_create_account()`.
+        known_accounts = self.context.get('known_accounts', {})
+        pair = (ifsc_code, account_number)
+        if pair in known_accounts:
+            account = known_accounts[pair]
+        else:
+            account = CustomerBankAccount.get_account(*pair)
+        if account:
             raise serializers.ValidationError("Account already exists!")
 
-    def validate_account_limit(self) -> None:
-        """
-        Custom validator for checking if maximum accounts limit has been
-        reached.
-        """
-        # Do nothing if updating
-        if self.instance:
-            return
-
-        # Check if we reached the max accounts limit
-        customer: Customer = self.context['request'].user
-        num_accounts: int = CustomerBankAccount.get_accounts_count(customer)
-        if num_accounts >= settings.MAX_ACCOUNTS_PER_CUSTOMER:
+    def validate_cheque_image(self, cheque_image: Any) -> Any:
+        max_bytes: int = settings.CHEQUE_IMAGE_MAX_BYTES
+        if cheque_image and cheque_image.size > max_bytes:
             raise serializers.ValidationError(
-                "Maximum number of accounts limit reached!"
+                f"Cheque image must not be larger than "
+                f"{ max_bytes // (1024 * 1024) } MB."
             )
+        return cheque_image
 
     def validate(self, attrs: Dict[str, Any]) -> Any:
-        self.validate_account_limit()
+        # The account limit is enforced when the account is counted, see
+        # `demoapp.services.activate_or_create_account()`.
+        # Partial updates may leave out the IFSC code and account number
         self.validate_unique_account(
-            ifsc_code=attrs['ifsc_code'],
-            account_number=attrs['account_number']
+            ifsc_code=attrs.get(
+                'ifsc_code', getattr(self.instance, 'ifsc_code', None)
+            ),
+            account_number=attrs.get(
+                'account_number', getattr(self.instance, 'account_number', None)
+            )
         )
         return super().validate(attrs)
 
+    def save(self, **kwargs: Any) -> CustomerBankAccount:
+        """
+        Hands newly uploaded cheque images to the background processing
+        once the account is committed.
+        """
+        has_cheque_image = bool(self.validated_data.get('cheque_image'))
+        if has_cheque_image:
+            kwargs['cheque_processing_status'] = 'pending'
+        instance: CustomerBankAccount = super().save(**kwargs)
+        if has_cheque_image:
+            transaction.on_commit(
+                lambda: cheques.worker.enqueue(instance.pk)
+            )
+        return instance
+
     def update(
         self, instance: CustomerBankAccount, validated_data: Any
     ) -> CustomerBankAccount:
         """
         Prevents update in case the account verification was approved.
+        Audited, whichever view it comes from.
         """
         if instance.verification_status == "approved":
             raise exceptions.PermissionDenied(
                 detail="Sorry! Cannot update a verified bank account."
             )
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        logs.audit('account_updated', account_id=instance.pk,
+                   customer_id=instance.customer_id,
+                   fields=sorted(validated_data))
+        return instance
 
     def to_representation(self, instance: CustomerBankAccount) -> Any:
         representation: Any = super().to_representation(instance)
-        bank: Bank = instance.bank
-        logo = bank.logo
-        if logo:
-            representation['bank_logo'] = logo.url
+        logo_url = get_bank_logo_url(instance)
+        if logo_url:
+            representation['bank_logo'] = logo_url
         return representation
+
+    @staticmethod
+    def values_representation(row: Dict[str, Any],
+                              representation: Dict[str, Any]) -> None:
+        # As `to_representation()`, from a `values()` row
+        logo: Optional[str] = row['bank__logo']
+        if logo:
+            representation['bank_logo'] = \
+                Bank._meta.get_field('logo').storage.url(logo)  # type: ignore
+
+
+class BulkCustomerBankAccountSerializer(serializers.ModelSerializer):
+    """
+    Validates a single row of a bulk onboarding batch without touching
+    the database. Relations are taken as plain ids and checked for the
+    whole batch at once, see `demoapp.onboarding`.
+    """
+    customer = serializers.IntegerField()
+    bank = serializers.IntegerField()
+
+    class Meta:
+        model = CustomerBankAccount
+        fields = (
+            'customer', 'bank', 'account_number', 'ifsc_code', 'branch_name',
+            'name_as_per_bank_record', 'account_type', 'verification_mode',
+        )
+        validators = []
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework.serializers import BaseSerializer, ValidationError
+from rest_framework.settings import api_settings
+from demoapp import logs
+from demoapp.models import Customer, CustomerBankAccount
+from typing import Any, Dict
+
+
+@transaction.atomic
+def activate_or_create_account(
+    customer: Customer, serializer: BaseSerializer
+) -> CustomerBankAccount:
+    """
+    Makes the account described by the serializer's initial data the
+    active account of the customer.
+
+    If the customer already owns an inactive account with the same IFSC
+    code and account number, that account is reactivated. Otherwise the
+    serializer is validated and a new active account is created.
+
+    Runs in a single transaction holding a lock on the customer row, so
+    concurrent switches for the same customer cannot leave them with two
+    active accounts (which the `unique_active_account` constraint would
+    reject anyway). The lock also keeps the customer's account count, see
+    `Customer.account_count`, current while checking it against
+    `MAX_ACCOUNTS_PER_CUSTOMER`.
+
+    `customer` may be a JWT `TokenUser`, only its `pk` is used.
+    """
+    customer = Customer.objects.select_for_update() \
+                               .only('pk', 'account_count') \
+                               .get(pk=customer.pk)
+
+    data: Dict[str, Any] = serializer.initial_data      # type: ignore
+    ifsc_code = data.get('ifsc_code')
+    account_number = data.get('account_number')
+    account = None
+    if ifsc_code and account_number:
+        account = CustomerBankAccount.get_account(
+            ifsc_code=ifsc_code, account_number=account_number
+        )
+        # Let the serializer reuse this lookup for its uniqueness check.
+        serializer.context['known_accounts'] = {
+            (ifsc_code, account_number): account,
+        }
+
+    if account is not None and account.customer_id == customer.pk \
+       and not account.is_active:
+        CustomerBankAccount.deactivate_active_account(customer)
+        account.activate()
+        logs.audit('account_activated', account_id=account.pk,
+                   customer_id=customer.pk)
+        return account
+
+    serializer.is_valid(raise_exception=True)
+    # The new account is counted by `demoapp.signals`.
+    if customer.account_count >= settings.MAX_ACCOUNTS_PER_CUSTOMER:
+        raise ValidationError({ api_settings.NON_FIELD_ERRORS_KEY: [
+            'Maximum number of accounts limit reached!'
+        ]})
+    CustomerBankAccount.deactivate_active_account(customer)
+    account = serializer.save(customer=customer, is_active=True)
+    logs.audit('account_created', account_id=account.pk,
+               customer_id=customer.pk)
+    return account
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from demoapp import (
+    active_accounts, authentication, bank_directory, customer_search,
+    profiling, tokens,
+)
+from demoapp.models import Customer, Bank, CustomerBankAccount
+from demoapp.serializers import bank_logo_urls
+
+
+connection_created.connect(profiling.install_query_recorder)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance: Token, **kwargs) -> None:
+    authentication.invalidate_tokens((instance.key,))
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_customer_tokens(
+    sender, instance: Customer, created: bool, update_fields=None, **kwargs
+) -> None:
+    # A freshly created customer cannot have a cached token yet. For
+    # existing ones anything on the cached instance (`is_active` most
+    # importantly) may have changed, so drop their token, unless only
+    # `last_login` was saved, as on every session login.
+    if not created and (update_fields is None
+                        or set(update_fields) - {'last_login'}):
+        authentication.invalidate_customer_tokens(instance.pk)
+    # Signed tokens are checked without loading the customer, so those of
+    # a deactivated customer are revoked outright.
+    if not instance.is_active:
+        tokens.revoke_customer_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Customer)
+def index_customer(
+    sender, instance: Customer, update_fields=None, **kwargs
+) -> None:
+    # Saves of other fields only, such as `last_login`, leave the search
+    # tokens as they are.
+    if update_fields is not None and \
+       not set(update_fields) & set(customer_search.SEARCH_FIELDS):
+        return
+    customer_search.index_customer(instance)
+
+
+@receiver(post_save, sender=CustomerBankAccount)
+@receiver(post_delete, sender=CustomerBankAccount)
+def invalidate_active_account(
+    sender, instance: CustomerBankAccount, **kwargs
+) -> None:
+    active_accounts.invalidate(instance.customer_id)
+
+
+# Accounts inserted without signals (`bulk_create()`) are counted by the
+# code inserting them.
+@receiver(post_save, sender=CustomerBankAccount)
+def add_account_slot(
+    sender, instance: CustomerBankAccount, created: bool, **kwargs
+) -> None:
+    if created:
+        Customer.add_account_slots(instance.customer_id)
+
+
+@receiver(post_delete, sender=CustomerBankAccount)
+def release_account_slot(
+    sender, instance: CustomerBankAccount, **kwargs
+) -> None:
+    Customer.release_account_slots(instance.customer_id)
+
+
+@receiver(post_save, sender=Bank)
+@receiver(post_delete, sender=Bank)
+def invalidate_bank_logo_url(sender, instance: Bank, **kwargs) -> None:
+    bank_logo_urls.delete(instance.pk)
+
+
+@receiver(post_save, sender=Bank)
+@receiver(post_delete, sender=Bank)
+def invalidate_bank_directory(sender, instance: Bank, **kwargs) -> None:
+    # After the commit, or a request in between could cache the old
+    # version again.
+    transaction.on_commit(bank_directory.invalidate)
+    # Account representations carry their bank's logo.
+    active_accounts.invalidate_all()
@@ -1,3 +1,1543 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from demoapp import (
+    active_accounts, authentication, cheques, compiled_serializers, customer_search,
+    db_routers, hashing, logs, idempotency, pagination, profiling, seeding, tokens, verification, warmup,
+)
+from demoapp.models import (
+    Customer, Bank, CustomerBankAccount, CustomerSearchToken, IdempotencyKey,
+    RevokedToken,
+)
+from demoapp.middleware import ReplicaRoutingMiddleware
+from demoapp.onboarding import onboard_accounts
+from demoapp.renderers import FastJSONRenderer
+from demoapp.serializers import (
+    BankSerializer, CustomerBankAccountSerializer, CustomerSerializer,
+    bank_logo_urls,
+)
+from demoapp.throttling import LoginEmailRateThrottle
 
-# Create your tests here.
+
+def create_customer(email: str = 'jane@example.com', **extra_fields) -> Customer:
+    extra_fields.setdefault('first_name', 'Jane')
+    extra_fields.setdefault('last_name', 'Doe')
+    extra_fields.setdefault('pan_number', 'ABCDE1234F')
+    return Customer.objects.create_user(
+        email=email, password='s3cret-pass', **extra_fields
+    )
+
+
+def create_bank(name: str = 'Demo Bank') -> Bank:
+    return Bank.objects.create(
+        name=name, website='https://bank.example.com', number='1800'
+    )
+
+
+def account_data(bank: Bank, number: str = '000111', **extra_fields):
+    return {
+        'bank': bank.pk,
+        'account_number': number,
+        'ifsc_code': 'DEMO0000001',
+        'branch_name': 'Main',
+        'name_as_per_bank_record': 'Jane Doe',
+        **extra_fields,
+    }
+
+
+class CachingTokenAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        authentication.token_cache.clear()
+        self.customer = create_customer()
+        self.token = Token.objects.create(user=self.customer)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_hit_the_cache(self) -> None:
+        self.client.get('/api/customers/')
+        with self.assertNumQueries(1):  # The customer listing itself
+            response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(authentication.get_stats()['hits'], 1)
+
+    def test_requests_get_their_own_instances(self) -> None:
+        auth = authentication.CachingTokenAuthentication()
+        first, first_token = auth.authenticate_credentials(self.token.key)
+        first.first_name = 'Changed'
+        second, second_token = auth.authenticate_credentials(self.token.key)
+        self.assertIsNot(first, second)
+        self.assertIs(second_token.user, second)
+        self.assertEqual(second.first_name, self.customer.first_name)
+
+    def test_saving_last_login_keeps_cache(self) -> None:
+        self.client.get('/api/customers/')
+        self.customer.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            self.customer.save(update_fields=['last_login'])
+        with self.assertNumQueries(1):  # The customer listing itself
+            self.client.get('/api/customers/')
+
+    def test_deleting_token_invalidates_cache(self) -> None:
+        self.client.get('/api/customers/')
+        self.token.delete()
+        response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivating_customer_invalidates_cache(self) -> None:
+        self.client.get('/api/customers/')
+        self.customer.is_active = False
+        self.customer.save()
+        response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_processes_drop_revoked_tokens_within_ttl(self) -> None:
+        self.client.get('/api/customers/')
+        # Deleted by another process, whose signal does not reach us
+        with mock.patch.object(authentication, 'invalidate_tokens'):
+            self.token.delete()
+        self.assertEqual(self.client.get('/api/customers/').status_code, 200)
+
+        now = time.monotonic() + authentication.TOKEN_AUTH_CACHE['TTL'] + 1
+        with mock.patch('demoapp.cache.time.monotonic', return_value=now):
+            response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(AUTH_TOKEN_TTL=60)
+    def test_expired_tokens_are_rejected_and_replaced(self) -> None:
+        Token.objects.filter(pk=self.token.pk).update(
+            created=self.token.created - timedelta(minutes=2)
+        )
+        response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post('/api-token-auth/', {
+            'email': 'jane@example.com', 'password': 's3cret-pass',
+        })
+        self.assertNotEqual(response.json()['token'], self.token.key)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+
+class JWTAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.customer = create_customer()
+        self.bank = create_bank()
+        self.tokens = self.client.post('/api-token-auth/jwt/', {
+            'email': 'jane@example.com', 'password': 's3cret-pass',
+        }).json()
+
+    def get_client(self, access: str) -> APIClient:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer { access }')
+        return client
+
+    def test_access_tokens_are_checked_without_queries(self) -> None:
+        CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, account_number='1',
+            ifsc_code='DEMO0000001', is_active=True,
+        )
+        client = self.get_client(self.tokens['access'])
+        # The denylist and the active account lookup itself
+        with self.assertNumQueries(2):
+            response = client.get('/api/bank/')
+        self.assertEqual(response.status_code, 200)
+
+        with mock.patch.dict(tokens.JWT_DENYLIST,
+                             { 'STORE': 'demoapp.tokens.CacheDenylist' }):
+            tokens.get_denylist.cache_clear()
+            self.addCleanup(tokens.get_denylist.cache_clear)
+            with self.assertNumQueries(1):
+                response = client.get('/api/bank/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_tokens_are_single_use(self) -> None:
+        refresh = { 'refresh': self.tokens['refresh'] }
+        response = self.client.post('/api-token-auth/jwt/refresh/', refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], refresh['refresh'])
+
+        response = self.client.post('/api-token-auth/jwt/refresh/', refresh)
+        self.assertEqual(response.status_code, 401)
+
+    def test_revoked_tokens_are_rejected(self) -> None:
+        client = self.get_client(self.tokens['access'])
+        response = client.post('/api-token-auth/jwt/revoke/', {
+            'refresh': self.tokens['refresh'],
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/api/customers/').status_code, 401)
+        response = self.client.post('/api-token-auth/jwt/refresh/', {
+            'refresh': self.tokens['refresh'],
+        })
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivating_customer_revokes_tokens(self) -> None:
+        self.customer.is_active = False
+        self.customer.save()
+        client = self.get_client(self.tokens['access'])
+        self.assertEqual(client.get('/api/customers/').status_code, 401)
+
+    def test_expired_revocations_are_purged(self) -> None:
+        client = self.get_client(self.tokens['access'])
+        client.post('/api-token-auth/jwt/revoke/', {
+            'refresh': self.tokens['refresh'],
+        })
+        self.assertEqual(RevokedToken.objects.count(), 2)
+        RevokedToken.objects.update(expires_at=timezone.now())
+        call_command('purge_revoked_tokens', stdout=io.StringIO())
+        self.assertFalse(RevokedToken.objects.exists())
+
+    def test_async_views_accept_access_tokens(self) -> None:
+        CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, account_number='1',
+            ifsc_code='DEMO0000001', is_active=True,
+        )
+        client = self.get_client(self.tokens['access'])
+        response = client.get('/async/api/bank/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['account_number'], '1')
+
+        client.post('/api-token-auth/jwt/revoke/', {
+            'refresh': self.tokens['refresh'],
+        })
+        self.assertEqual(client.get('/async/api/bank/').status_code, 401)
+
+    def test_accounts_are_created_with_token_user(self) -> None:
+        client = self.get_client(self.tokens['access'])
+        response = client.post('/api/bank/', account_data(self.bank),
+                               format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            CustomerBankAccount.get_active_account(self.customer)
+                               .account_number,
+            '000111'
+        )
+
+
+class OnboardingTests(TestCase):
+    def setUp(self) -> None:
+        self.customer = create_customer()
+        self.bank = create_bank()
+
+    def row(self, number: str, **extra_fields):
+        return {
+            **account_data(self.bank, number, customer=self.customer.pk),
+            **extra_fields,
+        }
+
+    @override_settings(MAX_ACCOUNTS_PER_CUSTOMER=2)
+    def test_reports_per_row_results(self) -> None:
+        results = onboard_accounts([
+            self.row('1'),
+            self.row('1'),
+            self.row('2', bank=0),
+            self.row('3', customer=0),
+            self.row('4', account_type='bogus'),
+            self.row('5'),
+            self.row('6'),
+        ])
+        self.assertEqual(
+            [result['status'] for result in results],
+            ['created', 'error', 'error', 'error', 'error', 'created', 'error']
+        )
+        self.assertEqual(results[1]['errors'], ['Account already exists!'])
+        self.assertEqual(results[6]['errors'],
+                         ['Maximum number of accounts limit reached!'])
+        self.assertEqual(
+            CustomerBankAccount.objects.filter(customer=self.customer).count(),
+            2
+        )
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.account_count, 2)
+
+    def test_query_count_does_not_depend_on_batch_size(self) -> None:
+        Customer.objects.bulk_create(
+            Customer(email=f'{ n }@example.com', pan_number=f'PAN{ n }')
+            for n in range(50)
+        )
+        rows = [
+            account_data(self.bank, str(number), customer=customer.pk)
+            for number, customer in enumerate(Customer.objects.all())
+        ]
+        # Savepoint, customers, banks, existing pairs, insert, counting and
+        # releasing the savepoint.
+        with self.assertNumQueries(7):
+            results = onboard_accounts(rows)
+        self.assertTrue(all(r['status'] == 'created' for r in results))
+
+
+class AccountSwitchingTests(TestCase):
+    def setUp(self) -> None:
+        self.customer = create_customer()
+        self.bank = create_bank()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def create_account(self, number: str, is_active: bool = False):
+        return CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, is_active=is_active,
+            **{
+                field: value
+                for field, value in account_data(self.bank, number).items()
+                if field != 'bank'
+            }
+        )
+
+    def test_create_new_account(self) -> None:
+        previous = self.create_account('1', is_active=True)
+        # Savepoint, customer lock, pair lookup, bank, counting the account,
+        # deactivation, insert and releasing the savepoint.
+        with self.assertNumQueries(8):
+            response = self.client.post(
+                '/api/bank/', account_data(self.bank, '2'), format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        previous.refresh_from_db()
+        self.assertFalse(previous.is_active)
+        self.assertTrue(response.data['is_active'])
+
+    def test_reactivate_existing_account(self) -> None:
+        self.create_account('1', is_active=True)
+        existing = self.create_account('2')
+        # Savepoint, customer lock, pair lookup, deactivation, activation
+        # and releasing the savepoint.
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                '/api/bank/', account_data(self.bank, '2'), format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], existing.pk)
+        self.assertEqual(
+            CustomerBankAccount.get_active_account(self.customer), existing
+        )
+
+    def test_reject_account_of_another_customer(self) -> None:
+        self.create_account('1')
+        self.client.force_authenticate(
+            create_customer('john@example.com', pan_number='ZYXWV9876A')
+        )
+        # Savepoint, customer lock, pair lookup, bank and rolling back and
+        # releasing the savepoint.
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                '/api/bank/', account_data(self.bank, '1'), format='json'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'],
+                         ['Account already exists!'])
+
+    def test_update_active_account(self) -> None:
+        self.create_account('1', is_active=True)
+        # Active account and update
+        with self.assertNumQueries(2):
+            response = self.client.patch(
+                '/api/bank/', { 'branch_name': 'Uptown' }, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['branch_name'], 'Uptown')
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.customer = create_customer()
+        self.bank = create_bank()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def post(self, key: str, number: str = '1'):
+        return self.client.post('/api/bank/', account_data(self.bank, number),
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def assertRetriesAreReplayed(self) -> None:
+        first = self.post('retry-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(
+            0 if isinstance(idempotency.get_store(), idempotency.CacheStore)
+            else 1  # Reading the kept response
+        ):
+            retry = self.post('retry-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(CustomerBankAccount.objects.count(), 1)
+
+        # Another key is another request, the account is reactivated.
+        self.post('retry-2', '2')
+        self.assertEqual(self.post('retry-3').data['id'], first.data['id'])
+
+        self.assertEqual(self.post('retry-1', '3').status_code, 422)
+
+    def test_retries_are_replayed_from_the_cache(self) -> None:
+        with mock.patch.object(idempotency, 'get_store',
+                               return_value=idempotency.CacheStore()):
+            self.assertRetriesAreReplayed()
+
+    def test_retries_are_replayed_from_the_database(self) -> None:
+        self.assertRetriesAreReplayed()
+        self.assertEqual(IdempotencyKey.objects.count(), 3)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_client_errors_are_kept_and_server_errors_released(self) -> None:
+        self.post('create')
+        for replayed in (False, True):
+            response = self.client.patch('/api/bank/1/', {}, format='json',
+                                         HTTP_IDEMPOTENCY_KEY='not-found')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.has_header('Idempotent-Replayed'),
+                             replayed)
+
+        with mock.patch.object(CustomerBankAccount, 'get_active_account',
+                               side_effect=RuntimeError), \
+             self.assertRaises(RuntimeError):
+            self.client.patch('/api/bank/', {}, format='json',
+                              HTTP_IDEMPOTENCY_KEY='crash')
+        self.assertEqual(self.client.patch(
+            '/api/bank/', {}, format='json', HTTP_IDEMPOTENCY_KEY='crash'
+        ).status_code, 200)
+
+    def test_concurrent_retries_and_invalid_keys(self) -> None:
+        idempotency.get_store().claim(self.customer.pk, 'in-flight',
+                                      'fingerprint')
+        with mock.patch.object(idempotency, 'get_fingerprint',
+                               return_value='fingerprint'):
+            self.assertEqual(self.post('in-flight').status_code, 409)
+        self.assertEqual(self.post('x' * 256).status_code, 400)
+
+
+class ActiveAccountCacheTests(TestCase):
+    def setUp(self) -> None:
+        # A backend shared between processes, the per-process default is
+        # not used.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': directory.name,
+            },
+        })
+        shared.enable()
+        self.addCleanup(shared.disable)
+        backend = mock.patch.dict(active_accounts.ACTIVE_ACCOUNT_CACHE,
+                                  { 'BACKEND': 'shared' })
+        backend.start()
+        self.addCleanup(backend.stop)
+        self.customer = create_customer()
+        self.bank = create_bank()
+        self.account = CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, account_number='1',
+            ifsc_code='DEMO0000001', is_active=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self):
+        # Responses are cached once their transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get('/api/bank/')
+
+    def test_repeated_reads_hit_the_cache(self) -> None:
+        self.get()
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.data['id'], self.account.pk)
+
+    def test_updates_invalidate(self) -> None:
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/bank/', { 'branch_name': 'North' },
+                              format='json')
+        self.assertEqual(self.get().data['branch_name'], 'North')
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.data['branch_name'], 'North')
+
+    def test_writes_between_read_and_store_are_not_hidden(self) -> None:
+        read = CustomerBankAccount.get_active_account_values
+
+        def read_then_write(*args, **kwargs):
+            row = read(*args, **kwargs)
+            # A concurrent update, committed before the read is cached
+            CustomerBankAccount.objects.filter(pk=self.account.pk).update(
+                branch_name='North'
+            )
+            active_accounts.invalidate(self.customer.pk)
+            return row
+
+        with mock.patch.object(CustomerBankAccount,
+                               'get_active_account_values',
+                               side_effect=read_then_write):
+            self.assertNotEqual(self.get().data['branch_name'], 'North')
+        self.assertEqual(self.get().data['branch_name'], 'North')
+
+    def test_switching_accounts_invalidates(self) -> None:
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomerBankAccount.deactivate_active_account(self.customer)
+            other = CustomerBankAccount.objects.create(
+                customer=self.customer, bank=self.bank, account_number='2',
+                ifsc_code='DEMO0000001', is_active=True,
+            )
+        self.assertEqual(self.get().data['id'], other.pk)
+
+    def test_bank_changes_invalidate(self) -> None:
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank.save()
+        with self.assertNumQueries(1):
+            self.client.get('/api/bank/')
+
+    def test_per_process_backend_is_not_used(self) -> None:
+        with mock.patch.dict(active_accounts.ACTIVE_ACCOUNT_CACHE,
+                             { 'BACKEND': 'default' }):
+            self.get()
+            with self.assertNumQueries(1):
+                self.get()
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self) -> None:
+        self.bank = create_bank()
+        self.customer = create_customer()
+        for n in range(5):
+            CustomerBankAccount.objects.create(
+                customer=self.customer, bank=self.bank,
+                account_number=f'10000{ n }', ifsc_code='DEMO0000001',
+                is_active=n == 0,
+            )
+        self.client.force_login(Customer.objects.create_superuser(
+            email='admin@example.com', password='s3cret-pass',
+            first_name='Ada', last_name='Admin', pan_number='ADMIN0000A',
+        ))
+
+    def get_changelist(self, model: str, **params):
+        response = self.client.get(f'/admin/demoapp/{ model }/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_rows_are_not_queried_one_by_one(self) -> None:
+        self.get_changelist('customerbankaccount')
+        CustomerBankAccount.objects.create(
+            customer=create_customer('john@example.com',
+                                     pan_number='ZYXWV9876A'),
+            bank=create_bank('Other Bank'), account_number='200000',
+            ifsc_code='DEMO0000001',
+        )
+        with CaptureQueriesContext(connection) as context:
+            self.get_changelist('customerbankaccount')
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.get_changelist('customerbankaccount')
+
+    def test_exact_search(self) -> None:
+        changelist = self.get_changelist('customer', q='abcde1234f')
+        self.assertEqual(list(changelist.result_list), [self.customer])
+        changelist = self.get_changelist('customerbankaccount', q='100003')
+        self.assertEqual([account.account_number
+                          for account in changelist.result_list], ['100003'])
+        changelist = self.get_changelist('customerbankaccount',
+                                         q='jane@example.com')
+        self.assertEqual(changelist.result_count, 5)
+
+    def test_large_tables_are_estimated_and_paged_by_key(self) -> None:
+        CustomerBankAccount.objects.filter(account_number='100000').delete()
+        with mock.patch.dict(pagination.ADMIN_PAGINATION,
+                             { 'ESTIMATE_COUNT_ABOVE': 0 }):
+            paginator = pagination.LargeTablePaginator(
+                CustomerBankAccount.objects.order_by('-pk'), 2
+            )
+            # The highest primary key, deleted rows included
+            self.assertEqual(paginator.count, 5)
+            self.assertEqual(
+                [account.account_number for account in paginator.page(2)],
+                ['100002', '100001'],
+            )
+
+            with mock.patch.object(pagination, 'estimate_count',
+                                   return_value=3):
+                paginator = pagination.LargeTablePaginator(
+                    CustomerBankAccount.objects.order_by('pk'), 2
+                )
+                # An estimate short of the rows does not cut the last page
+                self.assertEqual(paginator.count, 3)
+                self.assertEqual(len(paginator.page(2)), 2)
+
+
+class CustomerSearchTests(TestCase):
+    def setUp(self) -> None:
+        self.jane = create_customer(middle_name='Émilie')
+        self.john = create_customer(
+            'john.doe@example.org', first_name='John', pan_number='ZYXWV9876A'
+        )
+        self.root = create_customer(
+            'root@example.com', first_name='Root', last_name='Admin',
+            pan_number='ROOT00000R', is_superuser=True, is_staff=True,
+        )
+
+    def search(self, query: str):
+        return list(customer_search.search(
+            Customer.objects.order_by('pk'), query
+        ))
+
+    def test_words_are_matched_by_prefix(self) -> None:
+        self.assertEqual(customer_search.tokenize('ÉMILIE d\'Souza-Rao'),
+                         ['emilie', 'd', 'souza', 'rao'])
+        self.assertEqual(self.search('do'), [self.jane, self.john])
+        self.assertEqual(self.search('Doe, JA'), [self.jane])
+        self.assertEqual(self.search('emil'), [self.jane])
+        self.assertEqual(self.search('john.doe@example'), [self.john])
+        self.assertEqual(self.search('zyxwv9876a'), [self.john])
+        self.assertEqual(self.search('jane john'), [])
+        self.assertIsNone(customer_search.search(Customer.objects.all(), 'j'))
+
+        # Every word too common to look customers up with
+        with mock.patch.dict(customer_search.CUSTOMER_SEARCH,
+                             { 'SELECTIVE_BELOW': 1 }):
+            self.assertEqual(self.search('Doe, JA'), [self.jane])
+
+    def test_tokens_follow_saves(self) -> None:
+        self.jane.last_name = 'Smith'
+        self.jane.save()
+        self.assertEqual(self.search('doe'), [self.john])
+        self.assertEqual(self.search('smi'), [self.jane])
+
+        # The update alone
+        with self.assertNumQueries(1):
+            self.jane.save(update_fields=('last_login',))
+
+        CustomerSearchToken.objects.all().delete()
+        call_command('rebuild_customer_search', batch_size=2,
+                     stdout=io.StringIO())
+        self.assertEqual(self.search('smi'), [self.jane])
+
+    def test_search_api_is_for_superusers(self) -> None:
+        client = APIClient()
+        client.force_authenticate(self.jane)
+        self.assertEqual(client.get('/api/customers/search/?q=doe')
+                         .status_code, 403)
+
+        client.force_authenticate(self.root)
+        response = client.get('/api/customers/search/?q=doe&fields=email')
+        self.assertEqual(response.json()['results'], [
+            { 'email': 'jane@example.com' }, { 'email': 'john.doe@example.org' },
+        ])
+        self.assertEqual(client.get('/api/customers/search/?q=d')
+                         .status_code, 400)
+
+    def test_admin_searches_the_index(self) -> None:
+        self.client.force_login(self.root)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/demoapp/customer/',
+                                       { 'q': 'jane doe' })
+        self.assertEqual(list(response.context['cl'].result_list), [self.jane])
+        queries = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertIn('customersearchtoken', queries)
+        self.assertNotIn('LIKE', queries)
+
+
+class AccountCountTests(TestCase):
+    def setUp(self) -> None:
+        self.customer = create_customer()
+        self.bank = create_bank()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    @override_settings(MAX_ACCOUNTS_PER_CUSTOMER=2)
+    def test_account_limit(self) -> None:
+        stale = Customer.objects.get(pk=self.customer.pk)
+        for number in ('1', '2'):
+            response = self.client.post(
+                '/api/bank/', account_data(self.bank, number), format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+        response = self.client.post(
+            '/api/bank/', account_data(self.bank, '3'), format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'],
+                         ['Maximum number of accounts limit reached!'])
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.account_count, 2)
+
+        # Saving a stale instance does not undo the count
+        stale.save()
+        CustomerBankAccount.objects.get(account_number='1').delete()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.account_count, 1)
+
+    def test_saving_deferred_instances_keeps_the_count(self) -> None:
+        customer = Customer.objects.only('pk', 'first_name', 'account_count') \
+                                   .get(pk=self.customer.pk)
+        Customer.add_account_slots(self.customer.pk)
+        customer.first_name = 'Janet'
+        with CaptureQueriesContext(connection) as queries:
+            customer.save()
+        # Only the loaded fields are written
+        update, = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "demoapp_customer"')]
+        self.assertIn('"first_name"', update)
+        self.assertNotIn('"email"', update)
+        self.assertNotIn('"account_count"', update)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.first_name, 'Janet')
+        self.assertEqual(self.customer.email, 'jane@example.com')
+        self.assertEqual(self.customer.account_count, 1)
+
+    def test_accounts_are_counted_however_they_are_created(self) -> None:
+        account = CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, account_number='1',
+            ifsc_code='DEMO0000001',
+        )
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.account_count, 1)
+        account.save()
+        account.delete()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.account_count, 0)
+
+    def test_repair_account_counts(self) -> None:
+        # Sends no signals, so is not counted
+        CustomerBankAccount.objects.bulk_create([CustomerBankAccount(
+            customer=self.customer, bank=self.bank, account_number='1',
+            ifsc_code='DEMO0000001', branch_name='Main',
+            name_as_per_bank_record='Jane Doe',
+        )])
+        output = io.StringIO()
+        call_command('repair_account_counts', stdout=output)
+        self.assertIn(f'Customer { self.customer.pk }: counted 0, has 1',
+                      output.getvalue())
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.account_count, 1)
+
+
+class SeedingTests(TestCase):
+    def test_seeded_rows_are_valid_and_unique(self) -> None:
+        seeding.seed(30, banks=3, accounts_per_customer=2, batch_size=8)
+        seeding.seed(5, banks=0, accounts_per_customer=1)
+
+        customers = Customer.objects.filter(email__endswith='@seed.example.com')
+        self.assertEqual(customers.count(), 35)
+        self.assertEqual(
+            len(set(customers.values_list('pan_number', flat=True))), 35
+        )
+        for pan_number in customers.values_list('pan_number', flat=True):
+            self.assertRegex(pan_number, r'^[A-Z]{3}P[A-Z][0-9]{4}[A-Z]$')
+        self.assertEqual(CustomerBankAccount.objects.count(), 65)
+        self.assertEqual(
+            CustomerBankAccount.objects.filter(is_active=True).count(), 35
+        )
+
+        output = io.StringIO()
+        call_command('repair_account_counts', '--dry-run', stdout=output)
+        self.assertIn('Found 0 stale account counts.', output.getvalue())
+
+        customer = customers.get(email=seeding.get_email(0))
+        self.assertTrue(customer.check_password('demo-password'))
+
+    @override_settings(MAX_ACCOUNTS_PER_CUSTOMER=2)
+    def test_account_limit_is_respected(self) -> None:
+        with self.assertRaises(ValueError):
+            seeding.seed(1, accounts_per_customer=3)
+
+
+class VerificationTests(TestCase):
+    def setUp(self) -> None:
+        self.customer = create_customer()
+        self.bank = create_bank()
+
+    def create_account(self, number: str,
+                       mode: str = 'e-verification') -> CustomerBankAccount:
+        return CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, account_number=number,
+            ifsc_code='DEMO0000001', verification_mode=mode,
+        )
+
+    def test_pending_accounts_are_verified_in_batches(self) -> None:
+        valid = [self.create_account(f'12345678{ n }') for n in range(3)]
+        invalid = self.create_account('1')
+        manual = self.create_account('123456789', mode='manual')
+
+        stats = verification.verify_pending(batch_size=2, workers=2)
+        self.assertEqual((stats.approved, stats.rejected, stats.failed),
+                         (3, 1, 0))
+        statuses = dict(CustomerBankAccount.objects.values_list(
+            'pk', 'verification_status'
+        ))
+        self.assertEqual({ statuses[account.pk] for account in valid },
+                         { 'approved' })
+        self.assertEqual(statuses[invalid.pk], 'rejected')
+        self.assertEqual(statuses[manual.pk], 'pending')
+
+    def test_failed_verifications_stay_pending(self) -> None:
+        account = self.create_account('123456789')
+
+        class FailingVerifier(verification.Verifier):
+            calls = 0
+
+            def verify(self, account: CustomerBankAccount) -> bool:
+                FailingVerifier.calls += 1
+                raise ConnectionError('Verification service unavailable')
+
+        stats = verification.verify_pending(verifier=FailingVerifier())
+        self.assertEqual(stats.failed, 1)
+        self.assertEqual(FailingVerifier.calls, 1)
+        account.refresh_from_db()
+        self.assertEqual(account.verification_status, 'pending')
+
+    def test_claimed_accounts_are_skipped_until_the_claim_expires(
+        self
+    ) -> None:
+        account = self.create_account('123456789')
+        self.assertEqual(verification.claim_accounts(10), [account])
+        self.assertEqual(verification.verify_pending().processed, 0)
+
+        CustomerBankAccount.objects.update(
+            verification_claimed_until=timezone.now()
+        )
+        self.assertEqual(verification.verify_pending().approved, 1)
+        account.refresh_from_db()
+        self.assertIsNone(account.verification_claimed_until)
+
+    @mock.patch.dict(verification.VERIFICATION, { 'TIMEOUT': 0.05 })
+    def test_stragglers_are_given_up_on(self) -> None:
+        accounts = [self.create_account(f'12345678{ n }') for n in range(2)]
+        release = threading.Event()
+
+        class SlowVerifier(verification.Verifier):
+            calls = 0
+
+            def verify(self, account: CustomerBankAccount) -> bool:
+                SlowVerifier.calls += 1
+                return release.wait(5)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            stats = verification.verify_batch(SlowVerifier(), executor, 10)
+        finally:
+            release.set()
+            executor.shutdown()
+        self.assertEqual(stats.failed, 2)
+        # The second one never started
+        self.assertEqual(SlowVerifier.calls, 1)
+        for account in accounts:
+            account.refresh_from_db()
+            self.assertEqual(account.verification_status, 'pending')
+            self.assertIsNone(account.verification_claimed_until)
+
+    def test_command(self) -> None:
+        self.create_account('123456789')
+        output = io.StringIO()
+        call_command('verify_accounts', stdout=output)
+        self.assertIn('1 approved, 0 rejected, 0 failed', output.getvalue())
+
+
+class HotPathIndexTests(TestCase):
+    def test_hot_path_queries_use_an_index(self) -> None:
+        output = io.StringIO()
+        call_command('explain_hot_paths', stdout=output)
+        self.assertIn('All 8 hot path queries use an index.', output.getvalue())
+
+
+class ListingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        Bank.objects.bulk_create(
+            Bank(name=f'Bank {n:03}', website='https://bank.example.com',
+                 number=str(n))
+            for n in range(5)
+        )
+
+    def test_banks_are_paginated_with_a_cursor(self) -> None:
+        response = self.client.get('/api/banks/?page_size=2&ordering=-name')
+        self.assertEqual(
+            [bank['name'] for bank in response.json()['results']],
+            ['Bank 004', 'Bank 003']
+        )
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(
+            [bank['name'] for bank in response.json()['results']],
+            ['Bank 002', 'Bank 001']
+        )
+
+    def test_sparse_fieldsets(self) -> None:
+        # The directory version and the listing
+        with self.assertNumQueries(2) as context:
+            response = self.client.get('/api/banks/?fields=name')
+        self.assertEqual(response.json()['results'][0], { 'name': 'Bank 000' })
+        self.assertNotIn('website', context.captured_queries[1]['sql'])
+
+        response = self.client.get('/api/banks/?fields=name,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_customers_are_paginated_for_superusers_only(self) -> None:
+        client = APIClient()
+        client.force_authenticate(create_customer())
+        self.assertIsInstance(client.get('/api/customers/').json(), list)
+
+        client.force_authenticate(create_customer(
+            'root@example.com', pan_number='ROOT00000R', is_superuser=True
+        ))
+        response = client.get('/api/customers/?fields=email')
+        self.assertEqual(
+            response.json()['results'],
+            [{ 'email': 'jane@example.com' }, { 'email': 'root@example.com' }]
+        )
+
+
+class CompiledSerializerTests(TestCase):
+    # Quotes, escapes, control and line separator characters, non-ASCII
+    TRICKY = 'Ünïcødé "quoted" \\ \x01\t\u2028\u2029 \U0001f3e6'
+
+    def setUp(self) -> None:
+        cache.clear()
+        bank_logo_urls.clear()
+        self.request = APIClient().get('/').wsgi_request
+        self.customer = create_customer(first_name=self.TRICKY)
+        self.bank = create_bank(self.TRICKY)
+        self.bank.logo = 'bank_logos/logo.png'
+        self.bank.save()
+        self.account = CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, is_active=True,
+            cheque_image='cheques/1.jpg',
+            **{
+                field: value
+                for field, value in account_data(
+                    self.bank, name_as_per_bank_record=self.TRICKY
+                ).items()
+                if field != 'bank'
+            }
+        )
+
+    def assertRendersIdentically(self, serializer_class, instance) -> None:
+        expected = JSONRenderer().render(serializer_class(
+            instance, context={ 'request': self.request }
+        ).data)
+        compiled = compiled_serializers.compile_serializer(serializer_class)
+        row = type(instance).objects.values(*compiled.get_values()) \
+            .get(pk=instance.pk)
+        self.assertEqual(FastJSONRenderer().render(
+            compiled.to_representation(row, self.request)
+        ), expected)
+
+    def test_compiled_serializers_render_identically(self) -> None:
+        self.assertRendersIdentically(CustomerSerializer, self.customer)
+        self.assertRendersIdentically(BankSerializer, self.bank)
+        self.assertRendersIdentically(CustomerBankAccountSerializer,
+                                      self.account)
+
+    def test_renderer_falls_back_to_json(self) -> None:
+        data = { 'name': self.TRICKY, 'amount': 1.5 }
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+        with mock.patch('demoapp.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data),
+                             JSONRenderer().render(data))
+
+    def test_endpoints_match_the_serializers(self) -> None:
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        compiled = client.get('/api/bank/')
+        self.assertEqual(compiled.json()['bank_logo'],
+                         '/media/bank_logos/logo.png')
+        bank = client.get(f'/api/banks/{ self.bank.pk }/').content
+        customers = client.get('/api/customers/').content
+
+        cache.clear()
+        with mock.patch.dict(compiled_serializers.COMPILED_SERIALIZERS,
+                             { 'ENABLED': False }):
+            client.logout()
+            client.force_authenticate(
+                Customer.objects.get(pk=self.customer.pk)
+            )
+            self.assertEqual(client.get('/api/bank/').content,
+                             compiled.content)
+            self.assertEqual(
+                client.get(f'/api/banks/{ self.bank.pk }/').content, bank
+            )
+            self.assertEqual(client.get('/api/customers/').content,
+                             customers)
+
+    def test_requested_fields_share_their_compiled_serializer(self) -> None:
+        compiled_serializers.compile_serializer.cache_clear()
+        for fields in ('id,name', 'name,id', 'id,id,name', 'name,id,name'):
+            response = self.client.get(f'/api/banks/?fields={ fields }')
+            self.assertEqual(list(response.json()['results'][0]),
+                             ['id', 'name'])
+        self.assertEqual(
+            compiled_serializers.compile_serializer.cache_info().currsize, 1
+        )
+
+    def test_uncompilable_serializers_are_not_compiled(self) -> None:
+        class AnnotatedSerializer(CustomerSerializer):
+            full_name = serializers.SerializerMethodField()
+
+            class Meta(CustomerSerializer.Meta):
+                fields = ('id', 'full_name')
+
+        self.assertIsNone(
+            compiled_serializers.compile_serializer(AnnotatedSerializer)
+        )
+
+
+class ExportTests(TestCase):
+    def setUp(self) -> None:
+        self.customer = create_customer(is_superuser=True)
+        self.bank = create_bank()
+        CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank,
+            **{
+                field: value
+                for field, value in account_data(self.bank, '1').items()
+                if field != 'bank'
+            }
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_export_accounts_as_csv(self) -> None:
+        response = self.client.get('/api/bank/export/?output=csv')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('id,customer_id,customer_email'))
+        self.assertIn('jane@example.com,1,Demo Bank,1,DEMO0000001', lines[1])
+
+    def test_export_customers_as_ndjson(self) -> None:
+        response = self.client.get('/api/customers/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['email'], 'jane@example.com')
+
+    def test_export_is_restricted_to_superusers(self) -> None:
+        self.client.force_authenticate(
+            create_customer('john@example.com', pan_number='ZYXWV9876A')
+        )
+        response = self.client.get('/api/customers/export/')
+        self.assertEqual(response.status_code, 403)
+
+
+class BankLogoTests(TestCase):
+    def setUp(self) -> None:
+        bank_logo_urls.clear()
+        self.customer = create_customer()
+        self.banks = [create_bank(f'Bank { n }') for n in range(3)]
+        for n in range(9):
+            bank = self.banks[n % 3]
+            CustomerBankAccount.objects.create(
+                customer=self.customer, bank=bank, is_active=n == 0,
+                **{
+                    field: value
+                    for field, value in account_data(bank, str(n)).items()
+                    if field != 'bank'
+                }
+            )
+        for bank in self.banks:
+            bank.logo = f'bank_logos/{ bank.pk }.png'
+            bank.save()
+
+    def test_banks_are_fetched_once_per_bank(self) -> None:
+        with self.assertNumQueries(4):  # The accounts and the three banks
+            data = CustomerBankAccountSerializer(
+                CustomerBankAccount.objects.order_by('id'), many=True
+            ).data
+        self.assertEqual(data[4]['bank_logo'],
+                         f'/media/bank_logos/{ self.banks[1].pk }.png')
+
+        with self.assertNumQueries(1):
+            CustomerBankAccountSerializer(
+                CustomerBankAccount.objects.all(), many=True
+            ).data
+
+    def test_active_account_is_fetched_with_its_bank(self) -> None:
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        with self.assertNumQueries(1):
+            response = client.get('/api/bank/')
+        self.assertEqual(response.data['bank_logo'],
+                         f'/media/bank_logos/{ self.banks[0].pk }.png')
+
+    def test_saving_bank_invalidates_logo_url(self) -> None:
+        account = CustomerBankAccount.get_active_account(self.customer)
+        CustomerBankAccountSerializer(account).data
+        account.bank.logo = 'bank_logos/new.png'
+        account.bank.save()
+
+        account = CustomerBankAccount.objects.get(pk=account.pk)
+        self.assertEqual(CustomerBankAccountSerializer(account).data['bank_logo'],
+                         '/media/bank_logos/new.png')
+
+
+class BankDirectoryTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.bank = create_bank()
+
+    def test_unchanged_directory_is_not_modified(self) -> None:
+        response = self.client.get('/api/banks/')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/banks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        detail = f'/api/banks/{ self.bank.pk }/'
+        etag = self.client.get(detail)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etags_do_not_match_missing_banks(self) -> None:
+        etag = self.client.get('/api/banks/')['ETag']
+        response = self.client.get('/api/banks/999/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+        detail_etag = self.client.get(f'/api/banks/{ self.bank.pk }/')['ETag']
+        self.assertNotEqual(detail_etag, etag)
+        response = self.client.get('/api/banks/999/',
+                                   HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_responses_are_served_from_the_cache(self) -> None:
+        first = self.client.get('/api/banks/?fields=name')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/banks/?fields=name')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_responses_are_cached_per_host(self) -> None:
+        create_bank('Other Bank')
+        for host in ('api.example.com', 'api.example.org'):
+            response = self.client.get('/api/banks/?page_size=1',
+                                       HTTP_HOST=host)
+            self.assertTrue(
+                response.json()['next'].startswith(f'http://{ host }/')
+            )
+
+    def test_saving_bank_changes_the_etag(self) -> None:
+        etag = self.client.get('/api/banks/')['ETag']
+        self.bank.name = 'Renamed Bank'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank.save()
+
+        response = self.client.get('/api/banks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['name'], 'Renamed Bank')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank.delete()
+        self.assertEqual(self.client.get('/api/banks/').json()['results'], [])
+
+
+@mock.patch('demoapp.db_routers.get_replica_alias', return_value='replica')
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.router = db_routers.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, method: str, path: str, status: int = 200,
+              **headers) -> str:
+        """
+        Passes a request through the middleware and returns the database
+        its view would have read from.
+        """
+        request = self.factory.generic(method, path, **headers)
+        request.resolver_match = resolve(path)
+        used = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            used.append(self.router.db_for_read(Bank) or 'default')
+            return HttpResponse(status=status)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        middleware(request)
+        self.assertFalse(db_routers.use_replica.get())
+        return used[0]
+
+    def test_reads_of_read_only_views_use_the_replica(self, alias) -> None:
+        self.assertEqual(self.route('GET', '/async/api/bank/'), 'replica')
+        # Cached under a version or generation read from the primary
+        self.assertEqual(self.route('GET', '/api/banks/'), 'default')
+        self.assertEqual(self.route('GET', '/api/bank/'), 'default')
+        self.assertEqual(self.route('GET', '/api/customers/'), 'default')
+        self.assertEqual(self.route('PATCH', '/api/bank/'), 'default')
+        self.assertEqual(self.router.db_for_write(Bank), 'default')
+
+    def test_writes_pin_the_client_to_the_primary(self, alias) -> None:
+        jane = { 'HTTP_AUTHORIZATION': 'Token jane' }
+        john = { 'HTTP_AUTHORIZATION': 'Token john' }
+        read = '/async/api/bank/'
+        self.route('POST', '/api/bank/', status=400, **jane)
+        self.assertEqual(self.route('GET', read, **jane), 'replica')
+
+        self.route('POST', '/api/bank/', status=201, **jane)
+        self.assertEqual(self.route('GET', read, **jane), 'default')
+        self.assertEqual(self.route('GET', read, **john), 'replica')
+
+    def test_database_cache_stays_on_the_primary(self, alias) -> None:
+        cache_model = DatabaseCache('demo_cache', {}).cache_model_class
+        token = db_routers.use_replica.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Bank), 'replica')
+            self.assertEqual(self.router.db_for_read(cache_model), 'default')
+        finally:
+            db_routers.use_replica.reset(token)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self) -> None:
+        authentication.token_cache.clear()
+        self.customer = create_customer()
+        self.bank = create_bank()
+        CustomerBankAccount.objects.create(
+            customer=self.customer, bank=self.bank, is_active=True,
+            **{
+                field: value
+                for field, value in account_data(self.bank, '1').items()
+                if field != 'bank'
+            }
+        )
+
+    async def test_obtain_token_and_update_active_account(self) -> None:
+        response = await self.async_client.post(
+            '/async/api-token-auth/',
+            { 'email': 'jane@example.com', 'password': 's3cret-pass' },
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        headers = { 'AUTHORIZATION': f"Token { response.json()['token'] }" }
+
+        response = await self.async_client.patch(
+            '/async/api/bank/', { 'branch_name': 'Uptown' },
+            content_type='application/json', headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['branch_name'], 'Uptown')
+
+        response = await self.async_client.get('/async/api/bank/',
+                                               headers=headers)
+        self.assertEqual(response.json()['branch_name'], 'Uptown')
+
+    def test_updates_invalidate_the_cached_active_account(self) -> None:
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.get('/api/bank/')
+        token = Token.objects.create(user=self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/async/api/bank/', { 'branch_name': 'Uptown' },
+                content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token { token.key }',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/api/bank/').data['branch_name'],
+                         'Uptown')
+
+    async def test_unauthenticated(self) -> None:
+        response = await self.async_client.get('/async/api/bank/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    async def test_list_banks(self) -> None:
+        await Bank.objects.acreate(name='Other Bank', number='2',
+                                   website='https://other.example.com')
+        response = await self.async_client.get('/async/api/banks/?page_size=1')
+        self.assertEqual(response.json()['results'][0]['name'], 'Demo Bank')
+        response = await self.async_client.get(response.json()['next'])
+        self.assertEqual(response.json()['results'][0]['name'], 'Other Bank')
+        self.assertIsNone(response.json()['next'])
+
+    async def test_list_banks_clamps_page_size(self) -> None:
+        await Bank.objects.acreate(name='Other Bank', number='2',
+                                   website='https://other.example.com')
+        for page_size in ('0', '-3'):
+            response = await self.async_client.get(
+                f'/async/api/banks/?page_size={ page_size }'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 1)
+            self.assertIsNotNone(response.json()['next'])
+
+
+class HashingPoolTests(SimpleTestCase):
+    def test_rejects_work_when_full(self) -> None:
+        pool = hashing.HashingPool(workers=1, max_pending=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block() -> None:
+            started.set()
+            release.wait()
+
+        thread = threading.Thread(target=pool.run, args=('test', block))
+        thread.start()
+        started.wait()
+        with self.assertRaises(hashing.PasswordHashingBusy):
+            pool.run('test', lambda: None)
+        release.set()
+        thread.join()
+        self.assertEqual(pool.run('test', lambda: 42), 42)
+
+
+class LoginTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        create_customer()
+
+    def login(self, password: str = 's3cret-pass'):
+        return self.client.post('/api-token-auth/', {
+            'email': 'jane@example.com', 'password': password,
+        })
+
+    def test_login(self) -> None:
+        self.assertIn('token', self.login().json())
+        self.assertEqual(self.login('wrong').status_code, 400)
+
+    @mock.patch.object(LoginEmailRateThrottle, 'THROTTLE_RATES',
+                       { 'login_email': '2/min' })
+    def test_logins_are_throttled_per_email(self) -> None:
+        self.login('wrong')
+        self.login('wrong')
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_busy_hashing_is_answered_with_a_503(self) -> None:
+        with mock.patch.object(hashing.pool, 'run',
+                               side_effect=hashing.PasswordHashingBusy):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_bodies_other_than_objects_are_rejected(self) -> None:
+        for body in ('[]', '"jane@example.com"'):
+            response = self.client.post('/api-token-auth/', body,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_hash_latencies_are_exposed_to_staff(self) -> None:
+        self.login()
+        client = APIClient()
+        client.force_authenticate(create_customer(
+            'staff@example.com', pan_number='STAFF0000S', is_staff=True
+        ))
+        response = client.get('/metrics/')
+        self.assertIn(
+            'demoapp_password_hash_seconds_count{operation="check"}',
+            response.content.decode()
+        )
+
+
+class LoggingTests(TestCase):
+    def test_requests_carry_an_id(self) -> None:
+        response = self.client.get('/api/banks/', HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        response = self.client.get('/api/banks/', HTTP_X_REQUEST_ID='a b')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_records_are_written_as_json_in_the_background(self) -> None:
+        stream = io.StringIO()
+        handler = logs.QueueHandler('logging.StreamHandler', stream=stream)
+        handler.setFormatter(logs.JSONFormatter())
+        handler.addFilter(logs.ContextFilter())
+        logger = logging.getLogger('demoapp.tests.logging')
+        logger.addHandler(handler)
+        request = RequestFactory().get('/')
+        request.request_id = 'abc-123'
+        token = logs.current_request.set(request)
+        try:
+            logger.warning('Took %s ms', 12, extra={ 'duration_ms': 12 })
+        finally:
+            logs.current_request.reset(token)
+            logger.removeHandler(handler)
+            handler.close()
+
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record['message'], 'Took 12 ms')
+        self.assertEqual(record['level'], 'WARNING')
+        self.assertEqual(record['request_id'], 'abc-123')
+        self.assertEqual(record['duration_ms'], 12)
+        self.assertNotIn('customer_id', record)
+
+    def test_sampling_keeps_warnings(self) -> None:
+        sampling = logs.SamplingFilter(rate=0)
+        record = logging.makeLogRecord({ 'levelno': logging.INFO })
+        self.assertFalse(sampling.filter(record))
+        record = logging.makeLogRecord({ 'levelno': logging.ERROR })
+        self.assertTrue(sampling.filter(record))
+
+    def test_account_events_are_audited(self) -> None:
+        customer = create_customer()
+        client = APIClient()
+        client.force_authenticate(customer)
+        with self.assertLogs('demoapp.audit') as audit:
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post('/api/bank/', account_data(create_bank()),
+                            format='json')
+        self.assertEqual(audit.records[0].event, 'account_created')
+        self.assertEqual(audit.records[0].customer_id, customer.pk)
+
+        token = Token.objects.create(user=customer)
+        with self.assertLogs('demoapp.audit') as audit:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(
+                    '/async/api/bank/', { 'branch_name': 'North' },
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Token { token.key }',
+                )
+        self.assertEqual(audit.records[0].event, 'account_updated')
+        self.assertEqual(audit.records[0].fields, ['branch_name'])
+
+        with self.assertLogs('demoapp.audit') as audit:
+            with self.captureOnCommitCallbacks(execute=True):
+                onboard_accounts([{
+                    **account_data(Bank.objects.get(), '2'),
+                    'customer': customer.pk,
+                }])
+        self.assertEqual(audit.records[0].event, 'account_created')
+        self.assertEqual(audit.records[0].account_id,
+                         CustomerBankAccount.objects.get(
+                             account_number='2'
+                         ).pk)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChequeImageTests(TestCase):
+    def setUp(self) -> None:
+        self.customer = create_customer()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.bank = create_bank()
+
+    def upload(self, number: str, color: str = 'white'):
+        image = io.BytesIO()
+        Image.new('RGB', (3000, 1500), color).save(image, format='JPEG')
+        image.seek(0)
+        image.name = 'cheque.jpg'
+        with mock.patch.object(cheques.worker, 'enqueue') as enqueue, \
+             self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/bank/',
+                { **account_data(self.bank, number), 'cheque_image': image },
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['cheque_processing_status'], 'pending')
+        enqueue.assert_called_once_with(response.data['id'])
+        return response.data['id']
+
+    def test_images_are_recompressed_and_deduplicated(self) -> None:
+        first = self.upload('1')
+        second = self.upload('2')
+        cheques.process_account(first)
+        cheques.process_account(second)
+
+        first, second = CustomerBankAccount.objects.filter(
+            pk__in=(first, second)
+        )
+        self.assertEqual(first.cheque_processing_status, 'processed')
+        self.assertEqual(first.cheque_image.name, second.cheque_image.name)
+        self.assertEqual(first.cheque_image_hash, second.cheque_image_hash)
+        with Image.open(first.cheque_image) as image:
+            self.assertEqual(image.size, (2000, 1000))
+        with Image.open(first.cheque_thumbnail) as image:
+            self.assertEqual(image.size, (320, 160))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(create_customer(is_staff=True))
+
+    @mock.patch('demoapp.middleware.random.random', return_value=0.0)
+    def test_profiled_requests_are_reported_per_view(self, random) -> None:
+        create_bank()
+        self.client.get('/api/banks/')
+        view = self.client.get('/profiling/').json()['views']['bank-list']
+        # Other tests may have been sampled too
+        self.assertGreaterEqual(view['requests'], 1)
+        self.assertGreater(view['mean_queries'], 0)
+
+        metrics = self.client.get('/metrics/').content.decode()
+        self.assertIn('demoapp_request_queries_count{view="bank-list"}',
+                      metrics)
+
+    def test_repeated_queries_are_flagged(self) -> None:
+        profile = profiling.RequestProfile()
+        token = profiling.current_profile.set(profile)
+        for bank in range(5):
+            profiling.record_query(mock.Mock(),
+                                   'SELECT * FROM bank WHERE id = %s',
+                                   (bank,), False, {})
+        profiling.current_profile.reset(token)
+        profiling.record('n-plus-one-view', profile, 0.01)
+
+        report = self.client.get('/profiling/').json()
+        self.assertEqual(report['recent_n_plus_one'][-1], {
+            'view': 'n-plus-one-view',
+            'statements': [
+                { 'sql': 'SELECT * FROM bank WHERE id = %s', 'count': 5 },
+            ],
+        })
+        self.assertEqual(report['views']['n-plus-one-view']['mean_queries'], 5)
+
+
+class WarmupTests(TransactionTestCase):
+    def test_warmup_leaves_no_connection_open(self) -> None:
+        compiled_serializers.compile_serializer.cache_clear()
+        # The in-memory test database ignores `close()`
+        with mock.patch.object(connection, 'close',
+                               wraps=connection.close) as close:
+            timings = warmup.warmup()
+        self.assertEqual([name for name, _ in timings],
+                         ['urls', 'serializers', 'translations', 'databases'])
+        self.assertGreater(
+            compiled_serializers.compile_serializer.cache_info().currsize, 0
+        )
+        close.assert_called_once_with()
+
+        output = io.StringIO()
+        call_command('warmup', stdout=output)
+        self.assertIn('total', output.getvalue())
+
+    def test_preload_does_not_fail_startup(self) -> None:
+        with mock.patch.object(warmup, 'warm_urls', side_effect=RuntimeError), \
+             self.assertLogs('demoapp.warmup', logging.ERROR):
+            warmup.preload()
+
+    def test_admin_is_loaded_on_first_use(self) -> None:
+        self.assertEqual(resolve('/admin/').namespace, 'admin')
+        self.assertIn(Bank, admin.site._registry)
@@ -0,0 +1,38 @@
+from collections.abc import Mapping
+from rest_framework import throttling
+from typing import Any, Optional
+
+
+class LoginIPRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Limits login attempts per client IP address. The rate is configured
+    with the `login_ip` scope of `DEFAULT_THROTTLE_RATES`.
+    """
+    scope = 'login_ip'
+
+    def get_cache_key(self, request: Any, view: Any) -> Optional[str]:
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class LoginEmailRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Limits login attempts per email address, whatever IP addresses they
+    come from. The rate is configured with the `login_email` scope of
+    `DEFAULT_THROTTLE_RATES`.
+    """
+    scope = 'login_email'
+
+    def get_cache_key(self, request: Any, view: Any) -> Optional[str]:
+        # The body may be any JSON value
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not email or not isinstance(email, str):
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': email.strip().lower(),
+        }
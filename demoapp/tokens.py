@@ -0,0 +1,214 @@
+"""
+Signed, short-lived access tokens (JWT), verified without loading the
+customer from the database.
+
+Customers trade their credentials for an access and a refresh token (see
+`demoapp.views.ObtainJWTWithEmail`). Access tokens carry the customer's id
+and staff flags and expire after `SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']`.
+Refresh tokens are rotated on every use.
+
+Revocation goes through a denylist: the ids (`jti`) of revoked tokens,
+kept only until the token would have expired anyway, and per customer the
+time before which all their tokens are revoked. It is kept by the store
+named by `JWT_DENYLIST['STORE']`: `DatabaseDenylist` (the default, in the
+`RevokedToken` table, purged by `manage.py purge_revoked_tokens`) or
+`CacheDenylist` (in the `JWT_DENYLIST['BACKEND']` cache, which has to be
+shared by the worker processes, the default per-process cache is not).
+Checking it is a single query or cache round trip per request.
+"""
+import abc
+import datetime
+import functools
+import time
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import (
+    JWTStatelessUserAuthentication
+)
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from demoapp.models import Customer, RevokedToken
+from typing import Any, Dict
+
+
+JWT_DENYLIST: Dict[str, Any] = {
+    'STORE': 'demoapp.tokens.DatabaseDenylist',
+    'BACKEND': 'default',
+    **getattr(settings, 'JWT_DENYLIST', {}),
+}
+
+
+def get_denied_key(jti: str) -> str:
+    return f'demoapp:jwt-denied:{ jti }'
+
+
+def get_revoked_key(customer_id: Any) -> str:
+    return f'demoapp:jwt-revoked-before:{ customer_id }'
+
+
+class Denylist(abc.ABC):
+    @abc.abstractmethod
+    def deny(self, jti: str, expires_at: float) -> bool:
+        """
+        Revokes a single token until `expires_at`. Returns `False` if it
+        was revoked already.
+        """
+
+    @abc.abstractmethod
+    def revoke_customer(self, customer_id: Any, expires_at: float) -> None:
+        """
+        Revokes every token issued to the customer so far, until
+        `expires_at`.
+        """
+
+    @abc.abstractmethod
+    def is_revoked(self, jti: str, customer_id: Any,
+                   issued_at: float) -> bool:
+        pass
+
+
+class CacheDenylist(Denylist):
+    def get_cache(self) -> BaseCache:
+        return caches[JWT_DENYLIST['BACKEND']]
+
+    def deny(self, jti: str, expires_at: float) -> bool:
+        ttl = int(expires_at - time.time()) + 1
+        return self.get_cache().add(get_denied_key(jti), True, ttl)
+
+    def revoke_customer(self, customer_id: Any, expires_at: float) -> None:
+        now = time.time()
+        self.get_cache().set(
+            get_revoked_key(customer_id), now, int(expires_at - now) + 1
+        )
+
+    def is_revoked(self, jti: str, customer_id: Any,
+                   issued_at: float) -> bool:
+        denied_key = get_denied_key(jti)
+        revoked_key = get_revoked_key(customer_id)
+        entries = self.get_cache().get_many((denied_key, revoked_key))
+        return denied_key in entries or \
+            issued_at <= entries.get(revoked_key, -1)
+
+
+class DatabaseDenylist(Denylist):
+    def deny(self, jti: str, expires_at: float) -> bool:
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(
+                    key=get_denied_key(jti), revoked_at=timezone.now(),
+                    expires_at=datetime.datetime.fromtimestamp(
+                        expires_at, datetime.timezone.utc
+                    ),
+                )
+            return True
+        except IntegrityError:
+            return False
+
+    def revoke_customer(self, customer_id: Any, expires_at: float) -> None:
+        RevokedToken.objects.update_or_create(
+            key=get_revoked_key(customer_id), defaults={
+                'revoked_at': timezone.now(),
+                'expires_at': datetime.datetime.fromtimestamp(
+                    expires_at, datetime.timezone.utc
+                ),
+            },
+        )
+
+    def is_revoked(self, jti: str, customer_id: Any,
+                   issued_at: float) -> bool:
+        denied_key = get_denied_key(jti)
+        revoked_key = get_revoked_key(customer_id)
+        entries = dict(RevokedToken.objects.filter(
+            key__in=(denied_key, revoked_key), expires_at__gt=timezone.now(),
+        ).values_list('key', 'revoked_at'))
+        return denied_key in entries or (
+            revoked_key in entries
+            and issued_at <= entries[revoked_key].timestamp()
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_denylist() -> Denylist:
+    return import_string(JWT_DENYLIST['STORE'])()
+
+
+def deny(token: Token) -> bool:
+    """
+    Revokes a single token until it expires. Returns `False` if it was
+    revoked already.
+    """
+    return token['exp'] <= time.time() or \
+        get_denylist().deny(token['jti'], token['exp'])
+
+
+def revoke_customer_tokens(customer_id: Any) -> None:
+    """
+    Revokes every token issued to the customer so far.
+    """
+    lifetime = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    get_denylist().revoke_customer(customer_id, time.time() + lifetime)
+
+
+def is_revoked(token: Token) -> bool:
+    # `iat` has a one second resolution, tokens issued in the very second
+    # of the revocation are revoked too.
+    return get_denylist().is_revoked(
+        token['jti'], token.get(api_settings.USER_ID_CLAIM),
+        token.get('iat', 0),
+    )
+
+
+def get_tokens(customer: Customer) -> Dict[str, str]:
+    refresh = RefreshToken.for_user(customer)
+    # Lets permission checks on the token user do without the database.
+    refresh['is_staff'] = customer.is_staff
+    refresh['is_superuser'] = customer.is_superuser
+    return { 'refresh': str(refresh), 'access': str(refresh.access_token) }
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates `Bearer` access tokens without loading the customer,
+    checking only the denylist. The user is a `TokenUser` carrying the
+    customer's id (also as `pk`) and staff flags, not a `Customer`.
+    """
+
+    def get_validated_token(self, raw_token: bytes) -> Token:
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise exceptions.AuthenticationFailed(
+                'Token has been revoked.', code='token_revoked'
+            )
+        return token
+
+
+class RotatingRefreshSerializer(TokenRefreshSerializer):
+    """
+    Trades a refresh token for a new access and refresh token, revoking it
+    so it cannot be used twice. Refreshing reads the customer once, so
+    deactivated customers cannot keep their session alive.
+    """
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, str]:
+        refresh = RefreshToken(attrs['refresh'])
+        if is_revoked(refresh):
+            raise exceptions.AuthenticationFailed(
+                'Token has been revoked.', code='token_revoked'
+            )
+        try:
+            data = super().validate(attrs)
+        except Customer.DoesNotExist:
+            raise exceptions.AuthenticationFailed(
+                self.error_messages['no_active_account'], 'no_active_account'
+            )
+        # Of two concurrent refreshes with the same token only one wins.
+        if not deny(refresh):
+            raise exceptions.AuthenticationFailed(
+                'Token has been revoked.', code='token_revoked'
+            )
+        return data
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework import routers
-from demoapp import views
+from demoapp import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r'customers', views.CustomerViewSet, basename='customer')
@@ -18,4 +18,38 @@ urlpatterns = (
         views.ObtainAuthTokenWithEmail.as_view(),   # type: ignore
         name='api_token_auth_with_email'
     ),
+    path(
+        'api-token-auth/jwt/',
+        views.ObtainJWTWithEmail.as_view(),         # type: ignore
+        name='api_jwt_auth_with_email'
+    ),
+    path(
+        'api-token-auth/jwt/refresh/',
+        views.RefreshJWT.as_view(),
+        name='api_jwt_refresh'
+    ),
+    path(
+        'api-token-auth/jwt/revoke/',
+        views.RevokeJWT.as_view(),
+        name='api_jwt_revoke'
+    ),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('profiling/', views.ProfilingView.as_view(), name='profiling'),
+
+    # ASGI-native variants of the endpoints above
+    path(
+        'async/api/bank/',
+        async_views.AsyncActiveAccountView.as_view(),
+        name='async_active_bank'
+    ),
+    path(
+        'async/api/banks/',
+        async_views.AsyncBankListView.as_view(),
+        name='async_bank_list'
+    ),
+    path(
+        'async/api-token-auth/',
+        async_views.AsyncObtainAuthTokenWithEmail.as_view(),
+        name='async_api_token_auth_with_email'
+    ),
 )
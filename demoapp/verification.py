@@ -0,0 +1,244 @@
+"""
+Electronic verification of bank accounts.
+
+Accounts created with `verification_mode='e-verification'` wait as
+`pending` until `manage.py verify_accounts` picks them up. The worker
+claims a batch of `VERIFICATION['BATCH_SIZE']` pending accounts in a
+short transaction, with `SELECT ... FOR UPDATE SKIP LOCKED`, marking them
+claimed for `VERIFICATION['CLAIM_TIMEOUT']` seconds. It then hands them
+to the verifier on up to `VERIFICATION['WORKERS']` threads, holding no
+lock, and writes the outcomes back with a single bulk update. Any number
+of worker processes can run side by side: each claims different rows,
+and the claims of a worker that dies expire.
+
+A batch's stragglers are given up on after `VERIFICATION['TIMEOUT']`
+seconds: those not started yet are cancelled, those running are left to
+finish and their outcome is discarded. Their accounts stay pending.
+
+The verifier is configured by `VERIFICATION['VERIFIER']`, the dotted path
+of a `Verifier` subclass. It runs on the worker threads and must not use
+the database; it gets the account fields listed in `ACCOUNT_FIELDS`.
+"""
+import abc
+import datetime
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from demoapp import active_accounts, logs
+from demoapp.metrics import registry
+from demoapp.models import CustomerBankAccount
+from typing import Any, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+VERIFICATION: Dict[str, Any] = {
+    'VERIFIER': 'demoapp.verification.StubVerifier',
+    'BATCH_SIZE': 100,
+    'WORKERS': 8,
+    'TIMEOUT': 30,
+    'CLAIM_TIMEOUT': 120,
+    **getattr(settings, 'VERIFICATION', {}),
+}
+
+# Loaded for the verifier, besides the primary key
+ACCOUNT_FIELDS = (
+    'customer', 'ifsc_code', 'account_number', 'name_as_per_bank_record',
+    'account_type',
+)
+
+verifications = registry.counter(
+    'demoapp_account_verifications_total',
+    'Accounts e-verified, by outcome.',
+)
+
+
+class Verifier(abc.ABC):
+    """
+    Decides whether an account can be verified. Called concurrently from
+    several threads.
+    """
+
+    @abc.abstractmethod
+    def verify(self, account: CustomerBankAccount) -> bool:
+        """
+        Returns whether the account is approved. Raising leaves it pending,
+        to be tried again by a later run.
+        """
+
+
+class StubVerifier(Verifier):
+    """
+    Approves accounts with a well-formed IFSC code and account number,
+    without asking anybody. For development and tests.
+    """
+    IFSC_CODE = re.compile(r'[A-Z]{4}0[A-Z0-9]{6}')
+    ACCOUNT_NUMBER = re.compile(r'[0-9]{9,18}')
+
+    def verify(self, account: CustomerBankAccount) -> bool:
+        return bool(
+            self.IFSC_CODE.fullmatch(account.ifsc_code) and
+            self.ACCOUNT_NUMBER.fullmatch(account.account_number)
+        )
+
+
+def get_verifier() -> Verifier:
+    return import_string(VERIFICATION['VERIFIER'])()
+
+
+@dataclass
+class VerificationStats:
+    approved: int = 0
+    rejected: int = 0
+    failed: int = 0
+    # The last account claimed. Accounts left pending are behind it, so a
+    # run tries each account once.
+    last_id: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.approved + self.rejected + self.failed
+
+
+def get_pending_accounts(after: int = 0):
+    # Served by `pending_verification_idx`
+    return CustomerBankAccount.objects.filter(
+        verification_mode='e-verification',
+        verification_status='pending',
+        pk__gt=after,
+    ).order_by('pk')
+
+
+def claim_accounts(
+    batch_size: int, after: int = 0
+) -> List[CustomerBankAccount]:
+    """
+    Claims up to `batch_size` pending accounts following the account
+    `after`, which no other worker holds, for
+    `VERIFICATION['CLAIM_TIMEOUT']` seconds.
+    """
+    now = timezone.now()
+    claimed_until = now + datetime.timedelta(
+        seconds=VERIFICATION['CLAIM_TIMEOUT']
+    )
+    with transaction.atomic():
+        accounts: List[CustomerBankAccount] = list(
+            get_pending_accounts(after)
+            .filter(Q(verification_claimed_until__isnull=True) |
+                    Q(verification_claimed_until__lte=now))
+            .select_for_update(skip_locked=True)
+            # Written back by `verify_batch()`
+            .only(*ACCOUNT_FIELDS, 'verification_status')[:batch_size]
+        )
+        CustomerBankAccount.objects.filter(
+            pk__in=[account.pk for account in accounts]
+        ).update(verification_claimed_until=claimed_until)
+    for account in accounts:
+        account.verification_claimed_until = claimed_until
+    return accounts
+
+
+def verify_batch(
+    verifier: Verifier, executor: ThreadPoolExecutor,
+    batch_size: int, after: int = 0,
+) -> Optional[VerificationStats]:
+    """
+    Claims up to `batch_size` pending accounts following the account
+    `after`, verifies them and records the outcomes. Returns `None` once
+    there is nothing left to claim.
+    """
+    accounts = claim_accounts(batch_size, after)
+    if not accounts:
+        return None
+
+    stats = VerificationStats(last_id=accounts[-1].pk)
+    futures = {
+        executor.submit(verifier.verify, account): account
+        for account in accounts
+    }
+    done, not_done = wait(futures, timeout=VERIFICATION['TIMEOUT'])
+    for future in not_done:
+        future.cancel()
+    outcomes: Dict[int, str] = {}
+    for future, account in futures.items():
+        if future not in done or future.exception() is not None:
+            logger.warning('Verifying account %s failed: %s', account.pk,
+                           'timed out' if future not in done
+                           else future.exception())
+            continue
+        outcomes[account.pk] = 'approved' if future.result() else 'rejected'
+
+    with transaction.atomic():
+        # Unless the claim expired and the account was claimed again
+        still_claimed = set(CustomerBankAccount.objects.filter(
+            pk__in=[account.pk for account in accounts],
+            verification_status='pending',
+            verification_claimed_until=accounts[0].verification_claimed_until,
+        ).select_for_update().values_list('pk', flat=True))
+        claimed: List[CustomerBankAccount] = []
+        for account in accounts:
+            if account.pk not in still_claimed:
+                continue
+            # Released, the accounts which failed are tried again later
+            account.verification_claimed_until = None
+            if account.pk in outcomes:
+                account.verification_status = outcomes[account.pk]
+                logs.audit('account_verified', account_id=account.pk,
+                           customer_id=account.customer_id,
+                           status=account.verification_status)
+            claimed.append(account)
+        CustomerBankAccount.objects.bulk_update(
+            claimed, ('verification_status', 'verification_claimed_until')
+        )
+        active_accounts.invalidate_many({
+            account.customer_id for account in claimed
+            if account.pk in outcomes
+        })
+
+    stats.approved = sum(
+        outcomes.get(pk) == 'approved' for pk in still_claimed
+    )
+    stats.rejected = sum(
+        outcomes.get(pk) == 'rejected' for pk in still_claimed
+    )
+    stats.failed = len(accounts) - stats.approved - stats.rejected
+    verifications.inc(stats.approved, status='approved')
+    verifications.inc(stats.rejected, status='rejected')
+    verifications.inc(stats.failed, status='failed')
+    return stats
+
+
+def verify_pending(
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    limit: Optional[int] = None,
+    verifier: Optional[Verifier] = None,
+) -> VerificationStats:
+    """
+    Verifies pending accounts batch after batch until none are left, or
+    `limit` accounts were processed.
+    """
+    batch_size = batch_size or VERIFICATION['BATCH_SIZE']
+    verifier = verifier or get_verifier()
+    total = VerificationStats()
+    with ThreadPoolExecutor(
+        max_workers=workers or VERIFICATION['WORKERS'],
+        thread_name_prefix='verification',
+    ) as executor:
+        while limit is None or total.processed < limit:
+            size = batch_size if limit is None \
+                else min(batch_size, limit - total.processed)
+            stats = verify_batch(verifier, executor, size, total.last_id)
+            if stats is None:
+                break
+            total.last_id = stats.last_id
+            total.approved += stats.approved
+            total.rejected += stats.rejected
+            total.failed += stats.failed
+    return total
@@ -1,25 +1,82 @@
-from django.db import OperationalError
+import csv
+from django.db import IntegrityError, OperationalError
+from django.http import HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import (
-    viewsets, mixins, authentication, parsers, renderers, permissions, status
+    exceptions, viewsets, mixins, filters, parsers, renderers, permissions,
+    status,
 )
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
-from rest_framework.views import APIView
+from rest_framework.decorators import action
+from rest_framework.views import APIView, exception_handler as \
+    drf_exception_handler
 from rest_framework.serializers import BaseSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
+from demoapp import (
+    active_accounts, bank_directory, customer_search, hashing, metrics,
+    profiling, services, tokens,
+)
+from demoapp.idempotency import idempotent
+from demoapp.authentication import (
+    CachingTokenAuthentication, get_or_rotate_token
+)
+from demoapp.compiled_serializers import compile_serializer, is_enabled
+from demoapp.exports import EXPORT_FORMATS, export_accounts, export_customers
+from demoapp.mixins import CompiledSerializerMixin, SparseFieldsetMixin
 from demoapp.models import Customer, Bank, CustomerBankAccount
+from demoapp.onboarding import onboard_accounts, read_rows
 from demoapp.serializers import (
     AuthEmailTokenSerializer,
     CustomerSerializer,
     BankSerializer,
     CustomerBankAccountSerializer,
 )
-from typing import Any, Final, Optional
-from demoapp.permissions import IsCustomerAuthenticated
+from typing import Any, Final, Optional, Tuple
+from demoapp.pagination import KeysetPagination
+from demoapp.permissions import IsCustomerAuthenticated, IsSuperUser
+from demoapp.renderers import FastJSONRenderer
+from demoapp.throttling import LoginEmailRateThrottle, LoginIPRateThrottle
+
+
+def get_export_format(request: Request) -> Optional[str]:
+    # `format` is taken by DRF's renderer negotiation
+    format: str = request.query_params.get('output', 'ndjson')
+    return format if format in EXPORT_FORMATS else None
+
+
+def get_representation_variant(request: Request) -> str:
+    # File fields are rendered as absolute URLs
+    return request.build_absolute_uri('/')
+
+
+# The hot read endpoints render through orjson, their responses carry no
+# floats, see `FastJSONRenderer`.
+FAST_RENDERER_CLASSES = (FastJSONRenderer, renderers.BrowsableAPIRenderer)
+
+
+def exception_handler(exc: Exception, context: Any) -> Optional[Response]:
+    """
+    DRF's exception handler, answering `PasswordHashingBusy` with a 503.
+    """
+    if isinstance(exc, hashing.PasswordHashingBusy):
+        exc = hashing.PasswordHashingUnavailable()
+    return drf_exception_handler(exc, context)
+
+
+def invalid_export_format() -> Response:
+    return Response({ 'detail': (
+        f"Unsupported output, pick one of: { ', '.join(EXPORT_FORMATS) }"
+    )}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class ObtainAuthTokenWithEmail(APIView):
-    throttle_classes = ()
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle,)
+    # Clients may still send their expired token when logging in again.
+    authentication_classes = ()
     permission_classes = ()
     parser_classes = (
         parsers.FormParser,
@@ -34,7 +91,7 @@ class ObtainAuthTokenWithEmail(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         try:
-            token, created = Token.objects.get_or_create(user=user)
+            token = get_or_rotate_token(user)
         except OperationalError as oe:
             return Response(data={
                 "message": (f"An error occurred while trying to fetch token "
@@ -44,7 +101,46 @@ class ObtainAuthTokenWithEmail(APIView):
         return Response({ 'token': token.key })
 
 
-class CustomerViewSet(mixins.CreateModelMixin,
+class ObtainJWTWithEmail(ObtainAuthTokenWithEmail):
+    """
+    Trades the customer's credentials for a short-lived access token and a
+    refresh token, see `demoapp.tokens`.
+    """
+
+    def post(self, request: Request) -> Response:
+        serializer = AuthEmailTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.get_tokens(serializer.validated_data['user']))
+
+
+class RefreshJWT(TokenRefreshView):
+    serializer_class = tokens.RotatingRefreshSerializer
+
+
+class RevokeJWT(APIView):
+    """
+    Logs out: revokes the given refresh token and, when the request is
+    authenticated with one, the access token.
+    """
+    authentication_classes = (tokens.StatelessJWTAuthentication,)
+    permission_classes = ()
+    renderer_classes = (renderers.JSONRenderer,)
+
+    def post(self, request: Request) -> Response:
+        try:
+            refresh = RefreshToken(request.data.get('refresh', ''))
+        except TokenError as te:
+            return Response({ 'detail': str(te) },
+                            status=status.HTTP_400_BAD_REQUEST)
+        tokens.deny(refresh)
+        if isinstance(request.auth, AccessToken):
+            tokens.deny(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CustomerViewSet(CompiledSerializerMixin,
+                      SparseFieldsetMixin,
+                      mixins.CreateModelMixin,
                       mixins.RetrieveModelMixin,
                       mixins.UpdateModelMixin,
                       mixins.ListModelMixin,
@@ -52,88 +148,190 @@ class CustomerViewSet(mixins.CreateModelMixin,
 
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        tokens.StatelessJWTAuthentication, CachingTokenAuthentication,
+    )
     permission_classes = (IsCustomerAuthenticated,)
+    pagination_class = KeysetPagination
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def get_queryset(self):
         queryset = super().get_queryset()
         customer: Customer = self.request.user                  # type: ignore
         if not customer.is_superuser:
-            queryset = Customer.get_queryset_by_id(customer.id) # type: ignore
+            # Left unevaluated, the compiled serializer reads it as
+            # `values()`.
+            queryset = queryset.filter(pk=customer.pk)
         return queryset
 
+    def filter_queryset(self, queryset: Any) -> Any:
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'search':
+            return queryset
+        found = customer_search.search(
+            queryset, self.request.query_params.get('q', '')
+        )
+        if found is None:
+            raise exceptions.ValidationError({ 'q': [
+                f"Search for words of at least "
+                f"{ customer_search.CUSTOMER_SEARCH['MIN_TERM_LENGTH'] } "
+                f"characters."
+            ]})
+        return found
 
-class BankViewSet(viewsets.ModelViewSet):
+    def paginate_queryset(self, queryset: Any) -> Optional[Any]:
+        # Only superusers list more than their own record
+        customer: Customer = self.request.user                  # type: ignore
+        if not customer.is_superuser:
+            return None
+        return super().paginate_queryset(queryset)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsSuperUser,),
+    )
+    def export(self, request: Request, *args: Any,
+               **kwargs: Any) -> HttpResponseBase:
+        """
+        Streams every customer as NDJSON (default) or CSV (`?output=csv`).
+        """
+        format = get_export_format(request)
+        if format is None:
+            return invalid_export_format()
+        return export_customers(Customer.objects.all(), format)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsSuperUser,),
+    )
+    def search(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Lists the customers with a word of their name, email or PAN
+        starting with each word of `?q=`, see `demoapp.customer_search`.
+        """
+        return self.list(request, *args, **kwargs)
+
+
+class BankViewSet(CompiledSerializerMixin, SparseFieldsetMixin,
+                  viewsets.ModelViewSet):
     queryset = Bank.objects.all()
     serializer_class = BankSerializer
     permission_classes = (permissions.AllowAny,)
+    pagination_class = KeysetPagination
+    renderer_classes = FAST_RENDERER_CLASSES
+    filter_backends = (filters.OrderingFilter,)
+    ordering_fields = ('id', 'name',)
+    ordering = ('id',)
+    # The directory version and URL to cache the response under
+    cache_response_as: Optional[
+        Tuple[bank_directory.DirectoryVersion, str]
+    ] = None
+
+    def list(self, request: Request, *args: Any,
+             **kwargs: Any) -> HttpResponseBase:
+        return self.conditional_response(super().list, request,
+                                         *args, **kwargs)
+
+    def retrieve(self, request: Request, *args: Any,
+                 **kwargs: Any) -> HttpResponseBase:
+        return self.conditional_response(super().retrieve, request,
+                                         *args, **kwargs)
+
+    def conditional_response(self, handler: Any, request: Request,
+                             *args: Any, **kwargs: Any) -> HttpResponseBase:
+        """
+        Answers with a 304 when the client's copy is still current, else
+        with the cached JSON if there is one. Banks only change through
+        the admin, so the directory version doubles as the ETag, along
+        with the bank's id for a single bank: the ETag of a bank missing
+        from the current version was never handed out.
+        """
+        version = bank_directory.get_version()
+        format: str = request.accepted_renderer.format  # type: ignore
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        etag = f'"{ version.etag }-{ format }"' if lookup is None \
+            else f'"{ version.etag }-{ lookup }-{ format }"'
+        last_modified = int(version.last_modified) \
+            if version.last_modified is not None else None
+
+        response: Optional[HttpResponseBase] = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        # The browsable API renders per user, only JSON is cached.
+        cacheable = format == 'json'
+        # Pagination links are absolute, built from the host and scheme.
+        url = request.build_absolute_uri()
+        if response is None and cacheable:
+            cached = bank_directory.get_cached_response(version, url)
+            if cached is not None:
+                content_type, content = cached
+                response = HttpResponse(content, content_type=content_type)
+
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if cacheable:
+                # Rendered and cached once finalized by `dispatch()`
+                self.cache_response_as = (version, url)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def finalize_response(self, request: Request, response: HttpResponseBase,
+                          *args: Any, **kwargs: Any) -> HttpResponseBase:
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        if self.cache_response_as is not None \
+           and response.status_code == status.HTTP_200_OK:
+            response.render()                           # type: ignore
+            bank_directory.cache_response(
+                *self.cache_response_as,
+                (response['Content-Type'], response.content)
+            )
+        return response
 
 
 class CustomerBankAccountViewSet(viewsets.ModelViewSet):
     serializer_class = CustomerBankAccountSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        tokens.StatelessJWTAuthentication, CachingTokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def get_object(self) -> CustomerBankAccount:
         customer: Customer = self.request.user                  # type: ignore
         return CustomerBankAccount.get_active_account(customer)
 
+    @idempotent
     def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         customer: Customer = request.user                       # type: ignore
 
-        # Check if it is possible to fetch an existing inactive account
-        # of the customer with the same ifsc_code and account_number of
-        # the new account being created.
+        # If the customer already has an inactive account with the same
+        # ifsc_code and account_number, it is turned into the active
+        # account instead of creating a new one.
         try:
-            existing_account: Optional[CustomerBankAccount] = \
-                CustomerBankAccount.get_existing_account(
-                    customer=customer,
-                    ifsc_code=request.data['ifsc_code'],
-                    account_number=request.data['account_number']
+            account: CustomerBankAccount = \
+                services.activate_or_create_account(
+                    customer, self.get_serializer(data=request.data)
                 )
+        except IntegrityError as ie:
+            return Response(data={
+                "message": (f"The account was modified concurrently, please "
+                            f"retry: { str(ie) }")
+            }, status=status.HTTP_409_CONFLICT)
         except OperationalError as oe:
             return Response(data={
-                "message": (f"An error occurred while trying to get existing "
-                            f"accounts: { str(oe) }")
+                "message": (f"An error occurred while trying to activate or "
+                            f"create account: { str(oe) }")
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        if existing_account:
-            # If we found such an account, turn it into the active
-            # account instead of creating a new one.
-            try:
-                CustomerBankAccount.deactivate_active_account(customer)
-            except OperationalError as oe:
-                return Response(data={
-                    "message": (f"An error occurred while trying to deactivate "
-                                f"the active account: { str(oe) }")
-                }, status=status.HTTP_400_BAD_REQUEST)
-            try:
-                existing_account.activate()
-            except OperationalError as oe:
-                return Response(data={
-                    "message": (f"An error occurred while trying to activate "
-                                f"the existing account: { str(oe) }")
-                }, status=status.HTTP_400_BAD_REQUEST)
-            serializer = self.get_serializer(existing_account)
-        else:
-            # Create new account
-            serializer = self.get_serializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            try:
-                self.perform_create(serializer)
-            except OperationalError as oe:
-                return Response(data={
-                    "message": (f"An error occurred while trying to create "
-                                f"account: { str(oe) }")
-                }, status=status.HTTP_400_BAD_REQUEST)
-
+        serializer = self.get_serializer(account)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def perform_create(self, serializer) -> None:
-        customer: Customer = self.request.user                  # type: ignore
-        CustomerBankAccount.deactivate_active_account(customer)
-        serializer.save(customer=customer, is_active=True)
-
     def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         return self.retrieve(request, *args, **kwargs)
 
@@ -144,8 +342,25 @@ class CustomerBankAccountViewSet(viewsets.ModelViewSet):
                 'You cannot fetch an arbitrary account here.'
             )}, status=status.HTTP_404_NOT_FOUND)
 
+        # Served from the cache until one of the customer's accounts
+        # changes, see `demoapp.active_accounts`.
+        customer: Customer = request.user                       # type: ignore
+        key, data = active_accounts.get(customer.pk,
+                                        get_representation_variant(request))
+        if data is not None:
+            return Response(data)
+
+        # Loaded as `values()` and serialized by the compiled serializer
+        # when it can be, see `demoapp.compiled_serializers`.
+        compiled = compile_serializer(self.get_serializer_class()) \
+            if is_enabled() else None
         try:
-            active_account: CustomerBankAccount = self.get_object()
+            if compiled is not None:
+                row = CustomerBankAccount.get_active_account_values(
+                    customer, compiled.get_values()
+                )
+            else:
+                active_account: CustomerBankAccount = self.get_object()
         except OperationalError as oe:
             return Response(data={
                 "message": (f"An error occurred while trying to retrieve "
@@ -153,13 +368,20 @@ class CustomerBankAccountViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            return Response(self.get_serializer(active_account).data)
+            if compiled is not None:
+                with profiling.serializer_timer():
+                    data = compiled.to_representation(row, request)
+            else:
+                data = self.get_serializer(active_account).data
         except OperationalError as oe:
             return Response(data={
                 "message": (f"An error occurred while trying to serialize "
                             f"account details: { str(oe) }")
             }, status=status.HTTP_400_BAD_REQUEST)
+        active_accounts.store(key, data)
+        return Response(data)
 
+    @idempotent
     def update(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         if kwargs.get('pk'):
             return Response({ 'detail': (
@@ -191,8 +413,90 @@ class CustomerBankAccountViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk',
+        permission_classes=(permissions.IsAdminUser,),
+        parser_classes=(parsers.JSONParser, parsers.MultiPartParser),
+    )
+    def bulk(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Onboards a batch of accounts given either as a JSON array in the
+        request body or as a CSV (or JSON) file uploaded as `file`.
+        """
+        upload = request.FILES.get('file')
+        if upload:
+            format = 'json' if upload.name.endswith('.json') else 'csv'
+            rows: Any = read_rows(upload, format)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({ 'detail': (
+                'Expected a JSON array of accounts or a CSV file upload.'
+            )}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = onboard_accounts(rows)
+        except (ValueError, csv.Error) as e:
+            return Response({ 'detail': f'Unable to read accounts: { str(e) }' },
+                            status=status.HTTP_400_BAD_REQUEST)
+        except OperationalError as oe:
+            return Response(data={
+                "message": (f"An error occurred while trying to onboard "
+                            f"accounts: { str(oe) }")
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        created = sum(result['status'] == 'created' for result in results)
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        })
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsSuperUser,),
+    )
+    def export(self, request: Request, *args: Any,
+               **kwargs: Any) -> HttpResponseBase:
+        """
+        Streams every account, along with its customer's email and bank's
+        name, as NDJSON (default) or CSV (`?output=csv`).
+        """
+        format = get_export_format(request)
+        if format is None:
+            return invalid_export_format()
+        return export_accounts(CustomerBankAccount.objects.all(), format)
+
     def put(self, request, *args, **kwargs) -> Response:
         return self.update(request, *args, **kwargs)
 
     def patch(self, request, *args, **kwargs) -> Response:
         return self.update(request, *args, **kwargs)
+
+
+class MetricsView(APIView):
+    """
+    Exposes the metrics of this worker process in the Prometheus text
+    format, to staff only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request: Request) -> HttpResponse:
+        return HttpResponse(
+            metrics.registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
+class ProfilingView(APIView):
+    """
+    Summarizes the requests profiled by this worker process per view, and
+    lists recent requests which looked like N+1 query patterns. Staff only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request: Request) -> Response:
+        return Response(profiling.get_report())
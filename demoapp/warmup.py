@@ -0,0 +1,142 @@
+"""
+Warms a worker up before it serves its first request.
+
+Much of what the first request to a fresh process pays for is lazy: the
+URL configuration (and the router's patterns) is imported and compiled
+on the first `resolve()`, serializers introspect their model on first
+use, the translation catalogs are loaded on first activation and the
+database connection is opened on first query. `warmup()` does all of
+that up front, for the paths listed in `WARMUP['PATHS']`.
+
+`demo.wsgi` and `demo.asgi` call `preload()` when they are imported, so
+that with a preforking server (`gunicorn --preload`) it runs once in the
+master and the workers inherit the result. It closes the connections it
+opened, a connection must not be shared across a fork. `manage.py warmup`
+runs the same steps and reports their timings.
+
+The admin is not part of it: its modules are only imported by the first
+request to `/admin/`, see `demo.apps.LazyAdminConfig`.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, get_resolver, resolve
+from django.utils import translation
+from demoapp.compiled_serializers import compile_serializer, is_enabled
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+WARMUP: Dict[str, Any] = {
+    'ON_STARTUP': True,
+    'PATHS': (
+        '/api/bank/', '/api/banks/', '/api/banks/1/', '/api/customers/',
+        '/api/customers/1/', '/api-token-auth/', '/api-token-auth/jwt/',
+    ),
+    **getattr(settings, 'WARMUP', {}),
+}
+
+
+def warm_urls() -> List[type]:
+    """
+    Resolves the warmup paths, returning the view classes they route to.
+    """
+    view_classes: List[type] = []
+    get_resolver()
+    for path in WARMUP['PATHS']:
+        try:
+            match = resolve(path)
+        except Resolver404:
+            logger.warning('Warmup path %s does not resolve', path)
+            continue
+        view_class = getattr(match.func, 'cls', None)
+        if view_class is not None and view_class not in view_classes:
+            view_classes.append(view_class)
+    return view_classes
+
+
+def warm_serializers(view_classes: List[type]) -> None:
+    """
+    Builds the fields of the views' serializers and compiles them, see
+    `demoapp.compiled_serializers`.
+    """
+    seen: Set[type] = set()
+    for view_class in view_classes:
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is None or serializer_class in seen:
+            continue
+        seen.add(serializer_class)
+        serializer_class().fields
+        if is_enabled():
+            compile_serializer(serializer_class)
+
+
+def warm_translations() -> None:
+    if settings.USE_I18N:
+        translation.activate(settings.LANGUAGE_CODE)
+        translation.deactivate()
+
+
+def warm_databases() -> None:
+    """
+    Connects to every database and closes the connections again, having
+    imported the drivers and checked the databases are reachable.
+    """
+    def connect() -> None:
+        for connection in connections.all():
+            try:
+                connection.ensure_connection()
+            finally:
+                connection.close()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        connect()
+    else:
+        # Imported by an ASGI server from its event loop, where the ORM
+        # refuses to run.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(connect).result()
+
+
+def warmup() -> List[Tuple[str, float]]:
+    """
+    Runs every warmup step, returning how many seconds each took.
+    """
+    timings: List[Tuple[str, float]] = []
+
+    def timed(name: str, step: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = step()
+        timings.append((name, time.perf_counter() - started))
+        return result
+
+    view_classes = timed('urls', warm_urls)
+    timed('serializers', lambda: warm_serializers(view_classes))
+    timed('translations', warm_translations)
+    timed('databases', warm_databases)
+    return timings
+
+
+def preload() -> None:
+    """
+    Called by the WSGI and ASGI entry points. Never fails the worker's
+    startup, whatever goes wrong is left to the first request.
+    """
+    if not WARMUP['ON_STARTUP']:
+        return
+    try:
+        timings = warmup()
+    except Exception:
+        logger.exception('Warmup failed')
+        return
+    logger.info('Warmed up in %.1f ms', sum(
+        seconds for _, seconds in timings
+    ) * 1000, extra={
+        f'{ name }_ms': round(seconds * 1000, 1) for name, seconds in timings
+    })